@@ -69,6 +69,15 @@ export const api = new lib.aws.lambda.Function(
   { dependsOn: appconfigAgentDevContainer ? [appconfigAgentDevContainer] : [] },
 );
 
+// Shared tenant roles are only assumed by the api, which tags its sessions with the tenant's id
+for (const roleTemplate of [
+  appconfigRoleTemplate,
+  appsyncChannelNamespacePublisherRoleTemplate,
+  appsyncChannelNamespaceSubscriberRoleTemplate,
+  invoicesProcessorQueueSenderRoleTemplate,
+])
+  roleTemplate.trust([api.nodes.role.arn]);
+
 export const invokeApiFunctionUrl = sst.aws.permission({
   actions: ["lambda:InvokeFunctionUrl"],
   resources: [api.arn],
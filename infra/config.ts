@@ -1,7 +1,7 @@
 import * as R from "remeda";
 
 import * as lib from "./lib";
-import { aws_ } from "./utils";
+import { aws_, isSharedTenantRoles } from "./utils";
 
 import type { Transform } from "~/sst/component";
 import { VisibleError } from "~/sst/error";
@@ -77,10 +77,6 @@ if ($dev) {
   });
 }
 
-export const appconfigRoleTemplate = new lib.templates.aws.iam.Role("AppconfigRoleTemplate", {
-  identifier: "AppconfigRole",
-});
-
 export const appconfigAllAtOnceDeploymentStrategy = new aws.appconfig.DeploymentStrategy(
   "AppconfigAllAtOnceDeploymentStrategy",
   {
@@ -101,6 +97,43 @@ export const appconfigLinear20PercentEvery6MinutesDeploymentStrategy =
     replicateTo: "NONE",
   });
 
+export const appconfigRoleTemplate = new lib.templates.aws.iam.Role("AppconfigRoleTemplate", {
+  identifier: "AppconfigRole",
+  shared: isSharedTenantRoles
+    ? {
+        policy: aws.iam.getPolicyDocumentOutput({
+          statements: [
+            // Tenants' configuration profiles are tagged with the tenant's id
+            {
+              actions: ["appconfig:CreateHostedConfigurationVersion", "appconfig:StartDeployment"],
+              resources: [$interpolate`${appconfigApplication.arn}/configurationprofile/*`],
+              conditions: [
+                {
+                  test: "StringEquals",
+                  variable: "aws:ResourceTag/pd:tenantId",
+                  values: ["${aws:PrincipalTag/pd:tenantId}"],
+                },
+              ],
+            },
+            {
+              actions: ["appconfig:CreateHostedConfigurationVersion"],
+              resources: [appconfigApplication.arn],
+            },
+            {
+              actions: ["appconfig:StartDeployment"],
+              resources: [
+                appconfigAllAtOnceDeploymentStrategy.arn,
+                appconfigApplication.arn,
+                appconfigEnvironment.arn,
+                appconfigLinear20PercentEvery6MinutesDeploymentStrategy.arn,
+              ],
+            },
+          ],
+        }).json,
+      }
+    : undefined,
+});
+
 export const appconfigAgentExtensionTransform: Transform<aws.lambda.FunctionArgs> = (args) => {
   if (!$dev)
     args.layers = [
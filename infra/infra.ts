@@ -21,6 +21,9 @@ import {
   papercutMfApiGatewayAwsAccessKey,
   papercutMfApiGatewayScriptObject,
   papercutMfSync,
+  papercutMfSyncDispatch,
+  papercutMfSyncDispatchScheduleRole,
+  papercutMfSyncScheduleRole,
   invoicesProcessor,
   papercutMfSyncClientCredentialsConfigurationProfileTemplate,
   invoicesProcessorClientCredentialsConfigurationProfileTemplate,
@@ -30,7 +33,7 @@ import {
   appsyncChannelNamespacePublisherRoleTemplate,
   appsyncChannelNamespaceSubscriberRoleTemplate,
 } from "./realtime";
-import { aws_, cloudflare_, nanoId, snsTopicEmail } from "./utils";
+import { aws_, cloudflare_, nanoId, snsTopicEmail, tenantRoles } from "./utils";
 
 export const pulumiBucket = new sst.aws.Bucket("PulumiBucket");
 
@@ -56,6 +59,15 @@ export const infraManager = dynamo.subscribe(
     ...($dev ? {} : { memory: "3008 MB", storage: "1536 MB" }),
     environment: {
       PULUMI_CONFIG_PASSPHRASE: pulumiPassphrase,
+      // Checkpoints, history and backups are written gzipped (plain json is still read)
+      PULUMI_SELF_MANAGED_STATE_GZIP: "true",
+      // Unassigned sets of pre-provisioned resources adopted by new tenants, 0 disables the pool
+      WARM_POOL_SIZE: process.env.WARM_POOL_SIZE ?? "0",
+      // New tenants share this many cell stacks, 0 gives every tenant a stack of its own
+      TENANT_CELLS: process.env.TENANT_CELLS ?? "0",
+      // Syncs of a sync slot's tenants run at once per dispatch, read in batches of this size
+      SYNC_DISPATCH_CONCURRENCY: process.env.SYNC_DISPATCH_CONCURRENCY ?? "10",
+      SYNC_DISPATCH_BATCH_SIZE: process.env.SYNC_DISPATCH_BATCH_SIZE ?? "50",
       ...($dev
         ? {
             PULUMI_HONE: Path.join(
@@ -94,9 +106,12 @@ export const infraManager = dynamo.subscribe(
       papercutMfApiGatewayScriptObject,
       papercutMfSync,
       papercutMfSyncClientCredentialsConfigurationProfileTemplate,
+      papercutMfSyncDispatch,
       pulumiBucket,
       pulumiRole,
+      tenantRoles,
       zone,
+      ...(papercutMfSyncScheduleRole ? [papercutMfSyncScheduleRole] : []),
     ],
   },
   {
@@ -124,3 +139,38 @@ export const infraManager = dynamo.subscribe(
     },
   },
 );
+
+export const infraManagerWarmPoolReplenisher = new sst.aws.Cron(
+  "InfraManagerWarmPoolReplenisher",
+  {
+    schedule: "rate(15 minutes)",
+    function: infraManager.nodes.function.arn,
+    event: { type: "replenish" },
+  },
+);
+
+// Sync slots' schedules invoke the dispatch, which continues itself in another invocation
+// when a slot's syncs outlast one
+export const papercutMfSyncDispatchSchedulePolicy = new aws.iam.RolePolicy(
+  "PapercutMfSyncDispatchSchedulePolicy",
+  {
+    role: papercutMfSyncDispatchScheduleRole.name,
+    policy: aws.iam.getPolicyDocumentOutput({
+      statements: [
+        { actions: ["lambda:InvokeFunction"], resources: [infraManager.nodes.function.arn] },
+      ],
+    }).json,
+  },
+);
+
+export const infraManagerSyncDispatchPolicy = new aws.iam.RolePolicy(
+  "InfraManagerSyncDispatchPolicy",
+  {
+    role: infraManager.nodes.function.nodes.role.name,
+    policy: aws.iam.getPolicyDocumentOutput({
+      statements: [
+        { actions: ["lambda:InvokeFunction"], resources: [infraManager.nodes.function.arn] },
+      ],
+    }).json,
+  },
+);
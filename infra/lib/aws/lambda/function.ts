@@ -21,6 +21,8 @@ export class Function extends sst.aws.Function {
         ...link.properties,
         arn: this.arn,
         roleArn: this.nodes.role.arn,
+        // In seconds, e.g. for queues whose visibility timeout must cover it
+        timeout: this.nodes.function.timeout,
       },
     };
   }
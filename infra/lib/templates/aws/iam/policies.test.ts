@@ -0,0 +1,35 @@
+import { describe, expect, it } from "vite-plus/test";
+
+import { sharedRoleSessionConditions, sharedRoleTrustPolicy } from "./policies";
+
+const apiRoleArn = "arn:aws:iam::123456789012:role/printdesk-dev-ApiRole-abcdef";
+
+describe("sharedRoleTrustPolicy", () => {
+  it("only trusts the callers' roles, with sessions tagged with a tenant's id", () => {
+    expect(sharedRoleTrustPolicy([apiRoleArn])).toStrictEqual({
+      Version: "2012-10-17",
+      Statement: [
+        {
+          Effect: "Allow",
+          Principal: { AWS: [apiRoleArn] },
+          Action: ["sts:AssumeRole", "sts:TagSession"],
+          Condition: {
+            StringLike: { "aws:RequestTag/pd:tenantId": ["*"] },
+            "ForAllValues:StringEquals": { "aws:TagKeys": ["pd:tenantId"] },
+          },
+        },
+      ],
+    });
+  });
+
+  it("doesn't compare the tenant's id with the caller's tags", () => {
+    expect(JSON.stringify(sharedRoleTrustPolicy([apiRoleArn]))).not.toContain(
+      "aws:PrincipalTag",
+    );
+    expect(JSON.stringify(sharedRoleSessionConditions())).not.toContain("aws:PrincipalTag");
+  });
+
+  it("doesn't trust the account", () => {
+    expect(JSON.stringify(sharedRoleTrustPolicy([apiRoleArn]))).not.toContain(":root");
+  });
+});
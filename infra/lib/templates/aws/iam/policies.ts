@@ -0,0 +1,29 @@
+export const TENANT_ID_TAG_KEY = "pd:tenantId";
+
+/**
+ * Conditions on sessions of a shared tenant role: they're tagged with a tenant's id and
+ * nothing else. Callers aren't tenants themselves, so there's no principal tag to compare
+ * the tenant's id with.
+ */
+export const sharedRoleSessionConditions = () => [
+  { test: "StringLike", variable: `aws:RequestTag/${TENANT_ID_TAG_KEY}`, values: ["*"] },
+  { test: "ForAllValues:StringEquals", variable: "aws:TagKeys", values: [TENANT_ID_TAG_KEY] },
+];
+
+/** Trust policy of a shared tenant role, which only its callers' roles can assume. */
+export const sharedRoleTrustPolicy = (callerArns: Array<string>) => ({
+  Version: "2012-10-17",
+  Statement: [
+    {
+      Effect: "Allow",
+      Principal: { AWS: callerArns },
+      Action: ["sts:AssumeRole", "sts:TagSession"],
+      Condition: Object.fromEntries(
+        sharedRoleSessionConditions().map((condition) => [
+          condition.test,
+          { [condition.variable]: condition.values },
+        ]),
+      ),
+    },
+  ],
+});
@@ -1,9 +1,21 @@
 import { buildTemplate } from "../../utils";
+import { sharedRoleSessionConditions, sharedRoleTrustPolicy } from "./policies";
+
+import { VisibleError } from "~/sst/error";
 
 import type { Link } from "~/sst/link";
 
 export interface RoleArgs {
   identifier: $util.Input<string>;
+  /**
+   * Create a single role shared by every tenant instead of one role per tenant. Sessions are
+   * tagged with the tenant's id (`pd:tenantId`), which the policy scopes access with
+   * (`${aws:PrincipalTag/pd:tenantId}`). The role is created once it's given the roles that
+   * assume it (see `trust`).
+   */
+  shared?: {
+    policy: $util.Input<string>;
+  };
 }
 
 export class Role extends $util.ComponentResource implements Link.Linkable {
@@ -12,22 +24,75 @@ export class Role extends $util.ComponentResource implements Link.Linkable {
   public readonly identifier: $util.Output<string>;
   public readonly name: $util.Output<string>;
   public readonly arn: $util.Output<string>;
+  public readonly shared: boolean;
+
+  readonly #name: string;
+  readonly #policy?: $util.Input<string>;
+  #role?: aws.iam.Role;
 
   public constructor(name: string, args: RoleArgs, opts?: $util.ComponentResourceOptions) {
     super(Role.__pulumiType, name, {}, opts);
 
     this.identifier = $output(args.identifier);
-    this.name = this.identifier.apply(buildTemplate);
-    this.arn = $interpolate`arn:aws:iam::${aws.getCallerIdentityOutput().accountId}:role/${this.identifier}`;
+    this.shared = args.shared !== undefined;
+    this.#name = name;
+    this.#policy = args.shared?.policy;
+
+    if (this.shared) {
+      this.name = this.identifier.apply((identifier) => buildTemplate(identifier, "shared"));
+      this.arn = $interpolate`arn:aws:iam::${aws.getCallerIdentityOutput().accountId}:role/${this.name}`;
+    } else {
+      this.name = this.identifier.apply(buildTemplate);
+      this.arn = $interpolate`arn:aws:iam::${aws.getCallerIdentityOutput().accountId}:role/${this.identifier}`;
+    }
+  }
+
+  /**
+   * Creates the shared role, trusted by the roles of its callers only (e.g. the functions
+   * linked to it), which must tag their sessions with the tenant's id.
+   */
+  public trust(callerArns: Array<$util.Input<string>>) {
+    // Per-tenant roles' trust policies are the tenants' own
+    if (this.#policy === undefined) return;
+    if (this.#role) throw new VisibleError(`Role ${this.#name} already trusts its callers`);
+
+    this.#role = new aws.iam.Role(
+      `${this.#name}SharedRole`,
+      {
+        name: this.name,
+        assumeRolePolicy: $output(callerArns).apply((arns) =>
+          JSON.stringify(sharedRoleTrustPolicy(arns)),
+        ),
+        inlinePolicies: [{ name: "TenantScoped", policy: this.#policy }],
+      },
+      { parent: this },
+    );
+  }
+
+  public get nodes() {
+    return { role: this.#role };
   }
 
   public getSSTLink() {
+    if (this.shared)
+      return {
+        properties: { name: this.name, arn: this.arn, shared: this.shared },
+        include: [
+          // Sessions must be tagged with the tenant's id, and nothing else
+          sst.aws.permission({
+            actions: ["sts:AssumeRole", "sts:TagSession"],
+            resources: [this.arn],
+            conditions: sharedRoleSessionConditions(),
+          }),
+        ],
+      };
+
     const resources = [
       $interpolate`arn:aws:iam::${aws.getCallerIdentityOutput().accountId}:role/${this.identifier.apply((identifier) => buildTemplate(identifier, "*"))}`,
     ];
 
     return {
-      properties: { name: this.name, arn: this.arn },
+      properties: { name: this.name, arn: this.arn, shared: this.shared },
       include: [
         sst.aws.permission({
           actions: ["sts:TagSession"],
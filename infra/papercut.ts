@@ -6,13 +6,38 @@ import { appconfigAgent } from "./config";
 import { dsql } from "./db";
 import { hostnames } from "./dns";
 import * as lib from "./lib";
+import { aws_, isSharedTenantRoles, isSyncDispatch } from "./utils";
 
 import { siteBuilder } from "~/sst/aws/helpers/site-builder";
 import { VisibleError } from "~/sst/error";
 
 export const invoicesProcessorQueueSenderRoleTemplate = new lib.templates.aws.iam.Role(
   "InvoicesProcessorQueueSenderRoleTemplate",
-  { identifier: "InvoicesSenderRole" },
+  {
+    identifier: "InvoicesSenderRole",
+    shared: isSharedTenantRoles
+      ? {
+          policy: aws.iam.getPolicyDocumentOutput({
+            statements: [
+              // Tenants' queues are tagged with the tenant's id
+              {
+                actions: ["sqs:SendMessage", "sqs:SendMessageBatch"],
+                resources: [
+                  $interpolate`arn:aws:sqs:${aws_.properties.region}:${aws_.properties.account.id}:*`,
+                ],
+                conditions: [
+                  {
+                    test: "StringEquals",
+                    variable: "aws:ResourceTag/pd:tenantId",
+                    values: ["${aws:PrincipalTag/pd:tenantId}"],
+                  },
+                ],
+              },
+            ],
+          }).json,
+        }
+      : undefined,
+  },
 );
 
 export const papercutMfApiAuthTokenConfigurationProfileTemplate =
@@ -75,6 +100,56 @@ export const papercutMfSync = new lib.aws.lambda.Function("PapercutMfSync", {
   ],
 });
 
+// Invokes the sync on every tenant's schedule, in place of each tenant's own role
+export const papercutMfSyncScheduleRole = isSharedTenantRoles
+  ? new aws.iam.Role("PapercutMfSyncScheduleRole", {
+      assumeRolePolicy: aws.iam.getPolicyDocumentOutput({
+        statements: [
+          {
+            principals: [{ type: "Service", identifiers: ["scheduler.amazonaws.com"] }],
+            actions: ["sts:AssumeRole"],
+          },
+        ],
+      }).json,
+      inlinePolicies: [
+        {
+          name: "InvokeSync",
+          policy: aws.iam.getPolicyDocumentOutput({
+            statements: [{ actions: ["lambda:InvokeFunction"], resources: [papercutMfSync.arn] }],
+          }).json,
+        },
+      ],
+    })
+  : undefined;
+
+// Each sync slot's schedule is in this group, invoking the infra manager's dispatch (which
+// is allowed to be invoked by this role in infra.ts)
+export const papercutMfSyncDispatchScheduleGroup = new aws.scheduler.ScheduleGroup(
+  "PapercutMfSyncDispatchScheduleGroup",
+);
+
+export const papercutMfSyncDispatchScheduleRole = new aws.iam.Role(
+  "PapercutMfSyncDispatchScheduleRole",
+  {
+    assumeRolePolicy: aws.iam.getPolicyDocumentOutput({
+      statements: [
+        {
+          principals: [{ type: "Service", identifiers: ["scheduler.amazonaws.com"] }],
+          actions: ["sts:AssumeRole"],
+        },
+      ],
+    }).json,
+  },
+);
+
+export const papercutMfSyncDispatch = new sst.Linkable("PapercutMfSyncDispatch", {
+  properties: {
+    enabled: isSyncDispatch,
+    scheduleGroupName: papercutMfSyncDispatchScheduleGroup.name,
+    scheduleRoleArn: papercutMfSyncDispatchScheduleRole.arn,
+  },
+});
+
 export const invoicesProcessorClientCredentialsConfigurationProfileTemplate =
   new lib.templates.aws.appconfig.ConfigurationProfile(
     "InvoicesProcessorClientCredentialsConfigurationProfileTemplate",
@@ -1,5 +1,6 @@
 import { hostnames } from "./dns";
 import * as lib from "./lib";
+import { isSharedTenantRoles } from "./utils";
 
 import { useProvider } from "~/sst/aws/helpers/provider";
 
@@ -44,12 +45,41 @@ export const appsyncAlias = sst.cloudflare.dns({ proxy: true }).createAlias(
   {},
 );
 
+// Each tenant's channel namespace is named after the tenant
+const appsyncTenantChannelNamespaceArn = $interpolate`${appsyncApi.apiArn}/channelNamespace/\${aws:PrincipalTag/pd:tenantId}`;
+
 export const appsyncChannelNamespacePublisherRoleTemplate = new lib.templates.aws.iam.Role(
   "AppsyncChannelNamespacePublisherRoleTemplate",
-  { identifier: "AppsyncPublisherRole" },
+  {
+    identifier: "AppsyncPublisherRole",
+    shared: isSharedTenantRoles
+      ? {
+          policy: aws.iam.getPolicyDocumentOutput({
+            statements: [
+              { actions: ["appsync:EventPublish"], resources: [appsyncTenantChannelNamespaceArn] },
+            ],
+          }).json,
+        }
+      : undefined,
+  },
 );
 
 export const appsyncChannelNamespaceSubscriberRoleTemplate = new lib.templates.aws.iam.Role(
   "AppsyncChannelNamespaceSubscriberRoleTemplate",
-  { identifier: "AppsyncSubscriberRole" },
+  {
+    identifier: "AppsyncSubscriberRole",
+    shared: isSharedTenantRoles
+      ? {
+          policy: aws.iam.getPolicyDocumentOutput({
+            statements: [
+              { actions: ["appsync:EventConnect"], resources: [appsyncApi.apiArn] },
+              {
+                actions: ["appsync:EventSubscribe"],
+                resources: [appsyncTenantChannelNamespaceArn],
+              },
+            ],
+          }).json,
+        }
+      : undefined,
+  },
 );
@@ -10,6 +10,14 @@ import { Link } from "~/sst/link";
 export const isDevMode = $dev;
 export const isProdStage = $app.stage === "prod";
 
+// Tenants share one role per purpose, scoped to the tenant with session tags, instead of each
+// tenant's stack creating its own roles
+export const isSharedTenantRoles = process.env.SHARED_TENANT_ROLES === "true";
+
+// Tenants' syncs are fanned out by one schedule per cron expression and timezone (sync slot),
+// instead of each tenant's stack creating its own schedule
+export const isSyncDispatch = process.env.SYNC_DISPATCH === "true";
+
 export const aws_ = new sst.Linkable("Aws", {
   properties: {
     account: { id: aws.getCallerIdentityOutput().accountId },
@@ -31,6 +39,10 @@ export const environment = new sst.Linkable("Environment", {
   },
 });
 
+export const tenantRoles = new sst.Linkable("TenantRoles", {
+  properties: { shared: isSharedTenantRoles },
+});
+
 export const nanoId = new sst.Linkable("NanoId", {
   properties: {
     alphabet: Constants.NANOID_ALPHABET,
@@ -0,0 +1,408 @@
+"""
+End to end handler benchmark, drives `main.handler` with synthetic stream batches and runs
+every tenant's stack through its lifecycle, one batch per step: create (INSERT), update
+(MODIFY of the api port), redeploy (MODIFY of only the deployment, a full update without
+changes) and destroy (REMOVE).
+
+Nothing leaves the machine:
+- The engine runs against the function's local state mirror (a file:// backend), written
+  through to an in-process S3 (moto), which also serves the table
+- The aws, cloudflare, time and printdesk plugins are stub providers (`bench.provider`),
+  installed into a scratch PULUMI_HOME so installing plugins doesn't download them
+- The handler is invoked with a fake lambda context
+
+Per step it reports the wall time per record split by phase: stack init, plugin install,
+config, program construction, engine (excluding the program) and state I/O (state mirror
+sync and write-through, recovery checks and history pruning), plus the processes spawned
+(pulumi CLI invocations and plugin launches) and the peak RSS of the function and of its
+largest child process.
+
+Usage (from the function's directory, with the pulumi CLI on PATH; moto isn't a dependency
+of the function):
+    uv run --with "moto[dynamodb,s3]" python -m bench.handler
+    uv run --with "moto[dynamodb,s3]" python -m bench.handler --tenants 10 --cells 4
+"""
+
+from bench import resources
+
+resources.install()
+
+import argparse  # noqa: E402
+from collections import defaultdict  # noqa: E402
+from dataclasses import dataclass, field  # noqa: E402
+import functools  # noqa: E402
+from importlib.metadata import version  # noqa: E402
+import json  # noqa: E402
+import os  # noqa: E402
+from pathlib import Path  # noqa: E402
+import resource  # noqa: E402
+import shutil  # noqa: E402
+import stat  # noqa: E402
+import subprocess  # noqa: E402
+import sys  # noqa: E402
+import tempfile  # noqa: E402
+import time  # noqa: E402
+from typing import Any, Callable, Dict, List, Optional  # noqa: E402
+import uuid  # noqa: E402
+
+from sst import Resource  # noqa: E402
+
+from bench.inputs import (  # noqa: E402
+    IPV4_HOST,
+    deployment_id,
+    enabled_config,
+    input_item,
+    stream_record,
+    tenant_id,
+)
+import provider  # noqa: E402
+
+
+DEFAULT_TENANTS = 3
+DEFAULT_TIMEOUT_MS = 900_000
+FUNCTION_DIR = Path(__file__).resolve().parent.parent
+PHASES = ("init", "plugins", "config", "program", "engine", "state")
+# The steps of a tenant's lifecycle, and the api port of their input (None destroys it)
+STEPS = (("create", 9191), ("update", 9192), ("redeploy", 9192), ("destroy", None))
+PLUGINS = {
+    "aws": version("pulumi-aws"),
+    "cloudflare": version("pulumi-cloudflare"),
+    "time": version("pulumiverse-time"),
+    provider.NAME: provider.VERSION,
+}
+SHIM = """#!/bin/sh
+echo {name} >> "$BENCH_SPAWN_LOG"
+export BENCH_PLUGIN_VERSION={version}
+export PYTHONPATH="{function_dir}${{PYTHONPATH:+:${{PYTHONPATH}}}}"
+exec "{python}" -m bench.provider "$@"
+"""
+
+
+class FakeLambdaContext:
+    def __init__(self, timeout_ms: int = DEFAULT_TIMEOUT_MS):
+        self.function_name = "InfraManager"
+        self.function_version = "$LATEST"
+        self.invoked_function_arn = f"arn:aws:lambda:{Resource.Aws.region}:{Resource.Aws.account.id}:function:InfraManager"
+        self.memory_limit_in_mb = 2048
+        self.aws_request_id = str(uuid.uuid4())
+        self.log_group_name = "/aws/lambda/InfraManager"
+        self.log_stream_name = self.aws_request_id
+        self._deadline = time.monotonic() + timeout_ms / 1000
+
+    def get_remaining_time_in_millis(self) -> int:
+        return max(0, int((self._deadline - time.monotonic()) * 1000))
+
+
+class Phases:
+    """Accumulates the time spent in the functions wrapped for each phase."""
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = defaultdict(float)
+
+    def _timed(self, function: Callable, phase: str):
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.seconds[phase] += time.perf_counter() - start
+
+        return timed
+
+    def wrap(self, owner: Any, attribute: str, phase: str):
+        setattr(owner, attribute, self._timed(getattr(owner, attribute), phase))
+
+    def wrap_factory(self, owner: Any, attribute: str, phase: str):
+        """Wraps a function which returns the function to time, i.e. a program."""
+        factory = getattr(owner, attribute)
+
+        @functools.wraps(factory)
+        def wrapped(*args, **kwargs):
+            return self._timed(factory(*args, **kwargs), phase)
+
+        setattr(owner, attribute, wrapped)
+
+
+class Spawns:
+    """Counts pulumi CLI invocations and, through the plugin shims, plugin launches."""
+
+    def __init__(self, log: Path):
+        self.log = log
+        self.cli = 0
+
+        popen = subprocess.Popen
+        spawns = self
+
+        class CountingPopen(popen):
+            def __init__(self, *args, **kwargs):
+                spawns.cli += 1
+                super().__init__(*args, **kwargs)
+
+        subprocess.Popen = CountingPopen
+
+    @property
+    def plugins(self) -> int:
+        return len(self.log.read_text().splitlines()) if self.log.exists() else 0
+
+
+def install_plugins(pulumi_home: Path, spawn_log: Path):
+    for name, version_ in PLUGINS.items():
+        directory = pulumi_home / "plugins" / f"resource-{name}-v{version_}"
+        directory.mkdir(parents=True, exist_ok=True)
+        shim = directory / f"pulumi-resource-{name}"
+        shim.write_text(
+            SHIM.format(
+                name=name,
+                version=version_,
+                function_dir=FUNCTION_DIR,
+                python=sys.executable,
+            )
+        )
+        shim.chmod(shim.stat().st_mode | stat.S_IEXEC | stat.S_IXGRP | stat.S_IXOTH)
+    os.environ["BENCH_SPAWN_LOG"] = str(spawn_log)
+
+
+def configure_environment(root: Path, cells: int, log_level: str):
+    os.environ.update(
+        {
+            "AWS_ACCESS_KEY_ID": "bench",
+            "AWS_SECRET_ACCESS_KEY": "bench",
+            "AWS_DEFAULT_REGION": Resource.Aws.region,
+            "PULUMI_HOME": str(root / "pulumi_home"),
+            "PULUMI_STATE_MIRROR": "1",
+            "PULUMI_STATE_MIRROR_DIR": str(root / "pulumi_state"),
+            "PULUMI_CONFIG_PASSPHRASE": "bench",
+            # Only the stub plugins, never one on PATH (i.e. the printdesk plugin's)
+            "PULUMI_IGNORE_AMBIENT_PLUGINS": "true",
+            "PULUMI_SKIP_UPDATE_CHECK": "true",
+            "POWERTOOLS_TRACE_DISABLED": "true",
+            "POWERTOOLS_LOG_LEVEL": log_level,
+            "TENANT_CELLS": str(cells),
+            "WARM_POOL_SIZE": "0",
+        }
+    )
+
+
+def create_backend(session):
+    dynamodb = session.client("dynamodb")
+    gsi1 = Resource.Dynamo.globalSecondaryIndexes.gsi1
+    dynamodb.create_table(
+        TableName=Resource.Dynamo.name,
+        BillingMode="PAY_PER_REQUEST",
+        AttributeDefinitions=[
+            {"AttributeName": name, "AttributeType": "S"}
+            for name in (
+                Resource.Dynamo.hashKey,
+                Resource.Dynamo.rangeKey,
+                gsi1.hashKey,
+                gsi1.rangeKey,
+            )
+        ],
+        KeySchema=[
+            {"AttributeName": Resource.Dynamo.hashKey, "KeyType": "HASH"},
+            {"AttributeName": Resource.Dynamo.rangeKey, "KeyType": "RANGE"},
+        ],
+        GlobalSecondaryIndexes=[
+            {
+                "IndexName": "gsi1",
+                "KeySchema": [
+                    {"AttributeName": gsi1.hashKey, "KeyType": "HASH"},
+                    {"AttributeName": gsi1.rangeKey, "KeyType": "RANGE"},
+                ],
+                "Projection": {"ProjectionType": "ALL"},
+            }
+        ],
+    )
+    session.client("s3").create_bucket(
+        Bucket=Resource.PulumiBucket.name,
+        CreateBucketConfiguration={"LocationConstraint": Resource.Aws.region},
+    )
+
+
+@dataclass
+class StepResult:
+    step: str
+    records: int
+    failures: int
+    seconds: float
+    phases: Dict[str, float] = field(default_factory=dict)
+    cli_spawns: int = 0
+    plugin_spawns: int = 0
+    peak_rss_kib: int = 0
+    peak_child_rss_kib: int = 0
+
+
+def run(tenants: int) -> List[StepResult]:
+    # Imported once the backend is mocked, its clients are created on import
+    import main as function
+    from utils import dynamo, mirror, preload
+
+    phases = Phases()
+    phases.wrap(function.pulumi.automation, "create_or_select_stack", "init")
+    phases.wrap(preload, "pulumi_command", "init")
+    phases.wrap(preload, "install_plugins", "plugins")
+    phases.wrap(function.pulumi.automation.Stack, "set_all_config", "config")
+    phases.wrap_factory(function, "program", "program")
+    for operation in ("up", "destroy", "preview", "refresh", "outputs"):
+        phases.wrap(function.pulumi.automation.Stack, operation, "engine")
+    phases.wrap(mirror.StateMirror, "__enter__", "state")
+    phases.wrap(mirror.StateMirror, "__exit__", "state")
+    phases.wrap(function, "recover_stack", "state")
+    phases.wrap(function, "prune_stack_history", "state")
+    phases.wrap(function, "record_handler", "record")
+    spawns = Spawns(Path(os.environ["BENCH_SPAWN_LOG"]))
+
+    images: Dict[str, Optional[Dict[str, Any]]] = {}
+    sequence_number = 0
+    results: List[StepResult] = []
+    for version_, (step, port) in enumerate(STEPS):
+        records: List[Dict[str, Any]] = []
+        for index in range(tenants):
+            tenant_id_ = tenant_id(index)
+            old_image = images.get(tenant_id_)
+            new_image = (
+                input_item(
+                    tenant_id_,
+                    enabled_config(IPV4_HOST, port=port),
+                    deployment_id(index, version_),
+                )
+                if port is not None
+                else None
+            )
+
+            # The table holds what the stream reports, cells build their program from it
+            if new_image is not None:
+                dynamo.table.put_item(Item=new_image)
+            else:
+                dynamo.table.delete_item(
+                    Key=dynamo.primary_key(
+                        tenant_id_, Resource.Dynamo.keyLiterals.INPUT
+                    )
+                )
+
+            sequence_number += 1
+            records.append(
+                stream_record(
+                    event_name="INSERT"
+                    if old_image is None
+                    else "MODIFY"
+                    if new_image is not None
+                    else "REMOVE",
+                    new_image=new_image,
+                    old_image=old_image,
+                    sequence_number=sequence_number,
+                )
+            )
+            images[tenant_id_] = new_image
+
+        before = dict(phases.seconds)
+        cli_spawns, plugin_spawns = spawns.cli, spawns.plugins
+        start = time.perf_counter()
+        try:
+            response = function.handler({"Records": records}, FakeLambdaContext())
+            failures = len(response.get("batchItemFailures", []))
+        except Exception as e:
+            # Raised when every record of the batch failed
+            print(f"{step}: {e}", file=sys.stderr)
+            failures = len(records)
+        seconds = time.perf_counter() - start
+
+        spent = {
+            phase: phases.seconds[phase] - before.get(phase, 0.0)
+            for phase in (*PHASES, "record")
+        }
+        # The program is constructed while the engine runs
+        spent["engine"] -= spent["program"]
+        spent["other"] = spent.pop("record") - sum(spent[phase] for phase in PHASES)
+
+        results.append(
+            StepResult(
+                step=step,
+                records=len(records),
+                failures=failures,
+                seconds=seconds,
+                phases=spent,
+                cli_spawns=spawns.cli - cli_spawns,
+                plugin_spawns=spawns.plugins - plugin_spawns,
+                peak_rss_kib=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                peak_child_rss_kib=resource.getrusage(
+                    resource.RUSAGE_CHILDREN
+                ).ru_maxrss,
+            )
+        )
+
+    return results
+
+
+def report(results: List[StepResult]):
+    columns = (*PHASES, "other")
+    print(
+        f"{'step':<8} {'records':>7} {'failed':>6} {'ms/record':>9} "
+        + " ".join(f"{column:>8}" for column in columns)
+        + f" {'cli':>5} {'plugins':>7} {'rss MiB':>7} {'child MiB':>9}"
+    )
+    for result in results:
+        per_record = 1000 / max(result.records, 1)
+        print(
+            f"{result.step:<8} {result.records:>7} {result.failures:>6}"
+            f" {result.seconds * per_record:>9.0f} "
+            + " ".join(
+                f"{result.phases[column] * per_record:>8.0f}" for column in columns
+            )
+            + f" {result.cli_spawns:>5} {result.plugin_spawns:>7}"
+            f" {result.peak_rss_kib / 1024:>7.0f} {result.peak_child_rss_kib / 1024:>9.0f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--tenants", type=int, default=DEFAULT_TENANTS)
+    parser.add_argument(
+        "--cells",
+        type=int,
+        default=0,
+        help="Places new tenants in cells (TENANT_CELLS)",
+    )
+    parser.add_argument("--log-level", default="ERROR", help="The function's log level")
+    parser.add_argument(
+        "--json", action="store_true", help="Prints the results as json instead"
+    )
+    parser.add_argument(
+        "--keep", action="store_true", help="Keeps the scratch directory (state, logs)"
+    )
+    args = parser.parse_args()
+
+    if shutil.which("pulumi") is None:
+        sys.exit("The pulumi CLI isn't on PATH.")
+    try:
+        import boto3
+        from moto import mock_aws
+    except ImportError:
+        sys.exit('moto isn\'t installed, run with `uv run --with "moto[dynamodb,s3]"`.')
+
+    root = Path(tempfile.mkdtemp(prefix="infra-manager-bench-"))
+    try:
+        configure_environment(root, cells=args.cells, log_level=args.log_level)
+        install_plugins(Path(os.environ["PULUMI_HOME"]), spawn_log=root / "spawns.log")
+
+        with mock_aws():
+            create_backend(boto3.Session(region_name=Resource.Aws.region))
+            results = run(tenants=args.tenants)
+    finally:
+        if args.keep:
+            print(f"Kept {root}.", file=sys.stderr)
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps([vars(result) for result in results], indent=2))
+    else:
+        report(results)
+
+    if any(result.failures for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
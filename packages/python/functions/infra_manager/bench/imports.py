@@ -0,0 +1,130 @@
+"""
+Cold start import report, imports the handler's module (`main`) in fresh interpreters with
+`-X importtime` and reports:
+- The median time of importing it, over `--runs` interpreters (after one which writes the
+  bytecode cache, like the image's precompiled bytecode)
+- The packages which took the most time importing themselves
+- The slowest modules, by the time to import them and their own imports
+
+It exits non-zero if a provider sdk was imported, which only a program run needs, or if
+importing took longer than `--max-ms`.
+
+Usage (from the function's directory, without the app's resources linked):
+    python -m bench.imports
+    python -m bench.imports --top 30 --max-ms 1500
+"""
+
+import argparse
+from collections import defaultdict
+from dataclasses import dataclass
+import json
+import os
+from pathlib import Path
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+from bench import resources
+
+
+DEFAULT_RUNS = 5
+DEFAULT_TOP = 15
+FUNCTION_DIR = Path(__file__).resolve().parent.parent
+MODULE = "main"
+# Imported by the program's components, the handler mustn't import them on cold start
+PROVIDER_SDKS = ("pulumi_aws", "pulumi_cloudflare", "pulumiverse_time")
+
+
+@dataclass
+class ImportTime:
+    module: str
+    self_us: int
+    cumulative_us: int
+
+
+def import_times() -> List[ImportTime]:
+    values = resources.stub()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {MODULE}"],
+        cwd=FUNCTION_DIR,
+        env={
+            **os.environ,
+            "SST_RESOURCES_JSON": json.dumps(values),
+            "AWS_DEFAULT_REGION": values["Aws"]["region"],
+        },
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        sys.exit(f"Failed to import {MODULE}:\n{result.stderr}")
+
+    times: List[ImportTime] = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        times.append(
+            ImportTime(
+                module=name.strip(),
+                self_us=int(self_us),
+                cumulative_us=int(cumulative_us),
+            )
+        )
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS)
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP)
+    parser.add_argument(
+        "--max-ms", type=float, help="Fails if importing takes longer than this"
+    )
+    args = parser.parse_args()
+
+    import_times()
+    runs = [import_times() for _ in range(max(args.runs, 1))]
+    totals = [
+        next(time.cumulative_us for time in times if time.module == MODULE)
+        for times in runs
+    ]
+    total_ms = statistics.median(totals) / 1000
+    # The run closest to the median is the one reported on
+    times = runs[totals.index(sorted(totals)[len(totals) // 2])]
+
+    packages: Dict[str, int] = defaultdict(int)
+    for time in times:
+        packages[time.module.partition(".")[0]] += time.self_us
+
+    print(
+        f"import {MODULE}: {total_ms:.0f} ms (median of {len(runs)}), {len(times)} modules"
+    )
+    print("\nPackages by own import time:")
+    for package, self_us in sorted(packages.items(), key=lambda item: -item[1])[
+        : args.top
+    ]:
+        print(f"  {self_us / 1000:>8.1f} ms  {package}")
+    print("\nSlowest modules, with their imports:")
+    for time in sorted(times, key=lambda time: -time.cumulative_us)[: args.top]:
+        print(f"  {time.cumulative_us / 1000:>8.1f} ms  {time.module}")
+
+    failures: List[str] = []
+    imported = sorted(
+        {
+            time.module.partition(".")[0]
+            for time in times
+            if time.module.partition(".")[0] in PROVIDER_SDKS
+        }
+    )
+    if imported:
+        failures.append(f"provider sdks imported on cold start: {', '.join(imported)}")
+    if args.max_ms is not None and total_ms > args.max_ms:
+        failures.append(f"import took {total_ms:.0f} ms, over {args.max_ms:.0f} ms")
+    if failures:
+        print("\nFailures:", *failures, sep="\n  ", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
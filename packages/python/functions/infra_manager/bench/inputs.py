@@ -0,0 +1,101 @@
+import json
+import time
+from typing import Any, Dict, Optional
+import uuid
+
+from boto3.dynamodb.types import TypeSerializer
+from sst import Resource
+
+from utils import SEPARATOR
+
+
+def tenant_id(index: int):
+    return f"{index:020d}"
+
+
+def deployment_id(index: int, version: int = 0):
+    return f"{index:010d}{version:010d}"
+
+
+def input_item(
+    tenant_id_: str,
+    papercut_mf_config: Dict[str, Any],
+    deployment_id_: str = "0" * 20,
+) -> Dict[str, Any]:
+    """A tenant's input item (INFRA#INPUT), as the api writes it."""
+    literals = Resource.Dynamo.keyLiterals
+    gsi1 = Resource.Dynamo.globalSecondaryIndexes.gsi1
+    return {
+        Resource.Dynamo.hashKey: SEPARATOR.join([literals.TENANT, tenant_id_]),
+        Resource.Dynamo.rangeKey: SEPARATOR.join([literals.INFRA, literals.INPUT]),
+        gsi1.hashKey: SEPARATOR.join(
+            [literals.TENANT, tenant_id_, literals.DEPLOYMENT, deployment_id_]
+        ),
+        gsi1.rangeKey: SEPARATOR.join([literals.INFRA, literals.INPUT]),
+        "papercutMfConfig": papercut_mf_config,
+        "createdAt": "2026-01-01T00:00:00Z",
+    }
+
+
+def enabled_config(host: Dict[str, Any], port: int = 9192):
+    return {
+        "enabled": True,
+        "api": {"protocol": "https", "host": host, "port": port},
+        "sync": {"cronExpression": "0 2 * * ? *", "timezone": "America/Denver"},
+    }
+
+
+IPV4_HOST = {"_tag": "PapercutMfApiHostIpv4Config", "ipv4": "10.0.0.1"}
+HOSTNAME_HOST = {"_tag": "PapercutMfApiHostNameConfig", "name": "papercut.internal"}
+
+CONFIGS: Dict[str, Dict[str, Any]] = {
+    "disabled": {"enabled": False},
+    "ipv4": enabled_config(IPV4_HOST),
+    "hostname": enabled_config(HOSTNAME_HOST),
+    "hostname-resolvers": enabled_config(
+        {**HOSTNAME_HOST, "resolverIps": ["10.0.0.2", "10.0.0.3"]}
+    ),
+}
+
+
+_serializer = TypeSerializer()
+
+
+def _image(item: Optional[Dict[str, Any]]):
+    if item is None:
+        return None
+    return {key: _serializer.serialize(value) for key, value in item.items()}
+
+
+def stream_record(
+    event_name: str,
+    new_image: Optional[Dict[str, Any]],
+    old_image: Optional[Dict[str, Any]],
+    sequence_number: int,
+) -> Dict[str, Any]:
+    item = new_image if new_image is not None else old_image
+    keys = {
+        Resource.Dynamo.hashKey: item[Resource.Dynamo.hashKey],
+        Resource.Dynamo.rangeKey: item[Resource.Dynamo.rangeKey],
+    }
+    dynamodb = {
+        "ApproximateCreationDateTime": time.time(),
+        "Keys": _image(keys),
+        "SequenceNumber": str(sequence_number),
+        "SizeBytes": len(json.dumps(item)),
+        "StreamViewType": "NEW_AND_OLD_IMAGES",
+    }
+    if new_image is not None:
+        dynamodb["NewImage"] = _image(new_image)
+    if old_image is not None:
+        dynamodb["OldImage"] = _image(old_image)
+
+    return {
+        "eventID": uuid.uuid4().hex,
+        "eventName": event_name,
+        "eventVersion": "1.1",
+        "eventSource": "aws:dynamodb",
+        "awsRegion": Resource.Aws.region,
+        "dynamodb": dynamodb,
+        "eventSourceARN": f"arn:aws:dynamodb:{Resource.Aws.region}:{Resource.Aws.account.id}:table/{Resource.Dynamo.name}/stream/2026-01-01T00:00:00.000",
+    }
@@ -0,0 +1,123 @@
+"""
+Stream record parsing benchmark, parses a synthetic replay of stream records the way the
+handler's batch processor does (`InputDynamoDBStreamRecord`) and reports per record:
+- Cold, the first pass over the replay with the cron expression and timezone caches empty
+- Warm, the median of `--rounds` passes after it
+- Of warm, the time spent deserializing the records' attribute values
+
+The replay cycles through inserts, modifies and removes of tenants with each papercut mf
+config, their sync schedules spread over `--schedules` distinct cron expressions.
+
+It exits non-zero if a warm record took longer than `--max-us`.
+
+Usage (from the function's directory, without the app's resources linked):
+    python -m bench.parsing
+    python -m bench.parsing --records 100000 --schedules 50 --max-us 100
+"""
+
+from bench import resources
+
+resources.install()
+
+import argparse  # noqa: E402
+import statistics  # noqa: E402
+import sys  # noqa: E402
+import time  # noqa: E402
+from typing import Any, Dict, List  # noqa: E402
+
+from bench.inputs import CONFIGS, input_item, stream_record, tenant_id  # noqa: E402
+from models import InputDynamoDBStreamRecord  # noqa: E402
+from models.config import load_timezone, parse_cron_expression  # noqa: E402
+from models.dynamo import deserialize  # noqa: E402
+
+
+DEFAULT_RECORDS = 10_000
+DEFAULT_ROUNDS = 5
+DEFAULT_SCHEDULES = 20
+EVENT_NAMES = ("INSERT", "MODIFY", "REMOVE")
+TIMEZONES = ("America/Denver", "America/New_York", "Europe/London", "UTC")
+
+
+def config(index: int, schedules: int) -> Dict[str, Any]:
+    config_ = list(CONFIGS.values())[index % len(CONFIGS)]
+    if not config_["enabled"]:
+        return config_
+
+    schedule = index % schedules
+    return {
+        **config_,
+        "sync": {
+            "cronExpression": f"{schedule % 60} {schedule // 60 % 24} * * ? *",
+            "timezone": TIMEZONES[schedule % len(TIMEZONES)],
+        },
+    }
+
+
+def replay(records: int, schedules: int) -> List[Dict[str, Any]]:
+    replay_: List[Dict[str, Any]] = []
+    for index in range(records):
+        event_name = EVENT_NAMES[index % len(EVENT_NAMES)]
+        new_image = input_item(tenant_id(index), config(index, schedules))
+        old_image = input_item(tenant_id(index), config(index + 1, schedules))
+        replay_.append(
+            stream_record(
+                event_name=event_name,
+                new_image=new_image if event_name != "REMOVE" else None,
+                old_image=old_image if event_name != "INSERT" else None,
+                sequence_number=index,
+            )
+        )
+    return replay_
+
+
+def parse(replay_: List[Dict[str, Any]]) -> float:
+    start = time.perf_counter()
+    for record in replay_:
+        InputDynamoDBStreamRecord.model_validate(record)
+    return time.perf_counter() - start
+
+
+def deserialize_images(replay_: List[Dict[str, Any]]) -> float:
+    start = time.perf_counter()
+    for record in replay_:
+        for image in ("Keys", "NewImage", "OldImage"):
+            for value in record["dynamodb"].get(image, {}).values():
+                deserialize(value)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--records", type=int, default=DEFAULT_RECORDS)
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS)
+    parser.add_argument("--schedules", type=int, default=DEFAULT_SCHEDULES)
+    parser.add_argument(
+        "--max-us", type=float, help="Fails if a warm record takes longer than this"
+    )
+    args = parser.parse_args()
+
+    replay_ = replay(args.records, max(args.schedules, 1))
+    parse_cron_expression.cache_clear()
+    load_timezone.cache_clear()
+    cold = parse(replay_)
+    warm = statistics.median(parse(replay_) for _ in range(max(args.rounds, 1)))
+    deserializing = statistics.median(
+        deserialize_images(replay_) for _ in range(max(args.rounds, 1))
+    )
+
+    per_record_us = warm / len(replay_) * 1_000_000
+    print(f"{len(replay_)} records, {args.schedules} schedules")
+    print(f"  cold         {cold / len(replay_) * 1_000_000:>8.1f} us/record")
+    print(f"  warm         {per_record_us:>8.1f} us/record")
+    print(f"  deserialize  {deserializing / len(replay_) * 1_000_000:>8.1f} us/record")
+
+    if args.max_us is not None and per_record_us > args.max_us:
+        print(
+            f"Warm records took {per_record_us:.1f} us, over {args.max_us:.1f} us",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
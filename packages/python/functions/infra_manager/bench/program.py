@@ -0,0 +1,221 @@
+"""
+Program construction benchmark, builds the tenant program under pulumi's mocks (no engine,
+cloud or backend access) for each tenant shape and reports per shape:
+- Median wall time of constructing the program, over `--iterations` runs after a warm-up
+- Resources registered and invokes (data source calls) made
+- Peak memory allocated while constructing it (tracemalloc, measured in a separate run)
+
+Shapes cover the program's branches, PapercutMf disabled or enabled with an IPv4 or hostname
+API host (with or without resolver IPs), adopting a pooled set, and a cell of tenants.
+
+Results are compared to the baseline (`bench/program.json`), it exits non-zero if a shape's
+resource or invoke count changed, or its time or memory regressed past `--tolerance`. Counts
+change with the program, accept them (and the new timings) with `--update`.
+
+Usage (from the function's directory, without the app's resources linked):
+    python -m bench.program
+    python -m bench.program --iterations 50 --tolerance 0.5
+    python -m bench.program --update
+"""
+
+from bench import resources
+
+resources.install()
+
+import argparse  # noqa: E402
+from dataclasses import asdict, dataclass  # noqa: E402
+import json  # noqa: E402
+import os  # noqa: E402
+import statistics  # noqa: E402
+import sys  # noqa: E402
+import time  # noqa: E402
+import tracemalloc  # noqa: E402
+from typing import Any, Callable, Dict, List, Optional  # noqa: E402
+
+import pulumi  # noqa: E402
+
+from bench.inputs import CONFIGS, input_item, tenant_id  # noqa: E402
+from models import Input  # noqa: E402
+from program import cell, inline  # noqa: E402
+from utils.pool import PooledResources  # noqa: E402
+
+
+BASELINE = os.path.join(os.path.dirname(__file__), "program.json")
+DEFAULT_ITERATIONS = 20
+DEFAULT_TOLERANCE = 1.0
+CELL_SIZE = 8
+
+
+class CountingMocks(pulumi.runtime.Mocks):
+    """Mocks which echo inputs back as state, with the outputs the program reads."""
+
+    def __init__(self):
+        self.resources = 0
+        self.invokes = 0
+
+    def new_resource(self, args: pulumi.runtime.MockResourceArgs):
+        self.resources += 1
+        return f"{args.name}-id", {
+            **args.inputs,
+            "arn": f"arn:aws:mock:us-east-2:123456789012:{args.name}",
+            "url": f"https://mock/{args.name}",
+        }
+
+    def call(self, args: pulumi.runtime.MockCallArgs):
+        self.invokes += 1
+        return {"json": "{}", "body": "", "account_id": "123456789012"}, []
+
+
+def pooled_resources(tenant_id_: str):
+    return PooledResources(
+        set_id=tenant_id_,
+        api_tunnel_id=f"{tenant_id_}-tunnel",
+        invoices_processor_dead_letter_queue_url=f"https://mock/{tenant_id_}-dlq.fifo",
+        invoices_processor_queue_url=f"https://mock/{tenant_id_}.fifo",
+        created_at="2026-01-01T00:00:00Z",
+    )
+
+
+def shapes() -> Dict[str, Callable[[], None]]:
+    def own(config: Dict[str, Any], pooled=False):
+        _input = Input.model_validate(input_item(tenant_id(0), config))
+        return lambda: inline(
+            tenant_id=tenant_id(0),
+            _input=_input,
+            pooled=pooled_resources(tenant_id(0)) if pooled else None,
+        )
+
+    configs = list(CONFIGS.values())
+    cell_inputs = {
+        tenant_id(index): Input.model_validate(
+            input_item(tenant_id(index), configs[index % len(configs)])
+        )
+        for index in range(CELL_SIZE)
+    }
+
+    return {
+        **{name: own(config) for name, config in CONFIGS.items()},
+        "ipv4-pooled": own(CONFIGS["ipv4"], pooled=True),
+        f"cell-{CELL_SIZE}": lambda: cell(cell_name="cell-000", inputs=cell_inputs),
+    }
+
+
+def construct(program: Callable[[], None]) -> CountingMocks:
+    """Constructs the program and waits for its outputs, like an update would."""
+    mocks = CountingMocks()
+    pulumi.runtime.set_mocks(mocks, project="bench", stack="bench", preview=False)
+
+    @pulumi.runtime.test
+    def run():
+        program()
+
+    run()
+    return mocks
+
+
+@dataclass
+class Result:
+    shape: str
+    seconds: float
+    resources: int
+    invokes: int
+    peak_bytes: int
+
+
+def measure(shape: str, program: Callable[[], None], iterations: int) -> Result:
+    construct(program)
+
+    seconds: List[float] = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        mocks = construct(program)
+        seconds.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        construct(program)
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return Result(
+        shape=shape,
+        seconds=statistics.median(seconds),
+        resources=mocks.resources,
+        invokes=mocks.invokes,
+        peak_bytes=peak_bytes,
+    )
+
+
+def regressions(
+    result: Result, baseline: Optional[Dict[str, Any]], tolerance: float
+) -> List[str]:
+    if baseline is None:
+        return [f"{result.shape}: no baseline"]
+
+    found: List[str] = []
+    for count in ("resources", "invokes"):
+        if getattr(result, count) != baseline[count]:
+            found.append(
+                f"{result.shape}: {count} {baseline[count]} -> {getattr(result, count)}"
+            )
+    for metric in ("seconds", "peak_bytes"):
+        if getattr(result, metric) > baseline[metric] * (1 + tolerance):
+            found.append(
+                f"{result.shape}: {metric} {baseline[metric]:.4g} -> {getattr(result, metric):.4g}"
+                f" (over {tolerance:.0%} tolerance)"
+            )
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS)
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help="Relative regression of time or memory allowed over the baseline",
+    )
+    parser.add_argument("--shape", action="append", help="Only measure these shapes")
+    parser.add_argument("--update", action="store_true", help="Rewrite the baseline")
+    args = parser.parse_args()
+
+    baselines: Dict[str, Dict[str, Any]] = {}
+    if os.path.exists(BASELINE):
+        with open(BASELINE) as file:
+            baselines = json.load(file)
+
+    results: List[Result] = []
+    found: List[str] = []
+    print(f"{'shape':<20} {'ms':>8} {'resources':>10} {'invokes':>8} {'peak KiB':>9}")
+    for shape, program in shapes().items():
+        if args.shape and shape not in args.shape:
+            continue
+
+        result = measure(shape, program, args.iterations)
+        results.append(result)
+        found.extend(regressions(result, baselines.get(shape), args.tolerance))
+        print(
+            f"{shape:<20} {result.seconds * 1000:>8.2f} {result.resources:>10}"
+            f" {result.invokes:>8} {result.peak_bytes / 1024:>9.0f}"
+        )
+
+    if args.update:
+        for result in results:
+            baseline = asdict(result)
+            del baseline["shape"]
+            baselines[result.shape] = {**baseline, "seconds": round(result.seconds, 6)}
+        with open(BASELINE, "w") as file:
+            json.dump(baselines, file, indent=2)
+            file.write("\n")
+        print(f"Updated {BASELINE}.")
+        return
+
+    if found:
+        print("Regressions:", *found, sep="\n  ", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import os
+import sys
+from typing import Dict
+
+from pulumi.provider.experimental.property_value import Computed, PropertyValue
+from pulumi.provider.experimental.provider import (
+    ConfigureRequest,
+    ConfigureResponse,
+    CreateRequest,
+    CreateResponse,
+    DeleteRequest,
+    DiffRequest,
+    DiffResponse,
+    InvokeRequest,
+    InvokeResponse,
+    PropertyDiff,
+    PropertyDiffKind,
+    Provider,
+    UpdateRequest,
+    UpdateResponse,
+)
+from pulumi.provider.experimental.server import main
+
+
+ACCOUNT_ID = "123456789012"
+
+
+def _stub_outputs(name: str) -> Dict[str, PropertyValue]:
+    return {
+        "arn": PropertyValue(f"arn:aws:stub:us-east-2:{ACCOUNT_ID}:{name}"),
+        "url": PropertyValue(f"https://stub/{name}"),
+    }
+
+
+class StubProvider(Provider):
+    """
+    Stands in for a resource provider plugin (aws, cloudflare, time and printdesk) without
+    calling its cloud: resources echo their inputs back as their state, with the outputs the
+    program reads, and invokes return stub results.
+    """
+
+    async def configure(self, request: ConfigureRequest) -> ConfigureResponse:
+        return ConfigureResponse(accept_secrets=True, supports_preview=True)
+
+    async def invoke(self, request: InvokeRequest) -> InvokeResponse:
+        return InvokeResponse(
+            return_value={
+                "id": PropertyValue(request.tok),
+                "accountId": PropertyValue(ACCOUNT_ID),
+                "json": PropertyValue("{}"),
+                "body": PropertyValue(""),
+                **_stub_outputs(request.tok),
+            }
+        )
+
+    async def diff(self, request: DiffRequest) -> DiffResponse:
+        diffs = [
+            key
+            for key, value in request.new_inputs.items()
+            if key not in request.ignore_changes
+            and (
+                isinstance(value.value, Computed) or value != request.old_state.get(key)
+            )
+        ]
+
+        return DiffResponse(
+            changes=bool(diffs),
+            diffs=diffs,
+            detailed_diff={
+                key: PropertyDiff(kind=PropertyDiffKind.UPDATE, input_diff=True)
+                for key in diffs
+            },
+        )
+
+    async def create(self, request: CreateRequest) -> CreateResponse:
+        return CreateResponse(
+            resource_id="" if request.preview else f"{request.name}-stub",
+            properties={**_stub_outputs(request.name), **request.properties},
+        )
+
+    async def update(self, request: UpdateRequest) -> UpdateResponse:
+        return UpdateResponse(
+            properties={**_stub_outputs(request.name), **request.news}
+        )
+
+    async def delete(self, request: DeleteRequest) -> None:
+        return None
+
+
+if __name__ == "__main__":
+    # The plugin's shim passes the version the program requires, which the engine checks
+    main(sys.argv[1:], os.environ.get("BENCH_PLUGIN_VERSION", "0.0.0"), StubProvider())
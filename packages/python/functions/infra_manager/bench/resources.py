@@ -0,0 +1,81 @@
+import ast
+import json
+import os
+from typing import Any, Dict
+
+SST_STUB = os.path.join(os.path.dirname(os.path.dirname(__file__)), "sst.pyi")
+NANO_ID_ALPHABET = "0123456789abcdefghijklmnopqrstuvwxyz"
+NANO_ID_LENGTH = 20
+
+
+def _stub_class(node: ast.ClassDef, path: str) -> Dict[str, Any]:
+    values: Dict[str, Any] = {}
+    for child in node.body:
+        if isinstance(child, ast.ClassDef):
+            values[child.name] = _stub_class(child, f"{path}.{child.name}")
+        elif isinstance(child, ast.AnnAssign) and isinstance(child.target, ast.Name):
+            name = child.target.id
+            annotation = ast.unparse(child.annotation)
+            if annotation == "bool":
+                values[name] = False
+            elif annotation in ("float", "int"):
+                values[name] = 0
+            elif node.name == "keyLiterals":
+                values[name] = name
+            elif node.name.endswith("Template") and name == "name":
+                values[name] = f"{node.name}-{{{{tenant_id}}}}"
+            elif name == "arn" or name.endswith("Arn"):
+                values[name] = f"arn:aws:iam::123456789012:role/{path}.{name}"
+            else:
+                values[name] = f"{path}.{name}"
+    return values
+
+
+def stub() -> Dict[str, Any]:
+    """
+    Stub values of every linked resource the function's types (sst.pyi) declare, so the
+    program can be constructed without the app's links:
+    - Key literals are their own names, templates keep their tenant id placeholder
+    - Values that are parsed or validated (the app, region, bucket, table, nano id
+      pattern and invoices processor timeout) are realistic
+    """
+    with open(SST_STUB) as file:
+        module = ast.parse(file.read())
+    resource = next(
+        node
+        for node in module.body
+        if isinstance(node, ast.ClassDef) and node.name == "Resource"
+    )
+
+    values = _stub_class(resource, "Resource")
+    values["App"] = {"name": "printdesk", "stage": "bench"}
+    values["Aws"]["region"] = "us-east-2"
+    values["Aws"]["account"]["id"] = "123456789012"
+    values["PulumiBucket"]["name"] = "printdesk-bench-pulumi"
+    values["Dynamo"].update(name="printdesk-bench", hashKey="pk", rangeKey="sk")
+    values["Dynamo"]["globalSecondaryIndexes"]["gsi1"] = {
+        "hashKey": "gsi1pk",
+        "rangeKey": "gsi1sk",
+    }
+    values["NanoId"].update(
+        alphabet=NANO_ID_ALPHABET,
+        length=NANO_ID_LENGTH,
+        pattern=f"^[{NANO_ID_ALPHABET}]{{{NANO_ID_LENGTH}}}$",
+    )
+    # sst's default function timeout
+    values["InvoicesProcessor"]["timeout"] = 20
+    values["TenantRoles"]["shared"] = os.environ.get("BENCH_SHARED_ROLES") == "1"
+    values["PapercutMfSyncDispatch"]["enabled"] = (
+        os.environ.get("BENCH_SYNC_DISPATCH") == "1"
+    )
+    return values
+
+
+def install():
+    """
+    Links the stubs, before anything imports sst's Resource. Clients created at import are
+    configured with the stubbed region, they aren't called.
+    """
+    values = stub()
+    os.environ["SST_RESOURCES_JSON"] = json.dumps(values)
+    os.environ.setdefault("AWS_DEFAULT_REGION", values["Aws"]["region"])
@@ -0,0 +1,768 @@
+"""
+Fleet reconciler, rolls out program and provider changes to every tenant's stack.
+
+Tenants are enumerated from their input items (INFRA#INPUT) and reconciled by invoking the
+infra manager with a reconcile event, so each stack is operated on under the same lease
+and deadline as the stream does:
+- Only tenants whose stack is stamped with another program fingerprint than this build's
+  are reconciled, unless `--all` is passed. Stamped stacks' items are indexed by their
+  fingerprint, stacks stamped before the index existed are indexed once (`index`)
+- Tenants are reconciled in waves, i.e. a canary wave of a few percent before the rest
+- At most `--concurrency` tenants are reconciled at once
+- A wave halts as soon as its failure rate exceeds `--max-failure-rate` (once at least
+  `--min-samples` tenants finished), and later waves aren't started
+
+Drift detection (`drift`) runs a refresh-and-preview of each tenant's stack with bounded
+parallelism, each report is written to the tenant's drift item (INFRA#DRIFT).
+
+State retention (`prune`) keeps the last `--keep` history entries and backups of every
+stack in the backend, updates keep their own stack's history pruned as well.
+
+The warm pool (`replenish`) is topped back up by the infra manager on a schedule, it can
+also be replenished (or resized with `--size`) on demand.
+
+Sync schedules (`stagger`) that fire at the same times across the fleet are given flexible
+windows, planned so at most `--max-per-minute` syncs are expected to start in any minute,
+reported as the busiest minute before and after. With `--apply` the plan is saved and the
+tenants whose window changed are reconciled, or with dispatched syncs their slots' schedules
+are updated.
+
+With dispatched syncs (SYNC_DISPATCH), tenants are registered in their sync slot (INFRA#SYNC)
+by their next update, e.g. `reconcile --all` after enabling it. Slot schedules (`slots`) are
+compared to the registered tenants' slots, with `--apply` the missing schedules are created
+and those of slots without tenants deleted.
+
+With cells enabled (TENANT_CELLS), new tenants share cell stacks while existing tenants keep
+their own stack until they're migrated (`migrate`) into their cell's stack. Tenants of the
+same cell are migrated one at a time, those reported busy can be migrated by running it again.
+
+Usage (with the app's resources linked):
+    sst shell -- python fleet.py stale
+    sst shell -- python fleet.py index
+    sst shell -- python fleet.py prune --keep 10
+    sst shell -- python fleet.py drift --function-name <infra manager function name>
+    sst shell -- python fleet.py reconcile --function-name <infra manager function name>
+    sst shell -- python fleet.py replenish --function-name <infra manager function name>
+    sst shell -- python fleet.py migrate --function-name <infra manager function name>
+    sst shell -- python fleet.py stagger --max-per-minute 20
+    sst shell -- python fleet.py stagger --apply --function-name <infra manager function name>
+    sst shell -- python fleet.py slots --apply --function-name <infra manager function name>
+"""
+
+import argparse
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+import json
+import math
+import os
+import sys
+import threading
+from typing import Dict, Iterator, List, Optional, Set
+
+from boto3.dynamodb.conditions import Attr
+import boto3
+from botocore.config import Config
+from sst import Resource
+
+from models import Input
+from program import fingerprint
+from utils import (
+    SEPARATOR,
+    dispatch,
+    dynamo,
+    infra_project_name,
+    retention,
+    stagger,
+    sync_dispatch,
+)
+
+
+DEFAULT_CONCURRENCY = 10
+DEFAULT_WAVES = (0.05, 1.0)
+DEFAULT_MAX_FAILURE_RATE = 0.1
+DEFAULT_MIN_SAMPLES = 5
+
+
+@dataclass
+class WaveReport:
+    index: int
+    tenant_ids: List[str]
+    succeeded: List[str] = field(default_factory=list)
+    skipped: List[str] = field(default_factory=list)
+    current: List[str] = field(default_factory=list)
+    busy: List[str] = field(default_factory=list)
+    failed: Dict[str, str] = field(default_factory=dict)
+    halted: bool = False
+
+    @property
+    def finished(self):
+        return (
+            len(self.succeeded)
+            + len(self.skipped)
+            + len(self.current)
+            + len(self.busy)
+            + len(self.failed)
+        )
+
+    @property
+    def failure_rate(self):
+        return len(self.failed) / self.finished if self.finished else 0.0
+
+
+def scan(*literals: str, full_items: bool = False) -> Iterator[Dict]:
+    """
+    Scans the table for tenants' infra items of the given key literals, only their keys
+    and program fingerprint unless `full_items`.
+    """
+    kwargs = {
+        "FilterExpression": Attr(Resource.Dynamo.rangeKey).is_in(
+            [dynamo.infra_key(literal) for literal in literals]
+        ),
+    }
+    if not full_items:
+        kwargs["ProjectionExpression"] = "#pk, #sk, programFingerprint"
+        kwargs["ExpressionAttributeNames"] = {
+            "#pk": Resource.Dynamo.hashKey,
+            "#sk": Resource.Dynamo.rangeKey,
+        }
+    while True:
+        page = dynamo.table.scan(**kwargs)
+        yield from page["Items"]
+
+        if "LastEvaluatedKey" not in page:
+            return
+        kwargs["ExclusiveStartKey"] = page["LastEvaluatedKey"]
+
+
+def tenant_id(item: Dict) -> str:
+    return item[Resource.Dynamo.hashKey].split(SEPARATOR)[1]
+
+
+def tenant_ids() -> List[str]:
+    """Tenants with an input item."""
+    return sorted(tenant_id(item) for item in scan(Resource.Dynamo.keyLiterals.INPUT))
+
+
+def sync_slots() -> Dict[str, stagger.Slot]:
+    """Tenants with papercut mf enabled, mapped to their sync schedule's slot."""
+    slots: Dict[str, stagger.Slot] = {}
+    for item in scan(Resource.Dynamo.keyLiterals.INPUT, full_items=True):
+        _input = Input.model_validate(item)
+        if _input.papercut_mf_config.enabled:
+            slots[_input.tenant_id] = stagger.Slot.of(_input.papercut_mf_config)
+    return slots
+
+
+def registered_slots() -> Dict[str, stagger.Slot]:
+    """Tenants registered in a sync slot, mapped to it."""
+    return {
+        tenant_id(item): stagger.Slot(
+            cron_expression=item["cronExpression"], timezone=item["timezone"]
+        )
+        for item in scan(Resource.Dynamo.keyLiterals.SYNC, full_items=True)
+    }
+
+
+def slot_schedules(function_name: str) -> dispatch.SlotSchedules:
+    return dispatch.SlotSchedules(
+        scheduler=boto3.client("scheduler"),
+        function_arn=dispatch.function_arn(function_name),
+    )
+
+
+def query_fingerprints(condition: str, value: str) -> Iterator[Dict]:
+    """
+    Queries the stamped stacks' items in the fingerprint index by a condition on the index's
+    range key (the fingerprint and tenant id), only their keys and program fingerprint.
+    """
+    gsi1 = Resource.Dynamo.globalSecondaryIndexes.gsi1
+    kwargs = {
+        "IndexName": dynamo.GSI1,
+        "KeyConditionExpression": f"#indexPk = :indexPk AND #indexSk {condition} :indexSk",
+        "ProjectionExpression": "#pk, programFingerprint",
+        "ExpressionAttributeNames": {
+            "#pk": Resource.Dynamo.hashKey,
+            "#indexPk": gsi1.hashKey,
+            "#indexSk": gsi1.rangeKey,
+        },
+        "ExpressionAttributeValues": {
+            ":indexPk": dynamo.infra_key(Resource.Dynamo.keyLiterals.STACK),
+            ":indexSk": value,
+        },
+    }
+    while True:
+        page = dynamo.table.query(**kwargs)
+        yield from page["Items"]
+
+        if "LastEvaluatedKey" not in page:
+            return
+        kwargs["ExclusiveStartKey"] = page["LastEvaluatedKey"]
+
+
+def stale_tenant_ids(current: Optional[str] = None) -> Dict[str, str]:
+    """
+    Tenants whose stack was fully updated with another program fingerprint than the current
+    build's, mapped to that fingerprint. Queried from the fingerprint index of the stacks'
+    items, i.e. the fingerprints sorting before and after the current one, so neither the
+    table is scanned nor stack state opened.
+
+    Stacks that were never stamped aren't indexed (`reconcile --all` updates them), nor are
+    stacks stamped before the index existed until they're indexed (`index`).
+    """
+    current = current or fingerprint.current()
+    items = [
+        *query_fingerprints("<", current),
+        # The separator sorts right before a space, so this skips the current fingerprint
+        *query_fingerprints(">", f"{current}{chr(ord(SEPARATOR) + 1)}"),
+    ]
+    return {
+        tenant_id(item): item["programFingerprint"]
+        for item in sorted(items, key=tenant_id)
+    }
+
+
+def index_fingerprints() -> int:
+    """
+    Indexes the stamped stacks' items which aren't in the fingerprint index yet, i.e. stamped
+    before it existed. Returns how many were indexed.
+    """
+    gsi1 = Resource.Dynamo.globalSecondaryIndexes.gsi1
+    indexed = 0
+    for item in scan(Resource.Dynamo.keyLiterals.STACK, full_items=True):
+        if "programFingerprint" not in item or gsi1.hashKey in item:
+            continue
+
+        index = fingerprint.index_key(item["programFingerprint"], tenant_id(item))
+        try:
+            # Unless it was restamped or unstamped in the meantime
+            dynamo.table.update_item(
+                Key={
+                    Resource.Dynamo.hashKey: item[Resource.Dynamo.hashKey],
+                    Resource.Dynamo.rangeKey: item[Resource.Dynamo.rangeKey],
+                },
+                UpdateExpression="SET #indexPk = :indexPk, #indexSk = :indexSk",
+                ConditionExpression="programFingerprint = :fingerprint",
+                ExpressionAttributeNames={
+                    "#indexPk": gsi1.hashKey,
+                    "#indexSk": gsi1.rangeKey,
+                },
+                ExpressionAttributeValues={
+                    ":fingerprint": item["programFingerprint"],
+                    ":indexPk": index[gsi1.hashKey],
+                    ":indexSk": index[gsi1.rangeKey],
+                },
+            )
+            indexed += 1
+        except dynamo.ConditionalCheckFailedException:
+            continue
+
+    return indexed
+
+
+def unmigrated_tenant_ids() -> List[str]:
+    """Tenants with an input item which aren't a member of a cell yet."""
+    inputs: List[str] = []
+    members: Set[str] = set()
+    for item in scan(
+        Resource.Dynamo.keyLiterals.INPUT, Resource.Dynamo.keyLiterals.CELL
+    ):
+        if item[Resource.Dynamo.rangeKey] == dynamo.infra_key(
+            Resource.Dynamo.keyLiterals.INPUT
+        ):
+            inputs.append(tenant_id(item))
+        else:
+            members.add(tenant_id(item))
+
+    return sorted(tenant_id for tenant_id in inputs if tenant_id not in members)
+
+
+def plan_waves(tenant_ids: List[str], waves: List[float]) -> List[List[str]]:
+    """Splits tenants into waves by cumulative fractions, e.g. [0.05, 1] is a 5% canary then the rest."""
+    planned: List[List[str]] = []
+    start = 0
+    for fraction in waves:
+        end = max(min(math.ceil(len(tenant_ids) * fraction), len(tenant_ids)), start)
+        if planned and end == start:
+            continue
+        planned.append(tenant_ids[start:end])
+        start = end
+
+    if start < len(tenant_ids):
+        planned.append(tenant_ids[start:])
+
+    return [wave for wave in planned if wave]
+
+
+class Invoker:
+    def __init__(self, function_name: str, concurrency: int):
+        self.function_name = function_name
+        # Invocations run up to the function timeout and must not be retried by the client,
+        # a retry would just race the still running invocation for the lease.
+        self._lambda = boto3.client(
+            "lambda",
+            config=Config(
+                read_timeout=960,
+                retries={"max_attempts": 0},
+                max_pool_connections=concurrency,
+            ),
+        )
+
+    def invoke(self, event: Dict) -> Dict:
+        response = self._lambda.invoke(
+            FunctionName=self.function_name,
+            InvocationType="RequestResponse",
+            Payload=json.dumps(event).encode(),
+        )
+        payload = json.loads(response["Payload"].read() or b"null")
+
+        if "FunctionError" in response:
+            raise RuntimeError(
+                payload.get("errorMessage", response["FunctionError"])
+                if isinstance(payload, dict)
+                else response["FunctionError"]
+            )
+
+        return payload
+
+
+class Reconciler:
+    def __init__(
+        self,
+        function_name: str,
+        force: bool = False,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        max_failure_rate: float = DEFAULT_MAX_FAILURE_RATE,
+        min_samples: int = DEFAULT_MIN_SAMPLES,
+    ):
+        self.function_name = function_name
+        self.force = force
+        self.concurrency = concurrency
+        self.max_failure_rate = max_failure_rate
+        self.min_samples = min_samples
+        self._invoker = Invoker(function_name=function_name, concurrency=concurrency)
+
+    def reconcile_tenant(self, tenant_id: str) -> str:
+        return self._invoker.invoke(
+            {"type": "reconcile", "tenantId": tenant_id, "force": self.force}
+        )["result"]
+
+    def run_wave(self, report: WaveReport) -> WaveReport:
+        halt = threading.Event()
+        pending = iter(report.tenant_ids)
+        futures: Dict[Future, str] = {}
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+
+            def submit():
+                tenant_id = next(pending, None)
+                if tenant_id is not None and not halt.is_set():
+                    futures[executor.submit(self.reconcile_tenant, tenant_id)] = (
+                        tenant_id
+                    )
+
+            for _ in range(self.concurrency):
+                submit()
+
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    tenant_id = futures.pop(future)
+                    try:
+                        result = future.result()
+                        {
+                            "succeeded": report.succeeded,
+                            "skipped": report.skipped,
+                            "current": report.current,
+                            "busy": report.busy,
+                        }[result].append(tenant_id)
+                        print(f"[wave {report.index}] {tenant_id}: {result}")
+                    except Exception as e:
+                        report.failed[tenant_id] = str(e)
+                        print(f"[wave {report.index}] {tenant_id}: failed ({e})")
+
+                    if (
+                        report.finished >= self.min_samples
+                        and report.failure_rate > self.max_failure_rate
+                    ):
+                        # In-flight invocations can't be recalled, but nothing new is started
+                        halt.set()
+                        report.halted = True
+
+                    submit()
+
+        return report
+
+    def run(self, tenant_ids: List[str], waves: List[float]) -> List[WaveReport]:
+        reports: List[WaveReport] = []
+        for index, wave in enumerate(plan_waves(tenant_ids, waves)):
+            print(f"Starting wave {index} with {len(wave)} tenant(s) ...")
+            report = self.run_wave(WaveReport(index=index, tenant_ids=wave))
+            reports.append(report)
+            print(
+                f"Finished wave {index}: {len(report.succeeded)} succeeded, {len(report.skipped)} skipped, "
+                f"{len(report.current)} current, {len(report.busy)} busy, {len(report.failed)} failed."
+            )
+
+            if report.halted:
+                print(
+                    f"Halting rollout, wave {index} failure rate {report.failure_rate:.0%} "
+                    f"exceeds {self.max_failure_rate:.0%}."
+                )
+                break
+
+        return reports
+
+
+def detect_drift(
+    function_name: str, tenant_ids: List[str], concurrency: int = DEFAULT_CONCURRENCY
+) -> Dict[str, Dict]:
+    """Detects drift of each tenant's stack, the reports are written to their drift items."""
+    invoker = Invoker(function_name=function_name, concurrency=concurrency)
+
+    def detect(tenant_id: str):
+        try:
+            return invoker.invoke({"type": "drift", "tenantId": tenant_id})
+        except Exception as e:
+            return {"tenantId": tenant_id, "result": "failed", "error": str(e)}
+
+    results: Dict[str, Dict] = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for tenant_id, result in zip(tenant_ids, executor.map(detect, tenant_ids)):
+            results[tenant_id] = result
+            print(
+                f"{tenant_id}: {result['result']}"
+                + (
+                    f" ({result['resources']} resource(s))"
+                    if result["result"] == "drifted"
+                    else f" ({result['error']})"
+                    if result["result"] == "failed"
+                    else ""
+                )
+            )
+
+    return results
+
+
+def migrate(
+    function_name: str, tenant_ids: List[str], concurrency: int = DEFAULT_CONCURRENCY
+) -> Dict[str, Dict]:
+    """Migrates each tenant's stack into its cell's stack."""
+    invoker = Invoker(function_name=function_name, concurrency=concurrency)
+
+    def migrate_tenant(tenant_id: str):
+        try:
+            return invoker.invoke({"type": "migrate", "tenantId": tenant_id})
+        except Exception as e:
+            return {"tenantId": tenant_id, "result": "failed", "error": str(e)}
+
+    results: Dict[str, Dict] = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for tenant_id, result in zip(
+            tenant_ids, executor.map(migrate_tenant, tenant_ids)
+        ):
+            results[tenant_id] = result
+            print(
+                f"{tenant_id}: {result['result']}"
+                + (
+                    f" ({result['cell']})"
+                    if result["result"] == "succeeded"
+                    else f" ({result['error']})"
+                    if result["result"] == "failed"
+                    else ""
+                )
+            )
+
+    return results
+
+
+def parse_waves(value: str) -> List[float]:
+    waves = [float(fraction) for fraction in value.split(",")]
+    if any(not 0 < fraction <= 1 for fraction in waves) or waves != sorted(waves):
+        raise argparse.ArgumentTypeError(
+            "Waves must be ascending cumulative fractions in (0, 1], e.g. 0.05,1"
+        )
+    return waves
+
+
+def add_function_name_argument(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--function-name",
+        default=os.environ.get("INFRA_MANAGER_FUNCTION_NAME"),
+        required="INFRA_MANAGER_FUNCTION_NAME" not in os.environ,
+    )
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser(
+        "stale", help="List tenants whose stack is stale with this build's program"
+    )
+    subparsers.add_parser(
+        "index", help="Index stacks stamped before the fingerprint index existed"
+    )
+
+    prune = subparsers.add_parser(
+        "prune", help="Keep the last history entries and backups of every stack"
+    )
+    prune.add_argument("--keep", type=int, default=retention.keep_from_env())
+
+    drift = subparsers.add_parser("drift", help="Detect drift of every tenant's stack")
+    add_function_name_argument(drift)
+    drift.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    drift.add_argument(
+        "--tenant", action="append", dest="tenant_ids", help="Only these tenants"
+    )
+
+    replenish = subparsers.add_parser(
+        "replenish", help="Top the warm pool of pre-provisioned resources back up"
+    )
+    add_function_name_argument(replenish)
+    replenish.add_argument(
+        "--size", type=int, help="Pool size (default: the function's WARM_POOL_SIZE)"
+    )
+
+    migrate_ = subparsers.add_parser(
+        "migrate", help="Migrate tenants' own stacks into their cell's stack"
+    )
+    add_function_name_argument(migrate_)
+    migrate_.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    migrate_.add_argument(
+        "--tenant", action="append", dest="tenant_ids", help="Only these tenants"
+    )
+
+    stagger_ = subparsers.add_parser(
+        "stagger", help="Plan flexible windows for sync schedules firing together"
+    )
+    stagger_.add_argument(
+        "--max-per-minute", type=int, default=stagger.DEFAULT_MAX_PER_MINUTE
+    )
+    stagger_.add_argument(
+        "--horizon-days",
+        type=int,
+        default=stagger.DEFAULT_HORIZON.days,
+        help="Days of fire times planned from (default: a week)",
+    )
+    stagger_.add_argument(
+        "--apply",
+        action="store_true",
+        help="Save the plan and reconcile the tenants whose window changed",
+    )
+    stagger_.add_argument(
+        "--function-name", default=os.environ.get("INFRA_MANAGER_FUNCTION_NAME")
+    )
+    stagger_.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+
+    slots = subparsers.add_parser(
+        "slots", help="Compare sync slot schedules to the tenants registered in slots"
+    )
+    slots.add_argument(
+        "--apply",
+        action="store_true",
+        help="Create missing schedules and delete those of slots without tenants",
+    )
+    slots.add_argument(
+        "--function-name", default=os.environ.get("INFRA_MANAGER_FUNCTION_NAME")
+    )
+
+    reconcile = subparsers.add_parser(
+        "reconcile", help="Reconcile tenants whose stack is stale"
+    )
+    add_function_name_argument(reconcile)
+    reconcile.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    reconcile.add_argument(
+        "--waves",
+        type=parse_waves,
+        default=list(DEFAULT_WAVES),
+        help="Cumulative fraction of tenants per wave (default: 0.05,1)",
+    )
+    reconcile.add_argument(
+        "--max-failure-rate", type=float, default=DEFAULT_MAX_FAILURE_RATE
+    )
+    reconcile.add_argument("--min-samples", type=int, default=DEFAULT_MIN_SAMPLES)
+    reconcile.add_argument(
+        "--tenant", action="append", dest="tenant_ids", help="Only these tenants"
+    )
+    reconcile.add_argument(
+        "--all",
+        action="store_true",
+        help="Update every tenant's stack, even if its program fingerprint is current",
+    )
+
+    args = parser.parse_args(argv)
+    if args.command == "stagger" and args.apply and args.function_name is None:
+        parser.error("stagger --apply requires --function-name")
+    if args.command == "slots" and args.function_name is None:
+        parser.error("slots requires --function-name")
+
+    if args.command == "stale":
+        current = fingerprint.current()
+        print(f"Current program fingerprint: {current}")
+        for tenant_id, stamped in stale_tenant_ids(current).items():
+            print(f"{tenant_id}\t{stamped}")
+        return 0
+
+    if args.command == "index":
+        print(f"Indexed {index_fingerprints()} stack(s).")
+        return 0
+
+    if args.command == "prune":
+        reports = retention.prune_project(
+            s3=boto3.client("s3"),
+            bucket=Resource.PulumiBucket.name,
+            project_name=infra_project_name,
+            keep=args.keep,
+        )
+        for stack_name, report in sorted(reports.items()):
+            if report.deleted_objects:
+                print(
+                    f"{stack_name}: deleted {report.deleted_objects} object(s) ({report.bytes_reclaimed} bytes)"
+                )
+
+        total = sum(reports.values(), retention.RetentionReport())
+        print(
+            f"Pruned {len(reports)} stack(s), deleted {total.deleted_objects} object(s), "
+            f"reclaimed {total.bytes_reclaimed} bytes."
+        )
+        return 0
+
+    if args.command == "drift":
+        ids = sorted(args.tenant_ids or tenant_ids())
+        print(f"Detecting drift of {len(ids)} tenant(s) ...")
+
+        results = detect_drift(
+            function_name=args.function_name,
+            tenant_ids=ids,
+            concurrency=args.concurrency,
+        )
+        counts = Counter(result["result"] for result in results.values())
+        print(
+            ", ".join(f"{count} {result}" for result, count in sorted(counts.items()))
+        )
+
+        return 1 if counts["failed"] else 0
+
+    if args.command == "replenish":
+        result = Invoker(function_name=args.function_name, concurrency=1).invoke(
+            {"type": "replenish", "size": args.size}
+        )
+        print(
+            f"Provisioned {result['provisioned']} and discarded {result['discarded']} set(s), "
+            f"{result['available']} available."
+        )
+        return 0
+
+    if args.command == "migrate":
+        ids = sorted(args.tenant_ids or unmigrated_tenant_ids())
+        print(f"Migrating {len(ids)} tenant(s) ...")
+
+        results = migrate(
+            function_name=args.function_name,
+            tenant_ids=ids,
+            concurrency=args.concurrency,
+        )
+        counts = Counter(result["result"] for result in results.values())
+        print(
+            ", ".join(f"{count} {result}" for result, count in sorted(counts.items()))
+        )
+
+        return 1 if counts["failed"] else 0
+
+    if args.command == "stagger":
+        slots = sync_slots()
+        start = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+        plans = stagger.plan(
+            slots=Counter(slots.values()),
+            start=start,
+            max_per_minute=args.max_per_minute,
+            horizon=timedelta(days=args.horizon_days),
+        )
+
+        for slot_plan in plans:
+            print(
+                f"cron({slot_plan.slot.cron_expression}) {slot_plan.slot.timezone}: "
+                f"{slot_plan.tenants} tenant(s), {slot_plan.window_minutes} minute window"
+            )
+        for label, staggered in (("Before", False), ("After", True)):
+            peak = stagger.peak(plans, start=start, staggered=staggered)
+            print(
+                f"{label}: peak of {peak.invocations:.1f} sync invocation(s) per minute"
+                + (f" at {peak.at.isoformat()}" if peak.at is not None else "")
+            )
+
+        if not args.apply:
+            return 0
+
+        changed = stagger.save(plans)
+        if sync_dispatch:
+            schedules = slot_schedules(args.function_name)
+            registered = set(registered_slots().values())
+            for slot in sorted(changed & registered, key=lambda slot: slot.key):
+                schedules.put(slot)
+            print(
+                f"Saved the plan, updated {len(changed & registered)} slot schedule(s)."
+            )
+            return 0
+
+        ids = sorted(tenant_id for tenant_id, slot in slots.items() if slot in changed)
+        print(f"Saved the plan, reconciling {len(ids)} tenant(s) ...")
+        reports = Reconciler(
+            function_name=args.function_name, force=True, concurrency=args.concurrency
+        ).run(ids, list(DEFAULT_WAVES))
+        return 1 if any(report.failed or report.halted for report in reports) else 0
+
+    if args.command == "slots":
+        schedules = slot_schedules(args.function_name)
+        registered = Counter(registered_slots().values())
+        names = set(schedules.names())
+        expected = {dispatch.schedule_name(slot): slot for slot in registered}
+
+        missing = [slot for name, slot in expected.items() if name not in names]
+        orphaned = sorted(names - expected.keys())
+        for slot, tenants in sorted(registered.items(), key=lambda item: item[0].key):
+            print(
+                f"cron({slot.cron_expression}) {slot.timezone}: {tenants} tenant(s)"
+                + (", no schedule" if slot in missing else "")
+            )
+        print(
+            f"{len(registered)} slot(s), {len(missing)} missing and {len(orphaned)} orphaned schedule(s)."
+        )
+
+        if args.apply:
+            for slot in missing:
+                schedules.put(slot)
+            for name in orphaned:
+                schedules.delete_named(name)
+            print(f"Created {len(missing)} and deleted {len(orphaned)} schedule(s).")
+        return 0
+
+    ids = sorted(
+        args.tenant_ids
+        or (tenant_ids() if args.all else list(stale_tenant_ids().keys()))
+    )
+    print(f"Found {len(ids)} tenant(s) to reconcile.")
+
+    reports = Reconciler(
+        function_name=args.function_name,
+        force=args.all,
+        concurrency=args.concurrency,
+        max_failure_rate=args.max_failure_rate,
+        min_samples=args.min_samples,
+    ).run(ids, args.waves)
+
+    failed = {
+        tenant_id: error
+        for report in reports
+        for tenant_id, error in report.failed.items()
+    }
+    for tenant_id, error in failed.items():
+        print(f"{tenant_id}: {error}", file=sys.stderr)
+
+    return 1 if failed or any(report.halted for report in reports) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
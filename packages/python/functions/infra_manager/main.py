@@ -1,6 +1,8 @@
+from contextlib import contextmanager
+from datetime import datetime, timezone
 import json
-from importlib.metadata import version
 import os
+from typing import List, Optional
 
 from aws_lambda_powertools import Logger, Tracer
 from aws_lambda_powertools.utilities.batch import (
@@ -9,158 +11,1266 @@ from aws_lambda_powertools.utilities.batch import (
     process_partial_response,
 )
 from aws_lambda_powertools.utilities.typing import LambdaContext
+import boto3
+from botocore.config import Config
 import pulumi
 from sst import Resource
 
-from program import inline
-from utils import is_prod_stage, naming
-from models import InputDynamoDBStreamRecord
+from program import cell, fingerprint, inline, preflight
+from program.changes import Change, classify
+from program.drift import DriftCollector
+from program.preflight import PreflightError
+from program.progress import DeploymentProgressReporter
+from utils import (
+    cells,
+    default_tags,
+    dispatch,
+    dynamo,
+    infra_project_name,
+    is_prod_stage,
+    mirror,
+    pool,
+    preload,
+    retention,
+    sequence,
+    stagger,
+    sync_dispatch,
+)
+from utils.deadline import Deadline, DeadlineExceededError
+from utils.lease import Lease, LeaseHeldError, LeaseLostError
+from utils.recovery import recover_stack
+from models import (
+    DispatchEvent,
+    Drift,
+    DriftEvent,
+    Input,
+    InputDynamoDBStreamRecord,
+    MigrateEvent,
+    Output,
+    PreflightFailure,
+    PreflightIssue,
+    ReconcileEvent,
+    ReplenishEvent,
+    WarmupEvent,
+)
 
 processor = BatchProcessor(
     event_type=EventType.DynamoDBStreams, model=InputDynamoDBStreamRecord
 )
 logger = Logger()
 tracer = Tracer()
+s3 = boto3.client("s3")
+
+# Time left for the replenisher to start provisioning another pooled set
+REPLENISH_MARGIN_MS = 60_000
+# Time left for a dispatch to start another sync, beyond the longest sync so far
+DISPATCH_MARGIN_MS = 30_000
 
 
 @logger.inject_lambda_context
 @tracer.capture_lambda_handler
 def handler(event, context: LambdaContext):
+    if event.get("type") == "reconcile":
+        return reconcile_handler(
+            event=ReconcileEvent.model_validate(event), context=context
+        )
+
+    if event.get("type") == "drift":
+        return drift_handler(event=DriftEvent.model_validate(event), context=context)
+
+    if event.get("type") == "replenish":
+        return replenish_handler(
+            event=ReplenishEvent.model_validate(event), context=context
+        )
+
+    if event.get("type") == "warmup":
+        return warmup_handler(event=WarmupEvent.model_validate(event), context=context)
+
+    if event.get("type") == "migrate":
+        return migrate_handler(
+            event=MigrateEvent.model_validate(event), context=context
+        )
+
+    if event.get("type") == "dispatch":
+        return dispatch_handler(
+            event=DispatchEvent.model_validate(event), context=context
+        )
+
     return process_partial_response(
         event=event, record_handler=record_handler, processor=processor, context=context
     )
 
 
 @tracer.capture_method
-def record_handler(record: InputDynamoDBStreamRecord):
+def reconcile_handler(event: ReconcileEvent, context: LambdaContext):
+    """
+    Runs a full update of a tenant's stack with its current input, regardless of the
+    stream, i.e. to roll out program or provider changes across the fleet.
+    """
+    tenant_id = event.tenant_id
+    logger.info(f"Reconciling stack for tenant {tenant_id} ...")
+
+    item = dynamo.table.get_item(
+        Key=dynamo.primary_key(tenant_id, Resource.Dynamo.keyLiterals.INPUT),
+        ConsistentRead=True,
+    ).get("Item")
+    if item is None:
+        logger.info(f"Tenant {tenant_id} has no input, nothing to reconcile.")
+        return {"tenantId": tenant_id, "result": "skipped"}
+
+    deadline = Deadline(
+        context=context,
+        on_expire=lambda reason: logger.warning(
+            f"Interrupting stack operation, {reason} ..."
+        ),
+    )
+    lease = Lease(
+        tenant_id=tenant_id, owner=context.aws_request_id, on_lost=deadline.expire
+    )
+
+    logger.info(f"Acquiring lease on stack for tenant {tenant_id} ...")
+    try:
+        with lease:
+            logger.info(
+                f"Successfully acquired lease on stack for tenant {tenant_id} (fencing token {lease.token})."
+            )
+
+            if (
+                not event.force
+                and lease.item.get("programFingerprint") == fingerprint.current()
+            ):
+                logger.info(
+                    f"Stack for tenant {tenant_id} is already up to date with this build."
+                )
+                return {"tenantId": tenant_id, "result": "current"}
+
+            operate_stack(
+                tenant_id=tenant_id,
+                _input=Input.model_validate(item),
+                is_destroy=False,
+                lease=lease,
+                deadline=deadline,
+            )
+    except (LeaseHeldError, cells.CellMigratingError) as e:
+        # The stream is already operating on the stack, the reconciler retries it later
+        logger.info(str(e))
+        return {"tenantId": tenant_id, "result": "busy"}
+
+    logger.info(f"Successfully reconciled stack for tenant {tenant_id}.")
+    return {"tenantId": tenant_id, "result": "succeeded"}
+
+
+@tracer.capture_method
+def drift_handler(event: DriftEvent, context: LambdaContext):
+    """
+    Detects drift of a tenant's stack with a refresh-and-preview, which changes neither the
+    resources nor the stack's state, and writes a compact report of the drifted resources
+    to the tenant's drift item (INFRA#DRIFT).
+    """
+    tenant_id = event.tenant_id
+    logger.info(f"Detecting drift of stack for tenant {tenant_id} ...")
+
+    item = dynamo.table.get_item(
+        Key=dynamo.primary_key(tenant_id, Resource.Dynamo.keyLiterals.INPUT),
+        ConsistentRead=True,
+    ).get("Item")
+    deployed = "Item" in dynamo.table.get_item(
+        Key=dynamo.primary_key(tenant_id, Resource.Dynamo.keyLiterals.OUTPUT),
+        ProjectionExpression="#pk",
+        ExpressionAttributeNames={"#pk": Resource.Dynamo.hashKey},
+    )
+    if item is None or not deployed:
+        logger.info(f"Tenant {tenant_id} has no deployed stack, nothing to detect.")
+        return {"tenantId": tenant_id, "result": "skipped"}
+
+    placement = cells.place(tenant_id)
+    project_name, stack_name = project_and_stack_name(placement)
+    deadline = Deadline(
+        context=context,
+        on_expire=lambda reason: logger.warning(
+            f"Interrupting drift detection, {reason} ..."
+        ),
+    )
+    collector = DriftCollector()
+    try:
+        with state_backend(project_name, stack_name, read_only=True) as backend_url:
+            stack = initialize_stack(
+                tenant_id=tenant_id,
+                _input=Input.model_validate(item),
+                backend_url=backend_url,
+                placement=placement,
+            )
+
+            with deadline:
+                stack.preview(
+                    refresh=True,
+                    diff=True,
+                    on_output=logger.info,
+                    on_error=logger.error,
+                    on_event=collector,
+                    **tenant_targets(placement, project_name),
+                )
+    except pulumi.automation.CommandError as e:
+        if deadline.expired:
+            raise DeadlineExceededError(
+                "Drift detection was interrupted before the function timeout.",
+                forced=deadline.forced,
+            ) from e
+
+        logger.error(f"Drift detection error: {e.name}")
+        raise
+
+    drift = Drift(
+        pk=dynamo.tenant_key(tenant_id),
+        sk=dynamo.infra_key(Resource.Dynamo.keyLiterals.DRIFT),
+        resources=collector.resources,
+        detected_at=datetime.now(timezone.utc),
+    )
+    for resource in drift.resources:
+        logger.warning(
+            f"Drifted resource ({resource.op}): {resource.urn} {', '.join(resource.diffs)}"
+        )
+
+    logger.info("Writing drift report ...")
+    dynamo.table.put_item(Item=drift.model_dump(mode="json", by_alias=True))
+    logger.info("Successfully wrote drift report.")
+
+    return {
+        "tenantId": tenant_id,
+        "result": "drifted" if drift.drifted else "clean",
+        "resources": len(drift.resources),
+    }
+
+
+@tracer.capture_method
+def warmup_handler(event: WarmupEvent, context: LambdaContext):
+    """
+    Preloads what the container's init phase didn't (or failed to), i.e. after a deploy
+    or ahead of a burst, so the next record's operation starts its engine right away.
+    """
+    logger.info("Warming up ...")
+    timings = preload.preload()
+    logger.info(f"Successfully warmed up ({timings}).")
+    return {"result": "warm", "stages": timings}
+
+
+@tracer.capture_method
+def replenish_handler(event: ReplenishEvent, context: LambdaContext):
+    """
+    Tops the warm pool back up to its size (WARM_POOL_SIZE, unless the event overrides it),
+    or discards the sets beyond it.
+    """
+    size = event.size if event.size is not None else pool.size_from_env()
+    logger.info(f"Replenishing warm pool to {size} set(s) ...")
+
+    report = warm_pool().replenish(
+        size=size,
+        has_time=lambda: context.get_remaining_time_in_millis() > REPLENISH_MARGIN_MS,
+    )
+
+    logger.info(
+        f"Successfully replenished warm pool, provisioned {len(report.provisioned)} and discarded {len(report.discarded)} set(s), {report.available} available."
+    )
+    return {
+        "result": "succeeded",
+        "available": report.available,
+        "provisioned": len(report.provisioned),
+        "discarded": len(report.discarded),
+    }
+
+
+@tracer.capture_method
+def dispatch_handler(event: DispatchEvent, context: LambdaContext):
+    """
+    Syncs the tenants registered in a sync slot (SYNC_DISPATCH_CONCURRENCY at once, read in
+    batches of SYNC_DISPATCH_BATCH_SIZE), on the slot's schedule. A dispatch running out of
+    time continues in another invocation with the slot's remaining tenants.
+    """
+    slot = stagger.Slot(cron_expression=event.cron_expression, timezone=event.timezone)
+    concurrency = dispatch.concurrency_from_env()
+    logger.info(
+        f"Dispatching syncs of slot cron({slot.cron_expression}) {slot.timezone}"
+        + (f" after tenant {event.after_tenant_id}" if event.after_tenant_id else "")
+        + " ..."
+    )
+
+    # Syncs are awaited, a client retry would start another sync of the tenant while the
+    # first one is still running
+    lambda_ = boto3.client(
+        "lambda",
+        config=Config(
+            read_timeout=900,
+            retries={"max_attempts": 0},
+            max_pool_connections=concurrency,
+        ),
+    )
+
+    def sync(tenant_id: str):
+        response = lambda_.invoke(
+            FunctionName=Resource.PapercutMfSync.name,
+            InvocationType="RequestResponse",
+            Payload=json.dumps({"tenantId": tenant_id}).encode(),
+        )
+        if "FunctionError" in response:
+            raise RuntimeError(
+                f"{response['FunctionError']}: {response['Payload'].read().decode()}"
+            )
+
+    report = dispatch.Dispatcher(
+        sync=sync, concurrency=concurrency, batch_size=dispatch.batch_size_from_env()
+    ).run(
+        slot=slot,
+        has_time=lambda longest_ms: (
+            context.get_remaining_time_in_millis() > longest_ms + DISPATCH_MARGIN_MS
+        ),
+        after_tenant_id=event.after_tenant_id,
+    )
+
+    for tenant_id, error in report.failed.items():
+        logger.error(f"Sync of tenant {tenant_id} failed: {error}")
+
+    if report.continued:
+        logger.info(
+            f"Continuing dispatch after tenant {report.after_tenant_id} in another invocation ..."
+        )
+        lambda_.invoke(
+            FunctionName=context.invoked_function_arn,
+            InvocationType="Event",
+            Payload=event.model_copy(update={"after_tenant_id": report.after_tenant_id})
+            .model_dump_json(by_alias=True, exclude_none=True)
+            .encode(),
+        )
+
+    logger.info(
+        f"Dispatched syncs, {len(report.synced)} succeeded and {len(report.failed)} failed."
+    )
+    return {
+        "result": "continued" if report.continued else "succeeded",
+        "synced": len(report.synced),
+        "failed": len(report.failed),
+    }
+
+
+@tracer.capture_method
+def migrate_handler(event: MigrateEvent, context: LambdaContext):
+    """
+    Moves a tenant's resources from its own stack into its cell's stack (TENANT_CELLS), by
+    exporting and importing their state, so none of them are recreated.
+    """
+    tenant_id = event.tenant_id
+    count = cells.count_from_env()
+    if count == 0:
+        logger.info("Cells are disabled, nothing to migrate.")
+        return {"tenantId": tenant_id, "result": "skipped"}
+
+    item = dynamo.table.get_item(
+        Key=dynamo.primary_key(tenant_id, Resource.Dynamo.keyLiterals.INPUT),
+        ConsistentRead=True,
+    ).get("Item")
+    if item is None:
+        logger.info(f"Tenant {tenant_id} has no input, nothing to migrate.")
+        return {"tenantId": tenant_id, "result": "skipped"}
+
+    deadline = Deadline(
+        context=context,
+        on_expire=lambda reason: logger.warning(
+            f"Interrupting stack migration, {reason} ..."
+        ),
+    )
+    lease = Lease(
+        tenant_id=tenant_id, owner=context.aws_request_id, on_lost=deadline.expire
+    )
+
+    logger.info(f"Acquiring lease on stack for tenant {tenant_id} ...")
+    try:
+        with lease:
+            membership = cells.membership(tenant_id)
+            if membership is not None and not membership.get("migrating"):
+                logger.info(
+                    f"Tenant {tenant_id} is already a member of cell {membership['cell']}."
+                )
+                return {"tenantId": tenant_id, "result": "current"}
+
+            # An interrupted migration is resumed into the cell it started with
+            placement = cells.Placement(
+                tenant_id=tenant_id,
+                cell=membership["cell"]
+                if membership is not None
+                else cells.cell_of(tenant_id, count),
+            )
+            cell_lease = cells.CellLease(
+                cell=placement.cell, owner=lease.owner, on_lost=deadline.expire
+            )
+
+            logger.info(f"Acquiring lease on cell {placement.cell} ...")
+            with cell_lease:
+                migrate_stack(
+                    _input=Input.model_validate(item),
+                    placement=placement,
+                    lease=lease,
+                    cell_lease=cell_lease,
+                    deadline=deadline,
+                )
+    except LeaseHeldError as e:
+        logger.info(str(e))
+        return {"tenantId": tenant_id, "result": "busy"}
+
+    logger.info(f"Successfully migrated stack for tenant {tenant_id}.")
+    return {"tenantId": tenant_id, "result": "succeeded", "cell": placement.cell}
+
+
+@tracer.capture_method
+def record_handler(record: InputDynamoDBStreamRecord, lambda_context: LambdaContext):
     logger.info(f"Processing event stream record {record.eventID} ...")
 
     tenant_id = record.dynamodb.Keys.tenant_id
     is_destroy = record.eventName == "REMOVE"
+    deployment_id = (
+        record.dynamodb.OldImage if is_destroy else record.dynamodb.NewImage
+    ).deployment_id
+
+    deadline = Deadline(
+        context=lambda_context,
+        on_expire=lambda reason: logger.warning(
+            f"Interrupting stack operation, {reason} ..."
+        ),
+    )
+    lease = Lease(
+        tenant_id=tenant_id,
+        owner=lambda_context.aws_request_id,
+        # Stop operating on the stack as soon as another operation took it over
+        on_lost=deadline.expire,
+    )
+
+    logger.info(f"Acquiring lease on stack for tenant {tenant_id} ...")
+    with lease:
+        logger.info(
+            f"Successfully acquired lease on stack for tenant {tenant_id} (fencing token {lease.token})."
+        )
+
+        # With a parallelization factor, retries and splits can deliver records out of order
+        skip_reason = sequence.skip_reason(
+            sequence_number=record.dynamodb.SequenceNumber,
+            deployment_id=deployment_id,
+            is_destroy=is_destroy,
+            applied=sequence.AppliedRecord.from_item(lease.item),
+        )
+        if skip_reason is not None:
+            logger.info(
+                f"Skipping event stream record {record.eventID}, {skip_reason}."
+            )
+            return
+
+        _input = record.dynamodb.OldImage if is_destroy else record.dynamodb.NewImage
+        with deployment_progress(tenant_id=tenant_id, _input=_input) as progress:
+            progress.phase("started")
+            try:
+                operate_stack(
+                    tenant_id=tenant_id,
+                    _input=_input,
+                    is_destroy=is_destroy,
+                    lease=lease,
+                    deadline=deadline,
+                    previous_input=record.dynamodb.OldImage
+                    if record.eventName == "MODIFY"
+                    else None,
+                    progress=progress,
+                )
+            except PreflightError as e:
+                # Applying the input again would fail the same way, so it isn't retried
+                logger.error(f"Input failed preflight: {e}")
+                progress.phase("failed", error=str(e))
+            except (LeaseLostError, DeadlineExceededError):
+                # The record is operated on again, which reports its own progress
+                raise
+            except Exception as e:
+                progress.phase("failed", error=str(e))
+                raise
+            else:
+                progress.phase("succeeded")
+
+        sequence.record_applied(
+            lease=lease,
+            sequence_number=record.dynamodb.SequenceNumber,
+            deployment_id=deployment_id,
+        )
+        logger.info(f"Successfully applied event stream record {record.eventID}.")
+
+
+def operate_stack(
+    tenant_id: str,
+    _input: Input,
+    is_destroy: bool,
+    lease: Lease,
+    deadline: Deadline,
+    previous_input: Optional[Input] = None,
+    progress: Optional[DeploymentProgressReporter] = None,
+):
+    # Only a tenant's first update can place it in a cell
+    placement = cells.place(
+        tenant_id=tenant_id, lease=lease if not is_destroy else None
+    )
+
+    if not is_destroy:
+        issues = preflight.check(placement=placement, _input=_input)
+        if issues:
+            fail_preflight(
+                lease=lease, tenant_id=tenant_id, _input=_input, issues=issues
+            )
+
+    if placement.cell is None:
+        return operate_placed_stack(
+            placement=placement,
+            _input=_input,
+            is_destroy=is_destroy,
+            lease=lease,
+            deadline=deadline,
+            previous_input=previous_input,
+            progress=progress,
+        )
+
+    cell_lease = cells.CellLease(
+        cell=placement.cell, owner=lease.owner, on_lost=deadline.expire
+    )
+    logger.info(f"Acquiring lease on cell {placement.cell} ...")
+    with cell_lease:
+        logger.info(
+            f"Successfully acquired lease on cell {placement.cell} (fencing token {cell_lease.token})."
+        )
+
+        if not is_destroy and cells.membership(tenant_id) is None:
+            cells.join(lease=lease, cell_lease=cell_lease, tenant_id=tenant_id)
+            logger.info(f"Tenant {tenant_id} joined cell {placement.cell}.")
+
+        operate_placed_stack(
+            placement=placement,
+            _input=_input,
+            is_destroy=is_destroy,
+            lease=lease,
+            deadline=deadline,
+            previous_input=previous_input,
+            cell_lease=cell_lease,
+            progress=progress,
+        )
+
+
+def operate_placed_stack(
+    placement: cells.Placement,
+    _input: Input,
+    is_destroy: bool,
+    lease: Lease,
+    deadline: Deadline,
+    previous_input: Optional[Input] = None,
+    cell_lease: Optional[cells.CellLease] = None,
+    progress: Optional[DeploymentProgressReporter] = None,
+):
+    tenant_id = placement.tenant_id
+    if progress is None:
+        progress = deployment_progress(tenant_id=tenant_id, _input=None)
+    project_name, stack_name = project_and_stack_name(placement)
+    pooled = claim_pooled_resources(tenant_id, _input) if not is_destroy else None
+
+    with state_backend(project_name, stack_name) as backend_url:
+        stack = initialize_stack(
+            tenant_id=tenant_id,
+            _input=_input,
+            backend_url=backend_url,
+            pooled=pooled,
+            placement=placement,
+        )
+
+        logger.info("Checking stack for stale locks and pending operations ...")
+        report = recover_stack(
+            stack=stack,
+            s3=s3,
+            bucket=Resource.PulumiBucket.name,
+            project_name=project_name,
+            # The state mirror manages the stack's locks
+            release_locks=backend_url is None,
+            # A destroy deletes dynamic resources with their own (legacy) provider
+            resource_prefix=placement.resource_prefix if not is_destroy else None,
+        )
+        if report.repaired:
+            for lock in report.released_locks:
+                logger.warning(
+                    f"Released stale lock {lock.key} (hostname: {lock.hostname}, pid: {lock.pid}, acquired: {lock.timestamp.isoformat()})."
+                )
+            for operation in report.cleared_operations:
+                logger.warning(f"Cleared pending operation: {operation}.")
+            for operation in report.imported_operations:
+                logger.warning(f"Imported pending create: {operation}.")
+            for urn in report.forgotten_resources:
+                logger.warning(
+                    f"Forgot dynamic resource {urn}, the update adopts it under its printdesk type."
+                )
+
+            if report.refresh_targets:
+                logger.info("Refreshing repaired resources ...")
+                stack.refresh(
+                    target=report.refresh_targets,
+                    on_output=logger.info,
+                    on_error=logger.error,
+                )
+                logger.info("Successfully refreshed repaired resources.")
+        logger.info("Stack is ready for operation.")
+
+        change: Optional[Change] = None
+        if (
+            previous_input is not None
+            and not report.repaired
+            # Adopting pooled resources imports them, which only a full update does
+            and pooled is None
+            # Only diff against the previous input if it's what the stack was last updated with
+            and sequence.AppliedRecord.from_item(lease.item).deployment_id
+            == previous_input.deployment_id
+        ):
+            change = classify(
+                old=previous_input,
+                new=_input,
+                project_name=project_name,
+                placement=placement,
+            )
+            logger.info(
+                f"Changed input fields: {', '.join(change.fields) or 'none'}, "
+                + (
+                    f"targeting {len(change.targets)} resource(s)."
+                    if change.targets is not None
+                    else "full update required."
+                )
+            )
+
+        if not is_destroy:
+            # Only a full update applies the whole program
+            is_full_update = change is None or change.targets is None
+            targets = (
+                {"target": change.targets, "target_dependents": True}
+                if change is not None and change.targets is not None
+                # In a cell, a full update is one of the tenant's resources
+                else tenant_targets(placement, project_name)
+            )
+            try:
+                if change is not None and change.is_noop:
+                    logger.info("No changes affect the stack, skipping update.")
+                    outputs = stack.outputs()
+                else:
+                    logger.info("Updating stack ...")
+                    progress.phase("updating")
+                    with deadline:
+                        result = stack.up(
+                            on_output=logger.info,
+                            on_error=logger.error,
+                            on_event=progress,
+                            **targets,
+                        )
+                    logger.info(
+                        f"Update summary: \n{json.dumps(obj=result.summary.resource_changes, indent=2)}"
+                    )
+
+                    if result.summary.result != "succeeded":
+                        error_message = (
+                            f"Unexpected stack update result: {result.summary.result}"
+                        )
+                        logger.error(error_message)
+                        raise RuntimeError(error_message)
+
+                    outputs = result.outputs
+
+                logger.info("Writing output ...")
+                papercut_mf_api_tunnel_id = tenant_output(
+                    outputs=outputs, placement=placement, key="papercutMfApiTunnelId"
+                )
+                lease.put_item(
+                    Output(
+                        pk=dynamo.tenant_key(tenant_id),
+                        sk=dynamo.infra_key(Resource.Dynamo.keyLiterals.OUTPUT),
+                        gsi1_pk=dynamo.tenant_deployment_key(
+                            tenant_id, _input.deployment_id
+                        ),
+                        gsi1_sk=dynamo.infra_key(Resource.Dynamo.keyLiterals.OUTPUT),
+                        papercut_mf_api_tunnel_id=papercut_mf_api_tunnel_id,
+                        papercut_mf_pooled_set_id=pooled.set_id
+                        if pooled is not None
+                        else adopted_pooled_set_id(tenant_id)
+                        if _input.papercut_mf_config.enabled
+                        else None,
+                        deployed_at=datetime.now(timezone.utc),
+                    ).model_dump(mode="json", by_alias=True)
+                )
+                logger.info("Successfully wrote output.")
+
+                register_sync(lease=lease, tenant_id=tenant_id, _input=_input)
+
+                if pooled is not None:
+                    # The stack manages the pooled resources now
+                    lease.delete_item(
+                        dynamo.primary_key(tenant_id, Resource.Dynamo.keyLiterals.POOL)
+                    )
+                    logger.info(f"Successfully adopted pooled set {pooled.set_id}.")
 
+                if is_full_update:
+                    stamp_fingerprint(stack=stack, lease=lease, placement=placement)
+
+                prune_stack_history(project_name=project_name, stack_name=stack_name)
+            except pulumi.automation.CommandError as e:
+                if lease.lost or (cell_lease is not None and cell_lease.lost):
+                    raise LeaseLostError(
+                        "Stack update was interrupted, its lease was taken over."
+                    ) from e
+                if deadline.expired:
+                    release_interrupted_stack(stack=stack, deadline=deadline)
+                    raise DeadlineExceededError(
+                        "Stack update was interrupted before the function timeout.",
+                        forced=deadline.forced,
+                    ) from e
+
+                logger.error(f"Stack update error: {e.name}")
+                raise
+            except Exception:
+                logger.error("Unexpected stack update error")
+                raise
+        else:
+            try:
+                logger.info("Destroying stack ...")
+                progress.phase("destroying")
+                with deadline:
+                    result = stack.destroy(
+                        on_output=logger.info,
+                        on_error=logger.error,
+                        on_event=progress,
+                        **tenant_targets(placement, project_name),
+                    )
+                logger.info(
+                    f"Destroy summary: \n{json.dumps(result.summary.resource_changes, indent=2)}"
+                )
+
+                if result.summary.result != "succeeded":
+                    error_message = (
+                        f"Unexpected stack destroy result: {result.summary.result}"
+                    )
+                    logger.error(error_message)
+                    raise RuntimeError(error_message)
+
+                # A cell's stack is shared with the cell's other tenants
+                if not is_prod_stage and cell_lease is None:
+                    stack.workspace.remove_stack(stack_name=stack_name)
+
+                logger.info("Deleting output ...")
+                lease.delete_item(
+                    dynamo.primary_key(tenant_id, Resource.Dynamo.keyLiterals.OUTPUT)
+                )
+                logger.info("Successfully deleted output.")
+
+                register_sync(lease=lease, tenant_id=tenant_id, _input=None)
+                fingerprint.clear_fingerprint(lease=lease)
+
+                if cell_lease is not None:
+                    cells.leave(lease=lease, cell_lease=cell_lease, tenant_id=tenant_id)
+                    logger.info(f"Tenant {tenant_id} left cell {placement.cell}.")
+            except pulumi.automation.CommandError as e:
+                if lease.lost or (cell_lease is not None and cell_lease.lost):
+                    raise LeaseLostError(
+                        "Stack destroy was interrupted, its lease was taken over."
+                    ) from e
+                if deadline.expired:
+                    release_interrupted_stack(stack=stack, deadline=deadline)
+                    raise DeadlineExceededError(
+                        "Stack destroy was interrupted before the function timeout.",
+                        forced=deadline.forced,
+                    ) from e
+
+                logger.error(f"Stack destroy error: {e.name}")
+                raise
+            except Exception:
+                logger.error("Unexpected stack destroy error")
+                raise
+
+
+def fail_preflight(
+    lease: Lease, tenant_id: str, _input: Input, issues: List[PreflightIssue]
+):
+    """
+    Writes the preflight failure to the tenant's output, under the failed deployment, and
+    raises it. The stack wasn't operated on, so what's deployed stays as it was.
+    """
+    logger.info("Writing preflight failure to output ...")
+    previous = dynamo.table.get_item(
+        Key=dynamo.primary_key(tenant_id, Resource.Dynamo.keyLiterals.OUTPUT),
+        ConsistentRead=True,
+    ).get("Item")
+    now = datetime.now(timezone.utc)
+    lease.put_item(
+        Output(
+            pk=dynamo.tenant_key(tenant_id),
+            sk=dynamo.infra_key(Resource.Dynamo.keyLiterals.OUTPUT),
+            gsi1_pk=dynamo.tenant_deployment_key(tenant_id, _input.deployment_id),
+            gsi1_sk=dynamo.infra_key(Resource.Dynamo.keyLiterals.OUTPUT),
+            papercut_mf_api_tunnel_id=previous.get("papercutMfApiTunnelId")
+            if previous is not None
+            else None,
+            papercut_mf_pooled_set_id=previous.get("papercutMfPooledSetId")
+            if previous is not None
+            else None,
+            deployed_at=previous["deployedAt"] if previous is not None else now,
+            preflight_failure=PreflightFailure(issues=issues, failed_at=now),
+        ).model_dump(mode="json", by_alias=True)
+    )
+    logger.info("Successfully wrote preflight failure to output.")
+
+    raise PreflightError(issues)
+
+
+def migrate_stack(
+    _input: Input,
+    placement: cells.Placement,
+    lease: Lease,
+    cell_lease: cells.CellLease,
+    deadline: Deadline,
+):
+    """
+    Moves the tenant's resources into its cell's stack:
+    - The tenant joins the cell as migrating, so the stream leaves it alone until it's done
+    - Its own stack's state is merged into the cell stack's (unless an interrupted
+      migration already did), with its resources renamed like the cell program names them
+    - A preview of the tenant's resources in the cell must not create, replace or delete
+      any, otherwise the merge is undone
+    - Its own stack is removed without touching its resources, then it's a member
+    """
+    tenant_id = placement.tenant_id
+    source = cells.Placement(tenant_id=tenant_id)
+    project_name, stack_name = project_and_stack_name(placement)
+    tenant_urn = placement.tenant_urn(project_name)
+
+    cells.join(lease=lease, cell_lease=cell_lease, tenant_id=tenant_id, migrating=True)
+
+    with (
+        state_backend(project_name, source.stack_name) as source_backend_url,
+        state_backend(project_name, stack_name) as backend_url,
+    ):
+        source_stack = initialize_stack(
+            tenant_id=tenant_id,
+            _input=_input,
+            backend_url=source_backend_url,
+            placement=source,
+        )
+        stack = initialize_stack(
+            tenant_id=tenant_id,
+            _input=_input,
+            backend_url=backend_url,
+            placement=placement,
+        )
+
+        target = stack.export_stack()
+        merged = not any(
+            resource["urn"] == tenant_urn
+            for resource in target.deployment.get("resources") or []
+        )
+        if merged:
+            logger.info(
+                f"Merging state of stack {source.stack_name} into {stack_name} ..."
+            )
+            source_deployment = source_stack.export_stack()
+            stack.import_stack(
+                pulumi.automation.Deployment(
+                    version=target.version,
+                    deployment=cells.merge_deployment(
+                        source=source_deployment.deployment,
+                        target=target.deployment,
+                        project_name=project_name,
+                        placement=placement,
+                    ),
+                )
+            )
+            logger.info("Successfully merged stack state.")
+
+        logger.info("Previewing migrated resources ...")
+        try:
+            with deadline:
+                result = stack.preview(
+                    on_output=logger.info,
+                    on_error=logger.error,
+                    **tenant_targets(placement, project_name),
+                )
+        except pulumi.automation.CommandError as e:
+            if deadline.expired:
+                raise DeadlineExceededError(
+                    "Stack migration was interrupted before the function timeout.",
+                    forced=deadline.forced,
+                ) from e
+            raise
+
+        recreated = {
+            str(getattr(op, "value", op)): count
+            for op, count in result.change_summary.items()
+            if str(getattr(op, "value", op)) in cells.RECREATING_OPS and count
+        }
+        if recreated:
+            if merged:
+                logger.warning("Undoing merge of stack state ...")
+                stack.import_stack(
+                    pulumi.automation.Deployment(
+                        version=target.version,
+                        deployment=cells.remove_tenant(
+                            deployment=stack.export_stack().deployment,
+                            project_name=project_name,
+                            placement=placement,
+                        ),
+                    )
+                )
+                cells.leave(lease=lease, cell_lease=cell_lease, tenant_id=tenant_id)
+
+            raise cells.CellMigrationError(
+                f"Migrated resources of tenant {tenant_id} would be recreated: {recreated}"
+            )
+        logger.info("Migrated resources are unchanged.")
+
+        logger.info(f"Removing stack {source.stack_name} ...")
+        # Its resources are managed by the cell stack now, so they must be left as they are
+        source_stack.workspace.remove_stack(stack_name=source.stack_name, force=True)
+        logger.info(f"Successfully removed stack {source.stack_name}.")
+
+    cells.join(lease=lease, cell_lease=cell_lease, tenant_id=tenant_id)
+
+
+def stamp_fingerprint(
+    stack: pulumi.automation.Stack, lease: Lease, placement: cells.Placement
+):
+    current = fingerprint.current()
+    logger.info(f"Stamping stack with program fingerprint {current} ...")
+
+    # The tag travels with the stack's state, the stack item is what stale stacks are listed
+    # from. A cell stack's tag would speak for all of its tenants, so it isn't tagged.
+    if placement.cell is None:
+        try:
+            stack.workspace.set_tag(stack.name, fingerprint.TAG, current)
+        except pulumi.automation.CommandError as e:
+            logger.warning(f"Failed to tag stack {stack.name}: {e.name}")
+    fingerprint.record_fingerprint(lease=lease, fingerprint=current)
+
+    logger.info("Successfully stamped stack with program fingerprint.")
+
+
+def prune_stack_history(project_name: str, stack_name: str):
+    logger.info("Pruning stack history ...")
+
+    # Best effort, the next update or the fleet retention job prunes what's left
+    try:
+        report = retention.prune_stack(
+            s3=s3,
+            bucket=Resource.PulumiBucket.name,
+            project_name=project_name,
+            stack_name=stack_name,
+        )
+    except Exception as e:
+        logger.warning(f"Failed to prune stack history: {e}")
+        return
+
+    logger.info(
+        f"Successfully pruned stack history, kept {report.kept} version(s), deleted {report.deleted_objects} object(s) ({report.bytes_reclaimed} bytes)."
+    )
+
+
+@contextmanager
+def state_backend(project_name: str, stack_name: str, read_only: bool = False):
+    """
+    Yields the url of a local mirror of the stack's state when the state mirror is enabled
+    (PULUMI_STATE_MIRROR), which is written through to S3 on exit, otherwise None.
+    """
+    if not mirror.is_enabled():
+        yield None
+        return
+
+    logger.info("Syncing stack state mirror ...")
+    with mirror.StateMirror(
+        s3=s3,
+        bucket=Resource.PulumiBucket.name,
+        project_name=project_name,
+        stack_name=stack_name,
+        read_only=read_only,
+    ) as state_mirror:
+        for lock in state_mirror.released_locks:
+            logger.warning(
+                f"Released stale lock {lock.key} (hostname: {lock.hostname}, pid: {lock.pid}, acquired: {lock.timestamp.isoformat()})."
+            )
+        logger.info("Successfully synced stack state mirror.")
+
+        yield state_mirror.backend_url
+
+        logger.info("Writing stack state through to S3 ...")
+    logger.info("Successfully wrote stack state through to S3.")
+
+
+def warm_pool():
+    return pool.WarmPool(
+        sqs=preload.role_session().client("sqs"), cloudflare=preload.cloudflare()
+    )
+
+
+def claim_pooled_resources(
+    tenant_id: str, _input: Input
+) -> Optional[pool.PooledResources]:
+    """
+    Claims a set of pooled resources for the tenant's first update of its papercut mf
+    resources, if the warm pool is enabled and has one.
+    """
+    if not _input.papercut_mf_config.enabled or pool.size_from_env() == 0:
+        return None
+
+    # Imports fail unless the pooled queues have the attributes the program declares
+    invoices_processing = _input.papercut_mf_config.invoices_processing
+    if invoices_processing is not None and (
+        invoices_processing.visibility_timeout_seconds
+        != pool.QUEUE_VISIBILITY_TIMEOUT_SECONDS
+        or invoices_processing.high_throughput
+    ):
+        return None
+
+    output = dynamo.table.get_item(
+        Key=dynamo.primary_key(tenant_id, Resource.Dynamo.keyLiterals.OUTPUT),
+        ConsistentRead=True,
+    ).get("Item")
+    if output is not None and output.get("papercutMfApiTunnelId") is not None:
+        return None
+
+    logger.info("Claiming pooled resources ...")
+    pooled = warm_pool().claim(tenant_id=tenant_id, tags=default_tags(tenant_id))
+    if pooled is None:
+        logger.info("Warm pool is empty, creating resources.")
+        return None
+
+    logger.info(f"Successfully claimed pooled set {pooled.set_id}.")
+    return pooled
+
+
+def adopted_pooled_set_id(tenant_id: str) -> Optional[str]:
+    """The pooled set the tenant's papercut mf resources were adopted from, if any."""
+    output = dynamo.table.get_item(
+        Key=dynamo.primary_key(tenant_id, Resource.Dynamo.keyLiterals.OUTPUT),
+        ConsistentRead=True,
+    ).get("Item")
+    return output.get("papercutMfPooledSetId") if output is not None else None
+
+
+def deployment_progress(
+    tenant_id: str, _input: Optional[Input]
+) -> DeploymentProgressReporter:
+    return DeploymentProgressReporter(
+        tenant_id=tenant_id,
+        _input=_input,
+        publish=preload.realtime().publish,
+        on_error=lambda e: logger.warning(
+            f"Failed to publish deployment progress for tenant {tenant_id}: {e}"
+        ),
+    )
+
+
+def slot_schedules():
+    return dispatch.SlotSchedules(
+        scheduler=preload.role_session().client("scheduler"),
+        function_arn=dispatch.function_arn(os.environ["AWS_LAMBDA_FUNCTION_NAME"]),
+    )
+
+
+def register_sync(lease: Lease, tenant_id: str, _input: Optional[Input]):
+    """
+    While syncs are dispatched (PapercutMfSyncDispatch), registers the tenant in its sync
+    slot and makes sure the slot has a schedule. Otherwise, or once the tenant is destroyed
+    or disables papercut mf, it leaves its slot, whose schedule is deleted with its last
+    tenant.
+    """
+    slot = (
+        stagger.Slot.of(_input.papercut_mf_config)
+        if sync_dispatch and _input is not None and _input.papercut_mf_config.enabled
+        else None
+    )
+    registered = dispatch.registration(tenant_id)
+    if slot is None and registered is None:
+        return
+
+    schedules = slot_schedules()
+    if slot is not None:
+        if slot != registered:
+            dispatch.join(lease=lease, tenant_id=tenant_id, slot=slot)
+            logger.info(
+                f"Tenant {tenant_id} joined sync slot cron({slot.cron_expression}) {slot.timezone}."
+            )
+        schedules.ensure(slot)
+
+    if registered is not None and registered != slot:
+        dispatch.leave(
+            lease=lease,
+            tenant_id=tenant_id,
+            slot=registered,
+            keep_registration=slot is not None,
+        )
+        schedules.retire(registered)
+        logger.info(
+            f"Tenant {tenant_id} left sync slot cron({registered.cron_expression}) {registered.timezone}."
+        )
+
+
+def project_and_stack_name(placement: cells.Placement):
+    return infra_project_name, placement.stack_name
+
+
+def tenant_targets(placement: cells.Placement, project_name: str):
+    """Targets an operation on a cell stack at the tenant's resources."""
+    if placement.cell is None:
+        return {}
+
+    return {"target": [placement.tenant_urn(project_name)], "target_dependents": True}
+
+
+def tenant_output(
+    outputs: pulumi.automation.OutputMap, placement: cells.Placement, key: str
+):
+    if placement.cell is None:
+        output = outputs.get(key)
+        return output.value if output is not None else None
+
+    # A cell stack's outputs are keyed by tenant
+    tenants = outputs.get("tenants")
+    return (
+        (tenants.value if tenants is not None else {})
+        .get(placement.tenant_id, {})
+        .get(key)
+    )
+
+
+def program(
+    tenant_id: str,
+    _input: Input,
+    placement: cells.Placement,
+    pooled: Optional[pool.PooledResources] = None,
+):
+    if placement.cell is None:
+        # Dispatched syncs are spread by their slot's schedule instead
+        sync_windows = (
+            stagger.planned_windows({tenant_id: _input}) if not sync_dispatch else {}
+        )
+        pooled_set_id = (
+            pooled.set_id if pooled is not None else adopted_pooled_set_id(tenant_id)
+        )
+
+        def run():
+            # Imports the provider sdks once a program runs, rather than on cold start
+            from utils import naming
+
+            # Stack transformations apply to the root stack resource of the program's run,
+            # a cell stack's resources are auto-named from their tenant prefixed names
+            pulumi.runtime.register_stack_transformation(
+                naming.transform_resource(tenant_id)
+            )
+            inline(
+                tenant_id=tenant_id,
+                _input=_input,
+                pooled=pooled,
+                pooled_set_id=pooled_set_id,
+                sync_window_minutes=sync_windows.get(tenant_id),
+            )
+
+        return run
+
+    inputs = {
+        member_id: Input.model_validate(item)
+        for member_id, item in cells.member_inputs(placement.cell).items()
+    }
+    # The tenant's stream image may be newer than its input item
+    inputs[tenant_id] = _input
+    logger.info(f"Cell {placement.cell} has {len(inputs)} tenant(s).")
+    sync_windows = stagger.planned_windows(inputs) if not sync_dispatch else {}
+    pooled_set_ids = {
+        member_id: item["papercutMfPooledSetId"]
+        for member_id, item in cells.member_items(
+            placement.cell, Resource.Dynamo.keyLiterals.OUTPUT
+        ).items()
+        if item.get("papercutMfPooledSetId") is not None
+    }
+    if pooled is not None:
+        pooled_set_ids[tenant_id] = pooled.set_id
+
+    return lambda: cell(
+        cell_name=placement.cell,
+        inputs=inputs,
+        pooled={tenant_id: pooled} if pooled is not None else None,
+        pooled_set_ids=pooled_set_ids,
+        sync_windows=sync_windows,
+    )
+
+
+def initialize_stack(
+    tenant_id: str,
+    _input: Input,
+    backend_url: Optional[str] = None,
+    pooled: Optional[pool.PooledResources] = None,
+    placement: Optional[cells.Placement] = None,
+) -> pulumi.automation.Stack:
     logger.info(f"Initializing stack for tenant {tenant_id} ...")
-    project_name = f"{Resource.App.name}-{Resource.App.stage}-infra"
-    stack_name = tenant_id
+    placement = placement or cells.Placement(tenant_id=tenant_id)
+    project_name, stack_name = project_and_stack_name(placement)
     stack = pulumi.automation.create_or_select_stack(
         project_name=project_name,
         stack_name=stack_name,
-        program=lambda: inline(
-            tenant_id=tenant_id,
-            _input=record.dynamodb.OldImage if is_destroy else record.dynamodb.NewImage,
+        program=program(
+            tenant_id=tenant_id, _input=_input, placement=placement, pooled=pooled
         ),
         opts=pulumi.automation.LocalWorkspaceOptions(
-            pulumi_home=os.environ("PULUMI_HOME"),
+            pulumi_home=os.environ.get("PULUMI_HOME"),
+            pulumi_command=preload.pulumi_command(),
             project_settings=pulumi.automation.ProjectSettings(
                 name=project_name,
                 runtime="python",
                 backend=pulumi.automation.ProjectBackend(
-                    url=f"s3://{Resource.PulumiBucket.name}/{project_name}"
+                    url=backend_url
+                    or f"s3://{Resource.PulumiBucket.name}/{project_name}"
                 ),
             ),
         ),
     )
     logger.info(f"Successfully initialized stack {stack.name}.")
 
+    # Once per container, stacks share the plugin cache
     logger.info("Installing plugins ...")
-    stack.workspace.install_plugin(
-        name="aws",
-        version=f"v{version('pulumi-aws')}",
-    )
-    stack.workspace.install_plugin(
-        name="cloudflare",
-        version=f"v{version('pulumi-cloudflare')}",
-    )
-    stack.workspace.install_plugin(
-        name="time",
-        version=f"v{version('pulumiverse-time')}",
-    )
+    preload.install_plugins()
     logger.info("Successfully installed plugins.")
 
     logger.info("Setting stack configuration ...")
-    stack.set_config(
-        key="aws:region",
-        value=pulumi.automation.ConfigValue(value=Resource.Aws.region),
-    )
-    stack.set_config(
-        key="aws:assumeRoles[0].roleArn",
-        value=pulumi.automation.ConfigValue(value=Resource.PulumiRole.arn),
-        path=True,
-    )
-    stack.set_config(
-        key="aws:assumeRoles[0].externalId",
-        value=pulumi.automation.ConfigValue(value=Resource.PulumiRole.externalId),
-        path=True,
-    )
-    stack.set_config(
-        key="aws:defaultTags",
-        value=pulumi.automation.ConfigValue(
-            value=json.dumps(
-                {
-                    "tags": {
-                        "sst:app": Resource.App.name,
-                        "sst:stage": Resource.App.stage,
-                        "pd:tenantId": tenant_id,
-                    }
-                }
-            )
-        ),
-    )
-    stack.set_config(
-        key="cloudflare:apiToken",
-        value=pulumi.automation.ConfigValue(
-            value=Resource.Cloudflare.apiToken, secret=True
-        ),
-    )
-    stack.set_config(
-        key="cloudflareAccountId",
-        value=pulumi.automation.ConfigValue(value=Resource.Cloudflare.account.id),
-    )
+    config = dict(preload.stack_config())
+    # In a cell stack, each tenant's aws provider sets its own
+    if placement.cell is None:
+        config["aws:defaultTags"] = pulumi.automation.ConfigValue(
+            value=json.dumps({"tags": default_tags(tenant_id)})
+        )
+    stack.set_all_config(config, path=True)
     logger.info("Successfully set stack configuration.")
 
-    logger.info("Registering stack transformations ...")
-    pulumi.runtime.register_stack_transformation(naming.transform_resource(tenant_id))
-    logger.info("Successfully registered stack transformations.")
+    return stack
 
-    if not is_destroy:
-        try:
-            logger.info("Updating stack ...")
-            result = stack.up(on_output=logger.info, on_error=logger.error)
-            logger.info(
-                f"Update summary: \n{json.dumps(obj=result.summary.resource_changes, indent=2)}"
-            )
 
-            if result.summary.result != "succeeded":
-                error_message = (
-                    f"Unexpected stack update result: {result.summary.result}"
-                )
-                logger.error(error_message)
-                raise RuntimeError(error_message)
-        except pulumi.automation.CommandError as e:
-            logger.error(f"Stack update error: {e.name}")
-            raise
-        except Exception:
-            logger.error("Unexpected stack update error")
-            raise
-    else:
-        try:
-            logger.info("Destroying stack ...")
-            result = stack.destroy(on_output=logger.info, on_error=logger.error)
-            logger.info(
-                f"Destroy summary: \n{json.dumps(result.summary.resource_changes, indent=2)}"
-            )
+def release_interrupted_stack(stack: pulumi.automation.Stack, deadline: Deadline):
+    if not deadline.forced:
+        # A graceful interrupt lets the engine persist its checkpoint and release the lock,
+        # so the retry resumes from the last completed step.
+        logger.warning(
+            f"Stack {stack.name} was interrupted gracefully, checkpoint persisted for retry."
+        )
+        return
 
-            if result.summary.result != "succeeded":
-                error_message = (
-                    f"Unexpected stack destroy result: {result.summary.result}"
-                )
-                logger.error(error_message)
-                raise RuntimeError(error_message)
+    # The engine was terminated, so the lock it held is still in the backend. We are its
+    # only owner, so release it for the retry (pending operations are left for the retry to resolve).
+    logger.warning(f"Stack {stack.name} was terminated, releasing its lock ...")
+    try:
+        stack.cancel()
+        logger.info(f"Successfully released stack {stack.name} lock.")
+    except pulumi.automation.CommandError as e:
+        logger.error(f"Failed to release stack {stack.name} lock: {e.name}")
 
-            if not is_prod_stage:
-                stack.workspace.remove_stack(stack_name=stack_name)
-        except pulumi.automation.CommandError as e:
-            logger.error(f"Stack destroy error: {e.name}")
-            raise
-        except Exception:
-            logger.error("Unexpected stack destroy error")
-            raise
+
+# Lambda runs the init phase before the environment's first invocation (ahead of any, with
+# provisioned concurrency), the tenant independent setup is done there instead
+if os.environ.get("AWS_LAMBDA_INITIALIZATION_TYPE") is not None:
+    logger.info("Preloading ...")
+    try:
+        logger.info(f"Successfully preloaded ({preload.preload()}).")
+    except Exception as e:
+        # Each operation loads what it needs, what failed here is retried by the first
+        logger.warning(f"Failed to preload: {e}")
@@ -2,19 +2,51 @@ from models.config import (
     PapercutMfConfig,
     PapercutMfEnabledConfig,
     PapercutMfDisabledConfig,
+    PapercutMfInvoicesProcessingConfig,
 )
 from models.crypto import Hash
-from models.io import InputKeys, Input, Output
+from models.io import (
+    DeploymentProgress,
+    InputKeys,
+    InputPrimaryKey,
+    Input,
+    Output,
+    Drift,
+    DriftedResource,
+    PreflightFailure,
+    PreflightIssue,
+)
 from models.dynamo import InputDynamoDBStreamRecord
+from models.events import (
+    DispatchEvent,
+    DriftEvent,
+    MigrateEvent,
+    ReconcileEvent,
+    ReplenishEvent,
+    WarmupEvent,
+)
 
 
 __all__ = [
+    "DeploymentProgress",
+    "DispatchEvent",
+    "Drift",
+    "DriftEvent",
+    "DriftedResource",
+    "PreflightFailure",
+    "PreflightIssue",
     "Hash",
     "Input",
     "InputDynamoDBStreamRecord",
     "InputKeys",
+    "InputPrimaryKey",
+    "MigrateEvent",
     "PapercutMfConfig",
     "PapercutMfEnabledConfig",
     "PapercutMfDisabledConfig",
+    "PapercutMfInvoicesProcessingConfig",
     "Output",
+    "ReconcileEvent",
+    "ReplenishEvent",
+    "WarmupEvent",
 ]
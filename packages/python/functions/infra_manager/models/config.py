@@ -1,16 +1,33 @@
+from functools import lru_cache
 from typing import Literal, Union, Sequence, Optional, Annotated
 from zoneinfo import ZoneInfo
 
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 from pyawscron import AWSCron
 
 from utils import ipv4_pattern
 
 ipv4 = Annotated[str, Field(pattern=ipv4_pattern)]
 
+# Configs share a few schedules, each is only parsed the first time it's validated (invalid
+# ones raise, which isn't cached)
+VALIDATION_CACHE_SIZE = 1024
+
+
+@lru_cache(maxsize=VALIDATION_CACHE_SIZE)
+def parse_cron_expression(cron_expression: str) -> AWSCron:
+    return AWSCron(cron_expression)
+
+
+@lru_cache(maxsize=VALIDATION_CACHE_SIZE)
+def load_timezone(timezone: str) -> ZoneInfo:
+    return ZoneInfo(timezone)
+
 
 class PapercutMfApiHostNameConfig(BaseModel):
-    _tag: Literal["PapercutMfApiHostNameConfig"]
+    model_config = ConfigDict(populate_by_name=True)
+
+    tag: Annotated[Literal["PapercutMfApiHostNameConfig"], Field(alias="_tag")]
     name: str
     resolver_ips: Annotated[
         Optional[Sequence[ipv4]], Field(alias="resolverIps", default=None)
@@ -18,8 +35,14 @@ class PapercutMfApiHostNameConfig(BaseModel):
 
 
 class PapercutMfApiHostIpv4Config(BaseModel):
-    _tag: Literal["PapercutMfApiHostIpv4Config"]
+    model_config = ConfigDict(populate_by_name=True)
+
+    tag: Annotated[Literal["PapercutMfApiHostIpv4Config"], Field(alias="_tag")]
     ipv4: ipv4
+    # Not supported with an ipv4 host, only accepted so preflight can report it
+    resolver_ips: Annotated[
+        Optional[Sequence[str]], Field(alias="resolverIps", default=None)
+    ]
 
 
 PapercutMfApiHostConfig = Union[
@@ -29,7 +52,7 @@ PapercutMfApiHostConfig = Union[
 
 class PapercutMfApiConfig(BaseModel):
     protocol: Literal["http", "https"]
-    host: Annotated[PapercutMfApiHostConfig, Field(discriminator="_tag")]
+    host: Annotated[PapercutMfApiHostConfig, Field(discriminator="tag")]
     port: Annotated[int, Field(gt=0, lt=2**16)]
 
 
@@ -38,20 +61,49 @@ class PapercutMfSyncConfig(BaseModel):
     timezone: str
 
     @field_validator("cron_expression")
-    def validate_cron_expression(self, cron_expression: str):
-        AWSCron(cron_expression)
+    @classmethod
+    def validate_cron_expression(cls, cron_expression: str):
+        parse_cron_expression(cron_expression)
         return cron_expression
 
     @field_validator("timezone")
-    def validate_timezone(self, timezone: str):
-        ZoneInfo(timezone)
+    @classmethod
+    def validate_timezone(cls, timezone: str):
+        load_timezone(timezone)
         return timezone
 
 
+class PapercutMfInvoicesProcessingConfig(BaseModel):
+    """
+    Tunes how the tenant's invoices queue is processed, within the limits AWS puts on an
+    event source mapping of a FIFO queue (which doesn't support a batching window). The
+    defaults are what tenants without a profile get.
+    """
+
+    batch_size: Annotated[int, Field(alias="batchSize", ge=1, le=10, default=10)]
+    # Concurrent invocations of the processor for the tenant's queue, unbounded by default
+    maximum_concurrency: Annotated[
+        Optional[int], Field(alias="maximumConcurrency", ge=2, le=1000, default=None)
+    ]
+    # Must not be shorter than the processor's timeout (see preflight.check_visibility_timeout)
+    visibility_timeout_seconds: Annotated[
+        int, Field(alias="visibilityTimeoutSeconds", ge=0, le=43200, default=30)
+    ]
+    # High throughput FIFO, the queues' throughput and deduplication are per message group
+    # rather than per queue. Senders group invoices by the papercut account they're charged
+    # to, so each account's invoices stay in order while different accounts' are processed
+    # in parallel.
+    high_throughput: Annotated[bool, Field(alias="highThroughput", default=False)]
+
+
 class PapercutMfEnabledConfig(BaseModel):
     enabled: Literal[True] = True
     api: PapercutMfApiConfig
     sync: PapercutMfSyncConfig
+    invoices_processing: Annotated[
+        Optional[PapercutMfInvoicesProcessingConfig],
+        Field(alias="invoicesProcessing", default=None),
+    ]
 
 
 class PapercutMfDisabledConfig(BaseModel):
@@ -1,19 +1,47 @@
-from typing import Optional, Annotated
+from typing import Any, Dict, Optional, Annotated
 
+from aws_lambda_powertools.shared.dynamodb_deserializer import TypeDeserializer
 from aws_lambda_powertools.utilities.parser.models import (
     DynamoDBStreamChangedRecordModel,
     DynamoDBStreamRecordModel,
 )
-from pydantic import Field
+from pydantic import Field, field_validator
 
-from models.io import InputKeys, Input
+from models.io import InputPrimaryKey, Input
+
+
+_deserializer = TypeDeserializer()
+
+
+def deserialize(value: Dict[str, Any]) -> Any:
+    """
+    Deserializes an attribute value like powertools' deserializer, except the types items
+    are made of (strings, maps, lists, booleans and nulls) are deserialized directly rather
+    than dispatched by name.
+    """
+    dynamodb_type, inner = next(iter(value.items()))
+    if dynamodb_type == "S" or dynamodb_type == "BOOL":
+        return inner
+    if dynamodb_type == "M":
+        return {key: deserialize(attribute) for key, attribute in inner.items()}
+    if dynamodb_type == "L":
+        return [deserialize(attribute) for attribute in inner]
+    if dynamodb_type == "NULL":
+        return None
+    return _deserializer.deserialize(value)
 
 
 class InputDynamoDBStreamChangedRecord(DynamoDBStreamChangedRecordModel):
-    Keys: InputKeys
+    Keys: InputPrimaryKey
     NewImage: Annotated[Optional[Input], Field(default=None)]
     OldImage: Annotated[Optional[Input], Field(default=None)]
 
+    # Overrides the parent's deserializer
+    @field_validator("Keys", "NewImage", "OldImage", mode="before")
+    @classmethod
+    def deserialize_field(cls, value):
+        return {key: deserialize(attribute) for key, attribute in value.items()}
+
 
 class InputDynamoDBStreamRecord(DynamoDBStreamRecordModel):
     dynamodb: InputDynamoDBStreamChangedRecord
@@ -0,0 +1,46 @@
+from typing import Annotated, Literal, Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class ReconcileEvent(BaseModel):
+    type: Literal["reconcile"]
+    tenant_id: Annotated[str, Field(alias="tenantId")]
+    # Update even if the stack's program fingerprint is current
+    force: Annotated[bool, Field(default=False)]
+
+
+class DriftEvent(BaseModel):
+    type: Literal["drift"]
+    tenant_id: Annotated[str, Field(alias="tenantId")]
+
+
+class MigrateEvent(BaseModel):
+    type: Literal["migrate"]
+    tenant_id: Annotated[str, Field(alias="tenantId")]
+
+
+class ReplenishEvent(BaseModel):
+    type: Literal["replenish"]
+    # Overrides the pool's size (WARM_POOL_SIZE)
+    size: Annotated[Optional[int], Field(default=None, ge=0)]
+
+
+class WarmupEvent(BaseModel):
+    """Preloads the container, without operating on any stack."""
+
+    type: Literal["warmup"]
+
+
+class DispatchEvent(BaseModel):
+    """Syncs the tenants of a sync slot, invoked by the slot's schedule (see utils.dispatch)."""
+
+    model_config = ConfigDict(populate_by_name=True)
+
+    type: Literal["dispatch"]
+    cron_expression: Annotated[str, Field(alias="cronExpression")]
+    timezone: str
+    # Continues a dispatch which ran out of time after this tenant
+    after_tenant_id: Annotated[
+        Optional[str], Field(alias="afterTenantId", default=None)
+    ]
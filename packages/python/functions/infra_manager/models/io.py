@@ -1,7 +1,7 @@
 from datetime import datetime
-from typing import Annotated, Optional
+from typing import Annotated, Dict, List, Literal, Optional
 
-from pydantic import BaseModel, Field, computed_field
+from pydantic import BaseModel, ConfigDict, Field, computed_field
 from sst import Resource
 
 from utils import (
@@ -10,17 +10,27 @@ from utils import (
     tenant_deployment_id_key_pattern,
     infra_input_key_pattern,
     infra_output_key_pattern,
+    infra_drift_key_pattern,
 )
 from models.config import PapercutMfConfig
 
 
-class InputKeys(BaseModel):
+class InputPrimaryKey(BaseModel):
     pk: Annotated[
         str, Field(alias=Resource.Dynamo.hashKey, pattern=tenant_id_key_pattern)
     ]
     sk: Annotated[
         str, Field(alias=Resource.Dynamo.rangeKey, pattern=infra_input_key_pattern)
     ]
+
+    @computed_field
+    @property
+    def tenant_id(self) -> str:
+        return self.pk.split(SEPARATOR)[1]
+
+
+# Stream records' keys are only the table's primary key, its images carry the index keys
+class InputKeys(InputPrimaryKey):
     gsi1_pk: Annotated[
         str,
         Field(
@@ -38,12 +48,7 @@ class InputKeys(BaseModel):
 
     @computed_field
     @property
-    def tenant_id(self):
-        return self.pk.split(SEPARATOR)[1]
-
-    @computed_field
-    @property
-    def deployment_id(self):
+    def deployment_id(self) -> str:
         return self.gsi1_pk.split(SEPARATOR)[3]
 
 
@@ -53,7 +58,24 @@ class Input(InputKeys):
     created_at: Annotated[datetime, Field(alias="createdAt")]
 
 
+class PreflightIssue(BaseModel):
+    # The input field at fault, i.e. papercutMfConfig.sync.cronExpression
+    path: str
+    # i.e. cron-expression, api-hostname
+    code: str
+    message: str
+
+
+class PreflightFailure(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    issues: List[PreflightIssue]
+    failed_at: Annotated[datetime, Field(alias="failedAt")]
+
+
 class Output(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
     pk: Annotated[
         str, Field(alias=Resource.Dynamo.hashKey, pattern=tenant_id_key_pattern)
     ]
@@ -77,4 +99,64 @@ class Output(BaseModel):
     papercut_mf_api_tunnel_id: Annotated[
         Optional[str], Field(alias="papercutMfApiTunnelId", default=None)
     ]
+    # The warm pool set the tenant's papercut mf queues were adopted from, if they were
+    papercut_mf_pooled_set_id: Annotated[
+        Optional[str], Field(alias="papercutMfPooledSetId", default=None)
+    ]
     deployed_at: Annotated[datetime, Field(alias="deployedAt")]
+    # Set when the deployment's input failed preflight, the stack wasn't operated on
+    preflight_failure: Annotated[
+        Optional[PreflightFailure],
+        Field(
+            alias="preflightFailure",
+            default=None,
+            exclude_if=lambda failure: failure is None,
+        ),
+    ]
+
+
+class DriftedResource(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    urn: str
+    # The step an update would take to converge the resource, i.e. update, replace or create
+    op: str
+    # Property paths with their kind of diff, i.e. "bindings[2] (delete)"
+    diffs: Annotated[List[str], Field(default_factory=list)]
+
+
+class Drift(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    pk: Annotated[
+        str, Field(alias=Resource.Dynamo.hashKey, pattern=tenant_id_key_pattern)
+    ]
+    sk: Annotated[
+        str, Field(alias=Resource.Dynamo.rangeKey, pattern=infra_drift_key_pattern)
+    ]
+    resources: List[DriftedResource]
+    detected_at: Annotated[datetime, Field(alias="detectedAt")]
+
+    @computed_field
+    @property
+    def drifted(self) -> bool:
+        return len(self.resources) > 0
+
+
+class DeploymentProgress(BaseModel):
+    """
+    A deployment's progress, published to the tenant's realtime channel under its input's
+    callback id (InfraContract.deployment).
+    """
+
+    model_config = ConfigDict(populate_by_name=True)
+
+    callback_id: Annotated[str, Field(alias="callbackId")]
+    deployment_id: Annotated[str, Field(alias="deploymentId")]
+    phase: Literal["started", "updating", "destroying", "succeeded", "failed"]
+    # Resources the engine finished a step of so far, by the step's op (i.e. create, same)
+    resource_changes: Annotated[
+        Dict[str, int], Field(alias="resourceChanges", default_factory=dict)
+    ]
+    error: Optional[str] = None
+    at: datetime
@@ -1,85 +1,128 @@
-from datetime import datetime
-from typing import List, Optional
+from typing import TYPE_CHECKING, Dict, Optional
 
 import pulumi
-import pulumi_aws as aws
-import pulumiverse_time as time
-from sst import Resource
-
-from utils import SEPARATOR
-from program.components import (
-    Assets,
-    AssetsArgs,
-    Config,
-    ConfigArgs,
-    PapercutMf,
-    PapercutMfArgs,
-    Realtime,
-    RealtimeArgs,
-)
-from models import Input, Output
-
-
-def inline(tenant_id: str, _input: Input):
-    resources: List[pulumi.Input[pulumi.Resource]] = [
-        Assets(args=AssetsArgs(tenant_id=tenant_id)),
-        Config(args=ConfigArgs(tenant_id=tenant_id)),
-        Realtime(args=RealtimeArgs(tenant_id=tenant_id)),
-    ]
-
-    papercut_mf: Optional[PapercutMf] = None
-    if _input.papercut_mf_config.enabled:
-        papercut_mf = PapercutMf(
-            args=PapercutMfArgs(
-                tenant_id=tenant_id,
-                config=_input.papercut_mf_config,
-            )
-        )
 
-        resources.append(papercut_mf)
+from models import Input
+from utils import default_tags
+from utils.cells import Placement
+from utils.pool import PooledResources
+
+if TYPE_CHECKING:
+    from program.components import PapercutMf
+
+
+def tenant_components(
+    tenant_id: str,
+    _input: Input,
+    pooled: Optional[PooledResources] = None,
+    pooled_set_id: Optional[str] = None,
+    resource_prefix: str = "",
+    sync_window_minutes: Optional[int] = None,
+    opts: Optional[pulumi.ResourceOptions] = None,
+) -> Optional["PapercutMf"]:
+    # The components import the provider sdks, which only a program run needs, not the
+    # handler's cold start
+    from program.components import (
+        Assets,
+        AssetsArgs,
+        Config,
+        ConfigArgs,
+        PapercutMf,
+        PapercutMfArgs,
+        Realtime,
+        RealtimeArgs,
+    )
 
-    output_pk = SEPARATOR.join([Resource.Dynamo.keyLiterals.TENANT, tenant_id])
-    output_sk = SEPARATOR.join(
-        [Resource.Dynamo.keyLiterals.INFRA, Resource.Dynamo.keyLiterals.OUTPUT]
+    Assets(
+        args=AssetsArgs(tenant_id=tenant_id, resource_prefix=resource_prefix), opts=opts
     )
-    output_gsi1_pk = SEPARATOR.join(
-        [
-            Resource.Dynamo.keyLiterals.TENANT,
-            tenant_id,
-            Resource.Dynamo.keyLiterals.DEPLOYMENT,
-            _input.deployment_id,
-        ]
+    Config(
+        args=ConfigArgs(tenant_id=tenant_id, resource_prefix=resource_prefix), opts=opts
     )
-    output_gsi1_sk = output_sk
-    deployed_at = time.Static(
-        resource_name="DeployedAt",
-        args=time.StaticArgs(triggers={"now": datetime.now()}),
-        opts=pulumi.ResourceOptions(depends_on=resources),
+    Realtime(
+        args=RealtimeArgs(tenant_id=tenant_id, resource_prefix=resource_prefix),
+        opts=opts,
     )
 
-    aws.dynamodb.TableItem(
-        resource_name="Output",
-        args=aws.dynamodb.TableItemArgs(
-            table_name=Resource.Dynamo.name,
-            hash_key=output_pk,
-            range_key=output_sk,
-            item=pulumi.Output.all(
-                papercut_mf_api_tunnel_id=getattr(
-                    papercut_mf,
-                    "api_tunnel_id",
-                    pulumi.Output.from_input(None),
-                ),
-                deployed_at=deployed_at.unix.apply(datetime.fromtimestamp),
-            ).apply(
-                lambda data: Output(
-                    pk=output_pk,
-                    sk=output_sk,
-                    gsi1_pk=output_gsi1_pk,
-                    gsi1_sk=output_gsi1_sk,
-                    papercut_mf_api_tunnel_id=data["papercut_mf_api_tunnel_id"],
-                    deployed_at=data["deployed_at"],
-                ).model_dump_json()
-            ),
+    if not _input.papercut_mf_config.enabled:
+        return None
+
+    return PapercutMf(
+        args=PapercutMfArgs(
+            tenant_id=tenant_id,
+            config=_input.papercut_mf_config,
+            pooled=pooled,
+            pooled_set_id=pooled_set_id,
+            resource_prefix=resource_prefix,
+            sync_window_minutes=sync_window_minutes,
         ),
-        opts=pulumi.ResourceOptions(depends_on=resources),
+        opts=opts,
+    )
+
+
+def inline(
+    tenant_id: str,
+    _input: Input,
+    pooled: Optional[PooledResources] = None,
+    pooled_set_id: Optional[str] = None,
+    sync_window_minutes: Optional[int] = None,
+):
+    papercut_mf = tenant_components(
+        tenant_id=tenant_id,
+        _input=_input,
+        pooled=pooled,
+        pooled_set_id=pooled_set_id,
+        sync_window_minutes=sync_window_minutes,
     )
+
+    # The output item is written by the handler once the update succeeded, conditioned on the
+    # fencing token of its lease, so a stale operation can't overwrite a newer result.
+    pulumi.export(
+        "papercutMfApiTunnelId",
+        papercut_mf.api_tunnel_id if papercut_mf is not None else None,
+    )
+
+
+def cell(
+    cell_name: str,
+    inputs: Dict[str, Input],
+    pooled: Optional[Dict[str, PooledResources]] = None,
+    pooled_set_ids: Optional[Dict[str, str]] = None,
+    sync_windows: Optional[Dict[str, int]] = None,
+):
+    """
+    Declares the components of every tenant in the cell, each under its own tenant
+    component. Operations on a cell stack target a single tenant's component (and its
+    dependents), the other tenants' resources are left as they are.
+    """
+    from program.components import Tenant, TenantArgs
+
+    outputs = {}
+    for tenant_id, _input in inputs.items():
+        placement = Placement(tenant_id=tenant_id, cell=cell_name)
+        tenant = Tenant(
+            args=TenantArgs(
+                tenant_id=tenant_id,
+                tags=default_tags(tenant_id),
+                resource_prefix=placement.resource_prefix,
+            )
+        )
+
+        papercut_mf = tenant_components(
+            tenant_id=tenant_id,
+            _input=_input,
+            pooled=(pooled or {}).get(tenant_id),
+            pooled_set_id=(pooled_set_ids or {}).get(tenant_id),
+            resource_prefix=placement.resource_prefix,
+            sync_window_minutes=(sync_windows or {}).get(tenant_id),
+            opts=pulumi.ResourceOptions(
+                parent=tenant, providers={"aws": tenant.aws_provider}
+            ),
+        )
+        outputs[tenant_id] = {
+            "papercutMfApiTunnelId": papercut_mf.api_tunnel_id
+            if papercut_mf is not None
+            else None
+        }
+
+    pulumi.export("tenants", outputs)
@@ -0,0 +1,129 @@
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from models import Input
+from utils import sync_dispatch
+from utils.cells import TENANT, Placement
+
+
+PAPERCUT_MF = "pd:awscf:PapercutMf"
+
+# Input fields which never reach the program
+IGNORED_FIELDS = (
+    "pk",
+    "sk",
+    "gsi1_pk",
+    "gsi1_sk",
+    "tenant_id",
+    "deployment_id",
+    "callback_id",
+    "created_at",
+)
+
+# Input fields mapped to the resources they're passed to, as (type chain, name)
+FIELD_TARGETS: Dict[str, List[Tuple[Sequence[str], str]]] = {
+    # Dispatched syncs are scheduled by the tenant's sync slot, not a resource of its own
+    "papercut_mf_config.sync": [
+        ((PAPERCUT_MF, "aws:scheduler/schedule:Schedule"), "PapercutMfSyncSchedule"),
+    ]
+    if not sync_dispatch
+    else [],
+    "papercut_mf_config.invoices_processing": [
+        (
+            (PAPERCUT_MF, "aws:sqs/queue:Queue"),
+            "PapercutMfInvoicesProcessorDeadLetterQueue",
+        ),
+        (
+            (PAPERCUT_MF, "aws:sqs/queue:Queue"),
+            "PapercutMfInvoicesProcessorQueue",
+        ),
+        (
+            (PAPERCUT_MF, "aws:lambda/eventSourceMapping:EventSourceMapping"),
+            "PapercutMfInvoicesProcessorEventSourceMapping",
+        ),
+    ],
+    "papercut_mf_config.api": [
+        (
+            (
+                PAPERCUT_MF,
+                "cloudflare:index/connectivityDirectoryService:ConnectivityDirectoryService",
+            ),
+            "PapercutMfApiVpcService",
+        ),
+        (
+            (PAPERCUT_MF, "cloudflare:index/workersScript:WorkersScript"),
+            "PapercutMfApiGatewayScript",
+        ),
+    ],
+}
+
+
+def urn(project_name: str, stack_name: str, types: Sequence[str], name: str):
+    return f"urn:pulumi:{stack_name}::{project_name}::{'$'.join(types)}::{name}"
+
+
+def changed_fields(old: Any, new: Any, path: str = "") -> List[str]:
+    if isinstance(old, dict) and isinstance(new, dict):
+        return [
+            field
+            for key in sorted(old.keys() | new.keys())
+            for field in changed_fields(
+                old.get(key), new.get(key), f"{path}.{key}" if path else key
+            )
+        ]
+
+    return [path] if old != new else []
+
+
+@dataclass
+class Change:
+    fields: List[str]
+    # None when the change can't be targeted and needs a full update
+    targets: Optional[List[str]]
+
+    @property
+    def is_noop(self):
+        return self.targets is not None and not self.targets
+
+
+def classify(old: Input, new: Input, project_name: str, placement: Placement) -> Change:
+    """
+    Maps the fields that changed between two input images to the resources they affect, so
+    only those (and their dependents) need to be updated instead of the whole stack. In a
+    cell stack, the tenant's resources are under its tenant component. A new deployment of
+    an unchanged input is a full update.
+    """
+    fields = changed_fields(
+        old.model_dump(exclude=set(IGNORED_FIELDS)),
+        new.model_dump(exclude=set(IGNORED_FIELDS)),
+    )
+    if not fields and new.deployment_id != old.deployment_id:
+        # Redeploying an unchanged input reconciles the whole stack, i.e. with what was
+        # changed outside of it
+        return Change(fields=["deployment_id"], targets=None)
+
+    targets: List[str] = []
+    for field in fields:
+        prefix = next(
+            (
+                prefix
+                for prefix in FIELD_TARGETS
+                if field == prefix or field.startswith(f"{prefix}.")
+            ),
+            None,
+        )
+        if prefix is None:
+            # i.e. papercut_mf_config.enabled, which adds or removes a whole component
+            return Change(fields=fields, targets=None)
+
+        for types, name in FIELD_TARGETS[prefix]:
+            target = urn(
+                project_name,
+                placement.stack_name,
+                (TENANT, *types) if placement.cell is not None else types,
+                f"{placement.resource_prefix}{name}",
+            )
+            if target not in targets:
+                targets.append(target)
+
+    return Change(fields=fields, targets=targets)
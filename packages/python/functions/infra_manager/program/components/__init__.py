@@ -2,6 +2,7 @@ from program.components.assets import Assets, AssetsArgs
 from program.components.config import Config, ConfigArgs
 from program.components.papercut_mf import PapercutMf, PapercutMfArgs
 from program.components.realtime import Realtime, RealtimeArgs
+from program.components.tenant import Tenant, TenantArgs
 
 __all__ = [
     "Assets",
@@ -12,4 +13,6 @@ __all__ = [
     "PapercutMfArgs",
     "Realtime",
     "RealtimeArgs",
+    "Tenant",
+    "TenantArgs",
 ]
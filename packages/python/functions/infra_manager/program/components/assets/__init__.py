@@ -12,13 +12,14 @@ from program.components.assets.route import Route, RouteArgs
 @dataclass
 class AssetsArgs:
     tenant_id: pulumi.Input[str]
+    resource_prefix: str = ""
 
 
 class Assets(pulumi.ComponentResource):
     def __init__(self, args: AssetsArgs, opts: Optional[pulumi.ResourceOptions] = None):
         super().__init__(
             t="pd:aws:Assets",
-            name="Assets",
+            name=f"{args.resource_prefix}Assets",
             props=vars(args),
             opts=opts,
         )
@@ -39,7 +40,7 @@ class Assets(pulumi.ComponentResource):
         )
 
         self._access_point = aws.s3.AccessPoint(
-            resource_name="AssetsAccessPoint",
+            resource_name=f"{args.resource_prefix}AssetsAccessPoint",
             args=aws.s3.AccessPointArgs(
                 bucket=Resource.AssetsBucket.name,
                 name=name,
@@ -86,6 +87,7 @@ class Assets(pulumi.ComponentResource):
             args=RouteArgs(
                 tenant_id=args.tenant_id,
                 domain=self._access_point.domain_name,
+                resource_prefix=args.resource_prefix,
             ),
             opts=pulumi.ResourceOptions(parent=self),
         )
@@ -12,13 +12,14 @@ from utils import naming
 class RouteArgs:
     tenant_id: pulumi.Input[str]
     domain: pulumi.Input[str]
+    resource_prefix: str = ""
 
 
 class Route(pulumi.ComponentResource):
     def __init__(self, args: RouteArgs, opts: pulumi.ResourceOptions):
         super().__init__(
             t="pd:aws:AssetsRoute",
-            name="AssetsRoute",
+            name=f"{args.resource_prefix}AssetsRoute",
             props=vars(args),
             opts=opts,
         )
@@ -28,7 +29,7 @@ class Route(pulumi.ComponentResource):
         )
 
         self._metadata = aws.cloudfront.KeyvaluestoreKey(
-            resource_name="AssetsRouteMetadata",
+            resource_name=f"{args.resource_prefix}AssetsRouteMetadata",
             args=aws.cloudfront.KeyvaluestoreKeyArgs(
                 key_value_store_arn=Resource.AssetsRouter.keyValueStoreArn,
                 key=pulumi.Output.format("{0}:metadata", namespace),
@@ -40,7 +41,7 @@ class Route(pulumi.ComponentResource):
         )
 
         self._routes = Routes(
-            resource_name="AssetsRoutes",
+            resource_name=f"{args.resource_prefix}AssetsRoutes",
             args=RoutesArgs(
                 tenant_id=args.tenant_id,
                 store_arn=Resource.AssetsRouter.keyValueStoreArn,
@@ -2,7 +2,7 @@ from dataclasses import dataclass
 
 import pulumi
 
-from program.components.assets.routes.provider import RoutesProvider
+from provider import ROUTES
 
 
 @dataclass
@@ -13,11 +13,11 @@ class RoutesArgs:
     route_namespace: pulumi.Input[str]
 
 
-class Routes(pulumi.dynamic.Resource):
+class Routes(pulumi.CustomResource):
     tenant_id: pulumi.Output[str]
     store_arn: pulumi.Output[str]
     namespace: pulumi.Output[str]
-    route_id: pulumi.Output[str]
+    route_namespace: pulumi.Output[str]
 
     def __init__(
         self,
@@ -26,7 +26,7 @@ class Routes(pulumi.dynamic.Resource):
         opts: pulumi.ResourceOptions,
     ):
         super().__init__(
-            provider=RoutesProvider(),
+            t=ROUTES,
             name=resource_name,
             props=vars(args),
             opts=opts,
@@ -5,25 +5,26 @@ import pulumi
 import pulumi_aws as aws
 from sst import Resource
 
-from utils import naming
+from utils import naming, shared_tenant_roles
 
 
 @dataclass
 class ConfigArgs:
     tenant_id: pulumi.Input[str]
+    resource_prefix: str = ""
 
 
-class Config:
+class Config(pulumi.ComponentResource):
     def __init__(self, args: ConfigArgs, opts: Optional[pulumi.ResourceOptions] = None):
         super().__init__(
             t="pd:aws:Config",
-            name="Config",
+            name=f"{args.resource_prefix}Config",
             props=vars(args),
             opts=opts,
         )
 
         self._api_client_credentials_configuration_profile = aws.appconfig.ConfigurationProfile(
-            resource_name="ConfigApiClientCredentialsConfigurationProfile",
+            resource_name=f"{args.resource_prefix}ConfigApiClientCredentialsConfigurationProfile",
             args=aws.appconfig.ConfigurationProfileArgs(
                 application_id=Resource.AppconfigApplication.id,
                 type="AWS.Freeform",
@@ -39,7 +40,7 @@ class Config:
         )
 
         self._invoices_processor_client_credentials_configuration_profile = aws.appconfig.ConfigurationProfile(
-            resource_name="ConfigInvoicesProcessorClientCredentialsConfigurationProfile",
+            resource_name=f"{args.resource_prefix}ConfigInvoicesProcessorClientCredentialsConfigurationProfile",
             args=aws.appconfig.ConfigurationProfileArgs(
                 application_id=Resource.AppconfigApplication.id,
                 type="AWS.Freeform",
@@ -55,7 +56,7 @@ class Config:
         )
 
         self._papercut_mf_api_auth_token_configuration_profile = aws.appconfig.ConfigurationProfile(
-            resource_name="ConfigPapercutMfApiAuthTokenConfigurationProfile",
+            resource_name=f"{args.resource_prefix}ConfigPapercutMfApiAuthTokenConfigurationProfile",
             args=aws.appconfig.ConfigurationProfileArgs(
                 application_id=Resource.AppconfigApplication.id,
                 type="AWS.Freeform",
@@ -71,7 +72,7 @@ class Config:
         )
 
         self._papercut_mf_sync_client_credentials_configuration_profile = aws.appconfig.ConfigurationProfile(
-            resource_name="ConfigPapercutMfSyncClientCredentialsConfigurationProfile",
+            resource_name=f"{args.resource_prefix}ConfigPapercutMfSyncClientCredentialsConfigurationProfile",
             args=aws.appconfig.ConfigurationProfileArgs(
                 application_id=Resource.AppconfigApplication.id,
                 type="AWS.Freeform",
@@ -86,83 +87,85 @@ class Config:
             opts=pulumi.ResourceOptions(parent=self),
         )
 
-        self._appconfig_role = aws.iam.Role(
-            resource_name="ConfigAppconfigRole",
-            args=aws.iam.RoleArgs(
-                name=pulumi.Output.from_input(args.tenant_id).apply(
-                    lambda tenant_id: naming.template(
-                        name_template=Resource.AppconfigRoleTemplate.name,
-                        tenant_id=tenant_id,
-                    )
-                ),
-                assume_role_policy=aws.iam.get_policy_document_output(
-                    statements=[
-                        aws.iam.GetPolicyDocumentStatementArgs(
-                            principals=[
-                                aws.iam.GetPolicyDocumentStatementPrincipalArgs(
-                                    type="AWS", identifiers=[Resource.Api.roleArn]
-                                )
-                            ],
-                            actions=["sts:AssumeRole"],
+        # Shared roles are scoped to the tenant's configuration profiles by their tags
+        if not shared_tenant_roles:
+            self._appconfig_role = aws.iam.Role(
+                resource_name=f"{args.resource_prefix}ConfigAppconfigRole",
+                args=aws.iam.RoleArgs(
+                    name=pulumi.Output.from_input(args.tenant_id).apply(
+                        lambda tenant_id: naming.template(
+                            name_template=Resource.AppconfigRoleTemplate.name,
+                            tenant_id=tenant_id,
                         )
-                    ]
-                ).json,
-                inline_policies=[
-                    aws.iam.RoleInlinePolicyArgs(
-                        policy=aws.iam.get_policy_document_output(
-                            statements=pulumi.Output.all(
-                                api_client_credentials_configuration_profile=self._api_client_credentials_configuration_profile.arn,
-                                invoices_processor_client_credentials_configuration_profile=self._invoices_processor_client_credentials_configuration_profile.arn,
-                                papercut_mf_api_auth_token_configuration_profile=self._papercut_mf_api_auth_token_configuration_profile.arn,
-                                papercut_mf_sync_client_credentials_configuration_profile=self._papercut_mf_sync_client_credentials_configuration_profile.arn,
-                            ).apply(
-                                lambda arns: [
-                                    aws.iam.GetPolicyDocumentStatementArgs(
-                                        actions=[
-                                            "appconfig:CreateHostedConfigurationVersion"
-                                        ],
-                                        resources=[
-                                            Resource.AppconfigApplication.arn,
-                                            arns[
-                                                "api_client_credentials_configuration_profile"
-                                            ],
-                                            arns[
-                                                "invoices_processor_client_credentials_configuration_profile"
-                                            ],
-                                            arns[
-                                                "papercut_mf_api_auth_token_configuration_profile"
-                                            ],
-                                            arns[
-                                                "papercut_mf_sync_client_credentials_configuration_profile"
-                                            ],
-                                        ],
-                                    ),
-                                    aws.iam.GetPolicyDocumentStatementArgs(
-                                        actions=["appconfig:StartDeployment"],
-                                        resources=[
-                                            Resource.AppconfigAllAtOnceDeploymentStrategy.arn,
-                                            Resource.AppconfigApplication.arn,
-                                            Resource.AppconfigEnvironment.arn,
-                                            Resource.AppconfigLinear20PercentEvery6MinutesDeploymentStrategy.arn,
-                                            arns[
-                                                "api_client_credentials_configuration_profile"
-                                            ],
-                                            arns[
-                                                "invoices_processor_client_credentials_configuration_profile"
+                    ),
+                    assume_role_policy=aws.iam.get_policy_document_output(
+                        statements=[
+                            aws.iam.GetPolicyDocumentStatementArgs(
+                                principals=[
+                                    aws.iam.GetPolicyDocumentStatementPrincipalArgs(
+                                        type="AWS", identifiers=[Resource.Api.roleArn]
+                                    )
+                                ],
+                                actions=["sts:AssumeRole"],
+                            )
+                        ]
+                    ).json,
+                    inline_policies=[
+                        aws.iam.RoleInlinePolicyArgs(
+                            policy=aws.iam.get_policy_document_output(
+                                statements=pulumi.Output.all(
+                                    api_client_credentials_configuration_profile=self._api_client_credentials_configuration_profile.arn,
+                                    invoices_processor_client_credentials_configuration_profile=self._invoices_processor_client_credentials_configuration_profile.arn,
+                                    papercut_mf_api_auth_token_configuration_profile=self._papercut_mf_api_auth_token_configuration_profile.arn,
+                                    papercut_mf_sync_client_credentials_configuration_profile=self._papercut_mf_sync_client_credentials_configuration_profile.arn,
+                                ).apply(
+                                    lambda arns: [
+                                        aws.iam.GetPolicyDocumentStatementArgs(
+                                            actions=[
+                                                "appconfig:CreateHostedConfigurationVersion"
                                             ],
-                                            arns[
-                                                "papercut_mf_api_auth_token_configuration_profile"
+                                            resources=[
+                                                Resource.AppconfigApplication.arn,
+                                                arns[
+                                                    "api_client_credentials_configuration_profile"
+                                                ],
+                                                arns[
+                                                    "invoices_processor_client_credentials_configuration_profile"
+                                                ],
+                                                arns[
+                                                    "papercut_mf_api_auth_token_configuration_profile"
+                                                ],
+                                                arns[
+                                                    "papercut_mf_sync_client_credentials_configuration_profile"
+                                                ],
                                             ],
-                                            arns[
-                                                "papercut_mf_sync_client_credentials_configuration_profile"
+                                        ),
+                                        aws.iam.GetPolicyDocumentStatementArgs(
+                                            actions=["appconfig:StartDeployment"],
+                                            resources=[
+                                                Resource.AppconfigAllAtOnceDeploymentStrategy.arn,
+                                                Resource.AppconfigApplication.arn,
+                                                Resource.AppconfigEnvironment.arn,
+                                                Resource.AppconfigLinear20PercentEvery6MinutesDeploymentStrategy.arn,
+                                                arns[
+                                                    "api_client_credentials_configuration_profile"
+                                                ],
+                                                arns[
+                                                    "invoices_processor_client_credentials_configuration_profile"
+                                                ],
+                                                arns[
+                                                    "papercut_mf_api_auth_token_configuration_profile"
+                                                ],
+                                                arns[
+                                                    "papercut_mf_sync_client_credentials_configuration_profile"
+                                                ],
                                             ],
-                                        ],
-                                    ),
-                                ]
-                            )
-                        ).json
-                    )
-                ],
-            ),
-            opts=pulumi.ResourceOptions(parent=self),
-        )
+                                        ),
+                                    ]
+                                )
+                            ).json
+                        )
+                    ],
+                ),
+                opts=pulumi.ResourceOptions(parent=self),
+            )
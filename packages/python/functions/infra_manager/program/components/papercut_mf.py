@@ -1,4 +1,3 @@
-import base64
 from dataclasses import dataclass
 import json
 from typing import Optional
@@ -12,14 +11,32 @@ from program.components.vpc_service_binding import (
     VpcServiceBinding,
     VpcServiceBindingArgs,
 )
-from models import PapercutMfEnabledConfig
-from utils import naming, is_prod_stage
+from models import PapercutMfEnabledConfig, PapercutMfInvoicesProcessingConfig
+from utils import (
+    api_domain_label,
+    naming,
+    is_prod_stage,
+    shared_tenant_roles,
+    sync_dispatch,
+)
+from utils.pool import PooledResources, queue_name
+
+
+API_GATEWAY_SCRIPT_COMPATIBILITY_DATE = "2026-05-05"
 
 
 @dataclass
 class PapercutMfArgs:
     tenant_id: pulumi.Input[str]
     config: PapercutMfEnabledConfig
+    # Adopted (imported) instead of created, on the tenant's first update
+    pooled: Optional[PooledResources] = None
+    # The set its queues were adopted from on an earlier update, which keeps their names
+    pooled_set_id: Optional[str] = None
+    # Prefixes resource names, so tenants sharing a cell stack don't collide
+    resource_prefix: str = ""
+    # Spreads the sync schedule's invocations over a window, planned across the fleet
+    sync_window_minutes: Optional[int] = None
 
 
 class PapercutMf(pulumi.ComponentResource):
@@ -27,93 +44,150 @@ class PapercutMf(pulumi.ComponentResource):
         self, args: PapercutMfArgs, opts: Optional[pulumi.ResourceOptions] = None
     ):
         super().__init__(
-            t="pd:awscf:PapercutMf", name="PapercutMf", props=vars(args), opts=opts
+            t="pd:awscf:PapercutMf",
+            name=f"{args.resource_prefix}PapercutMf",
+            # The config and pooled resources aren't serializable resource inputs
+            props={"tenant_id": args.tenant_id},
+            opts=opts,
         )
 
-        self._sync_schedule_role = aws.iam.Role(
-            resource_name="PapercutMfSyncScheduleRole",
-            args=aws.iam.RoleArgs(
-                assume_role_policy=aws.iam.get_policy_document_output(
-                    statements=[
-                        aws.iam.GetPolicyDocumentStatementArgs(
-                            principals=[
-                                aws.iam.GetPolicyDocumentStatementPrincipalArgs(
-                                    type="Service",
-                                    identifiers=["scheduler.amazonaws.com"],
+        invoices_processing = (
+            args.config.invoices_processing or PapercutMfInvoicesProcessingConfig()
+        )
+        fifo_throughput = (
+            {
+                "deduplication_scope": "messageGroup",
+                "fifo_throughput_limit": "perMessageGroupId",
+            }
+            if invoices_processing.high_throughput
+            else {"deduplication_scope": "queue", "fifo_throughput_limit": "perQueue"}
+        )
+
+        # Otherwise the tenant is synced by its sync slot's schedule (see utils.dispatch)
+        if not sync_dispatch:
+            if not shared_tenant_roles:
+                self._sync_schedule_role = aws.iam.Role(
+                    resource_name=f"{args.resource_prefix}PapercutMfSyncScheduleRole",
+                    args=aws.iam.RoleArgs(
+                        assume_role_policy=aws.iam.get_policy_document_output(
+                            statements=[
+                                aws.iam.GetPolicyDocumentStatementArgs(
+                                    principals=[
+                                        aws.iam.GetPolicyDocumentStatementPrincipalArgs(
+                                            type="Service",
+                                            identifiers=["scheduler.amazonaws.com"],
+                                        )
+                                    ]
                                 )
                             ]
-                        )
-                    ]
-                ).json,
-                inline_policies=[
-                    aws.iam.get_policy_document_output(
-                        statements=[
-                            aws.iam.GetPolicyDocumentStatementArgs(
-                                actions=["lambda:InvokeFunction"],
-                                resources=[Resource.PapercutSync.arn],
-                            )
-                        ]
-                    ).json
-                ],
-            ),
-            opts=pulumi.ResourceOptions(parent=self),
-        )
+                        ).json,
+                        inline_policies=[
+                            aws.iam.get_policy_document_output(
+                                statements=[
+                                    aws.iam.GetPolicyDocumentStatementArgs(
+                                        actions=["lambda:InvokeFunction"],
+                                        resources=[Resource.PapercutMfSync.arn],
+                                    )
+                                ]
+                            ).json
+                        ],
+                    ),
+                    opts=pulumi.ResourceOptions(parent=self),
+                )
 
-        self._sync_schedule = aws.scheduler.Schedule(
-            resource_name="PapercutMfSyncSchedule",
-            args=aws.scheduler.ScheduleArgs(
-                flexible_time_window=aws.scheduler.ScheduleFlexibleTimeWindowArgs(
-                    mode="OFF",
-                ),
-                schedule_expression=f"cron({args.config.sync.cron_expression})",
-                schedule_expression_timezone=args.config.sync.timezone,
-                target=aws.scheduler.ScheduleTargetArgs(
-                    arn="arn:aws:scheduler:::aws-sdk:lambda:invoke",
-                    role_arn=self._sync_schedule_role.arn,
-                    input=pulumi.Output.json_dumps(
-                        {
-                            "FunctionName": Resource.PapercutMfSync.arn,
-                            "InvocationType": "Event",
-                        }
+            self._sync_schedule = aws.scheduler.Schedule(
+                resource_name=f"{args.resource_prefix}PapercutMfSyncSchedule",
+                args=aws.scheduler.ScheduleArgs(
+                    flexible_time_window=aws.scheduler.ScheduleFlexibleTimeWindowArgs(
+                        mode="FLEXIBLE",
+                        maximum_window_in_minutes=args.sync_window_minutes,
+                    )
+                    if args.sync_window_minutes is not None
+                    else aws.scheduler.ScheduleFlexibleTimeWindowArgs(
+                        mode="OFF",
+                    ),
+                    schedule_expression=f"cron({args.config.sync.cron_expression})",
+                    schedule_expression_timezone=args.config.sync.timezone,
+                    target=aws.scheduler.ScheduleTargetArgs(
+                        arn="arn:aws:scheduler:::aws-sdk:lambda:invoke",
+                        role_arn=Resource.PapercutMfSyncScheduleRole.arn
+                        if shared_tenant_roles
+                        else self._sync_schedule_role.arn,
+                        input=pulumi.Output.json_dumps(
+                            {
+                                "FunctionName": Resource.PapercutMfSync.arn,
+                                "InvocationType": "Event",
+                            }
+                        ),
                     ),
                 ),
-            ),
-            opts=pulumi.ResourceOptions(parent=self),
+                opts=pulumi.ResourceOptions(parent=self),
+            )
+
+        # A pooled queue's name is only given the update that claims it
+        queue_ignore_changes = (
+            ["name"]
+            if args.pooled is not None or args.pooled_set_id is not None
+            else None
         )
 
         self._invoices_processor_dead_letter_queue = aws.sqs.Queue(
-            resource_name="PapercutMfInvoicesProcessorDeadLetterQueue",
+            resource_name=f"{args.resource_prefix}PapercutMfInvoicesProcessorDeadLetterQueue",
             args=aws.sqs.QueueArgs(
                 fifo_queue=True,
                 content_based_deduplication=True,
+                **fifo_throughput,
+                **(
+                    {
+                        "name": queue_name(
+                            args.pooled.invoices_processor_dead_letter_queue_url
+                        )
+                    }
+                    if args.pooled is not None
+                    else {}
+                ),
             ),
             opts=pulumi.ResourceOptions(
                 parent=self,
                 retain_on_delete=is_prod_stage,
+                import_=args.pooled.invoices_processor_dead_letter_queue_url
+                if args.pooled is not None
+                else None,
+                ignore_changes=queue_ignore_changes,
             ),
         )
 
         self._invoices_processor_queue = aws.sqs.Queue(
-            resource_name="PapercutMfInvoicesProcessorQueue",
+            resource_name=f"{args.resource_prefix}PapercutMfInvoicesProcessorQueue",
             args=aws.sqs.QueueArgs(
                 fifo_queue=True,
                 content_based_deduplication=True,
-                visibility_timeout_seconds=30,
+                **fifo_throughput,
+                visibility_timeout_seconds=invoices_processing.visibility_timeout_seconds,
                 redrive_policy=pulumi.Output.json_dumps(
                     {
                         "deadLetterTargetArn": self._invoices_processor_dead_letter_queue.arn,
                         "maxReceiveCount": 3,
                     }
                 ),
+                **(
+                    {"name": queue_name(args.pooled.invoices_processor_queue_url)}
+                    if args.pooled is not None
+                    else {}
+                ),
             ),
             opts=pulumi.ResourceOptions(
                 parent=self,
                 retain_on_delete=is_prod_stage,
+                import_=args.pooled.invoices_processor_queue_url
+                if args.pooled is not None
+                else None,
+                ignore_changes=queue_ignore_changes,
             ),
         )
 
         self._invoices_processor_queue_policy = aws.sqs.QueuePolicy(
-            resource_name="PapercutMfInvoicesProcessorQueuePolicy",
+            resource_name=f"{args.resource_prefix}PapercutMfInvoicesProcessorQueuePolicy",
             args=aws.sqs.QueuePolicyArgs(
                 queue_url=self._invoices_processor_queue.url,
                 policy=aws.iam.get_policy_document_output(
@@ -145,67 +219,82 @@ class PapercutMf(pulumi.ComponentResource):
         )
 
         self._invoices_processor_event_source_mapping = aws.lambda_.EventSourceMapping(
-            resource_name="PapercutMfInvoicesProcessorEventSourceMapping",
+            resource_name=f"{args.resource_prefix}PapercutMfInvoicesProcessorEventSourceMapping",
             args=aws.lambda_.EventSourceMappingArgs(
                 function_response_types=["ReportBatchItemFailures"],
-                batch_size=10,
+                batch_size=invoices_processing.batch_size,
                 maximum_batching_window_in_seconds=0,
+                scaling_config=aws.lambda_.EventSourceMappingScalingConfigArgs(
+                    maximum_concurrency=invoices_processing.maximum_concurrency,
+                )
+                if invoices_processing.maximum_concurrency is not None
+                else None,
                 event_source_arn=self._invoices_processor_queue.arn,
                 function_name=Resource.InvoicesProcessor.name,
             ),
             opts=pulumi.ResourceOptions(parent=self),
         )
 
-        self._invoices_processor_queue_sender_role = aws.iam.Role(
-            resource_name="PapercutMfInvoicesProcessorQueueSenderRole",
-            args=aws.iam.RoleArgs(
-                name=pulumi.Output.from_input(args.tenant_id).apply(
-                    lambda tenant_id: naming.template(
-                        name_template=Resource.InvoicesProcessorQueueSenderRoleTemplate.name,
-                        tenant_id=tenant_id,
-                    )
-                ),
-                assume_role_policy=aws.iam.get_policy_document_output(
-                    statements=[
-                        aws.iam.GetPolicyDocumentStatementArgs(
-                            principals=[
-                                aws.iam.GetPolicyDocumentStatementPrincipalArgs(
-                                    type="AWS",
-                                    identifiers=[Resource.Api.arn],
-                                )
-                            ],
-                            actions=["sts:AssumeRole"],
+        # Shared roles are scoped to the tenant's queue by its tags
+        if not shared_tenant_roles:
+            self._invoices_processor_queue_sender_role = aws.iam.Role(
+                resource_name=f"{args.resource_prefix}PapercutMfInvoicesProcessorQueueSenderRole",
+                args=aws.iam.RoleArgs(
+                    name=pulumi.Output.from_input(args.tenant_id).apply(
+                        lambda tenant_id: naming.template(
+                            name_template=Resource.InvoicesProcessorQueueSenderRoleTemplate.name,
+                            tenant_id=tenant_id,
                         )
-                    ]
-                ).json,
-                inline_policies=[
-                    aws.iam.get_policy_document_output(
-                        statements=self._invoices_processor_queue.arn.apply(
-                            lambda arn: [
-                                aws.iam.GetPolicyDocumentStatementArgs(
-                                    actions=["sqs:SendMessage", "sqs:SendMessageBatch"],
-                                    resources=[arn],
-                                )
-                            ]
-                        )
-                    ).json
-                ],
-            ),
-            opts=pulumi.ResourceOptions(parent=self),
-        )
+                    ),
+                    assume_role_policy=aws.iam.get_policy_document_output(
+                        statements=[
+                            aws.iam.GetPolicyDocumentStatementArgs(
+                                principals=[
+                                    aws.iam.GetPolicyDocumentStatementPrincipalArgs(
+                                        type="AWS",
+                                        identifiers=[Resource.Api.arn],
+                                    )
+                                ],
+                                actions=["sts:AssumeRole"],
+                            )
+                        ]
+                    ).json,
+                    inline_policies=[
+                        aws.iam.get_policy_document_output(
+                            statements=self._invoices_processor_queue.arn.apply(
+                                lambda arn: [
+                                    aws.iam.GetPolicyDocumentStatementArgs(
+                                        actions=[
+                                            "sqs:SendMessage",
+                                            "sqs:SendMessageBatch",
+                                        ],
+                                        resources=[arn],
+                                    )
+                                ]
+                            )
+                        ).json
+                    ],
+                ),
+                opts=pulumi.ResourceOptions(parent=self),
+            )
 
         self._api_tunnel = cloudflare.ZeroTrustTunnelCloudflared(
-            resource_name="PapercutMfApiTunnel",
+            resource_name=f"{args.resource_prefix}PapercutMfApiTunnel",
             args=cloudflare.ZeroTrustTunnelCloudflaredArgs(
                 account_id=Resource.Cloudflare.account.id,
                 config_src="cloudflare",
                 name="",
             ),
-            opts=pulumi.ResourceOptions(parent=self),
+            opts=pulumi.ResourceOptions(
+                parent=self,
+                import_=f"{Resource.Cloudflare.account.id}/{args.pooled.api_tunnel_id}"
+                if args.pooled is not None
+                else None,
+            ),
         )
 
         self._api_vpc_service = cloudflare.ConnectivityDirectoryService(
-            resource_name="PapercutMfApiVpcService",
+            resource_name=f"{args.resource_prefix}PapercutMfApiVpcService",
             args=cloudflare.ConnectivityDirectoryServiceArgs(
                 account_id=Resource.Cloudflare.account.id,
                 type="http",
@@ -218,7 +307,7 @@ class PapercutMf(pulumi.ComponentResource):
                                 tunnel_id=self._api_tunnel.id,
                             ),
                         }
-                        if args.config.api.host._tag == "PapercutMfApiHostIpv4Config"
+                        if args.config.api.host.tag == "PapercutMfApiHostIpv4Config"
                         else {
                             "hostname": args.config.api.host.name,
                             **(
@@ -227,7 +316,7 @@ class PapercutMf(pulumi.ComponentResource):
                                         tunnel_id=self._api_tunnel.id,
                                     )
                                 }
-                                if args.config.api.host.resolver_ips is None
+                                if not args.config.api.host.resolver_ips
                                 else {
                                     "resolver_network": cloudflare.ConnectivityDirectoryServiceHostResolverNetworkArgs(
                                         tunnel_id=self._api_tunnel.id,
@@ -248,11 +337,11 @@ class PapercutMf(pulumi.ComponentResource):
         )
 
         self._api_gateway_script = cloudflare.WorkersScript(
-            resource_name="PapercutMfApiGatewayScript",
+            resource_name=f"{args.resource_prefix}PapercutMfApiGatewayScript",
             args=cloudflare.WorkersScriptArgs(
                 script_name="PapercutMfApiGatewayScript",
                 account_id=Resource.Cloudflare.account.id,
-                compatibility_date="2026-05-05",
+                compatibility_date=API_GATEWAY_SCRIPT_COMPATIBILITY_DATE,
                 content=aws.s3.get_object_output(
                     bucket=Resource.PapercutMfApiGatewayScriptObject.bucket,
                     key=Resource.PapercutMfApiGatewayScriptObject.key,
@@ -275,7 +364,7 @@ class PapercutMf(pulumi.ComponentResource):
                         type="plain_text",
                         name="HOSTNAME",
                         text=args.config.api.host.ipv4
-                        if args.config.api.host._tag == "PapercutMfApiHostIpv4Config"
+                        if args.config.api.host.tag == "PapercutMfApiHostIpv4Config"
                         else args.config.api.host.name,
                     ),
                     cloudflare.WorkersScriptBindingArgs(
@@ -318,7 +407,7 @@ class PapercutMf(pulumi.ComponentResource):
         )
 
         self._api_gateway_vpc_service_binding = VpcServiceBinding(
-            resource_name="PapercutMfApiGatewayVpcServiceBinding",
+            resource_name=f"{args.resource_prefix}PapercutMfApiGatewayVpcServiceBinding",
             args=VpcServiceBindingArgs(
                 script_name=self._api_gateway_script.script_name,
                 name="PAPERCUT_MF_API",
@@ -328,17 +417,12 @@ class PapercutMf(pulumi.ComponentResource):
         )
 
         self._api_domain = cloudflare.WorkersCustomDomain(
-            resource_name="PapercutMfApiDomain",
+            resource_name=f"{args.resource_prefix}PapercutMfApiDomain",
             args=cloudflare.WorkersCustomDomainArgs(
                 account_id=Resource.Cloudflare.account.id,
                 zone_id=Resource.Zone.id,
                 hostname=pulumi.Output.from_input(args.tenant_id).apply(
-                    lambda tenant_id: (
-                        base64.b32encode(tenant_id.encode("utf-8"))
-                        .decode("utf-8")
-                        .lower()
-                        .rstrip("=")
-                    )
+                    api_domain_label
                 ),
                 service=self._api_gateway_script.script_name,
             ),
@@ -5,12 +5,13 @@ import pulumi
 import pulumi_aws as aws
 from sst import Resource
 
-from utils import naming
+from utils import naming, shared_tenant_roles
 
 
 @dataclass
 class RealtimeArgs:
     tenant_id: pulumi.Input[str]
+    resource_prefix: str = ""
 
 
 class Realtime(pulumi.ComponentResource):
@@ -19,13 +20,13 @@ class Realtime(pulumi.ComponentResource):
     ):
         super().__init__(
             t="pd:aws:Realtime",
-            name="Realtime",
+            name=f"{args.resource_prefix}Realtime",
             props=vars(args),
             opts=opts,
         )
 
         self._channel_namespace = aws.appsync.ChannelNamespace(
-            resource_name="RealtimeChannelNamespace",
+            resource_name=f"{args.resource_prefix}RealtimeChannelNamespace",
             args=aws.appsync.ChannelNamespaceArgs(
                 api_id=Resource.AppsyncApi.id,
                 name=args.tenant_id,
@@ -33,86 +34,88 @@ class Realtime(pulumi.ComponentResource):
             opts=pulumi.ResourceOptions(parent=self),
         )
 
-        self._publisher_role = aws.iam.Role(
-            resource_name="RealtimePublisherRole",
-            args=aws.iam.RoleArgs(
-                name=pulumi.Output.from_input(args.tenant_id).apply(
-                    lambda tenant_id: naming.template(
-                        name_template=Resource.AppsyncChannelNamespacePublisherRoleTemplate.name,
-                        tenant_id=tenant_id,
-                    )
+        # Shared roles are scoped to the tenant's channel namespace by session tags
+        if not shared_tenant_roles:
+            self._publisher_role = aws.iam.Role(
+                resource_name=f"{args.resource_prefix}RealtimePublisherRole",
+                args=aws.iam.RoleArgs(
+                    name=pulumi.Output.from_input(args.tenant_id).apply(
+                        lambda tenant_id: naming.template(
+                            name_template=Resource.AppsyncChannelNamespacePublisherRoleTemplate.name,
+                            tenant_id=tenant_id,
+                        )
+                    ),
+                    assume_role_policy=aws.iam.get_policy_document_output(
+                        statements=[
+                            aws.iam.GetPolicyDocumentStatementArgs(
+                                principals=[
+                                    aws.iam.GetPolicyDocumentStatementPrincipalArgs(
+                                        type="AWS",
+                                        identifiers=[Resource.Api.roleArn],
+                                    ),
+                                ],
+                                actions=["sts:AssumeRole"],
+                            )
+                        ]
+                    ).json,
+                    inline_policies=[
+                        aws.iam.RoleInlinePolicyArgs(
+                            policy=aws.iam.get_policy_document_output(
+                                statements=self._channel_namespace.channel_namespace_arn.apply(
+                                    lambda channel_namespace_arn: [
+                                        aws.iam.GetPolicyDocumentStatementArgs(
+                                            actions=["appsync:EventPublish"],
+                                            resources=[channel_namespace_arn],
+                                        )
+                                    ]
+                                )
+                            ).json
+                        )
+                    ],
                 ),
-                assume_role_policy=aws.iam.get_policy_document_output(
-                    statements=[
-                        aws.iam.GetPolicyDocumentStatementArgs(
-                            principals=[
-                                aws.iam.GetPolicyDocumentStatementPrincipalArgs(
-                                    type="AWS",
-                                    identifiers=[Resource.Api.roleArn],
-                                ),
-                            ],
-                            actions=["sts:AssumeRole"],
+                opts=pulumi.ResourceOptions(parent=self),
+            )
+
+            self._subscriber_role = aws.iam.Role(
+                resource_name=f"{args.resource_prefix}RealtimeSubscriberRole",
+                args=aws.iam.RoleArgs(
+                    name=pulumi.Output.from_input(args.tenant_id).apply(
+                        lambda tenant_id: naming.template(
+                            name_template=Resource.AppsyncChannelNamespaceSubscriberRoleTemplate.name,
+                            tenant_id=tenant_id,
                         )
-                    ]
-                ).json,
-                inline_policies=[
-                    aws.iam.RoleInlinePolicyArgs(
-                        policy=aws.iam.get_policy_document_output(
-                            statements=self._channel_namespace.channel_namespace_arn.apply(
-                                lambda channel_namespace_arn: [
-                                    aws.iam.GetPolicyDocumentStatementArgs(
-                                        actions=["appsync:EventPublish"],
-                                        resources=[channel_namespace_arn],
+                    ),
+                    assume_role_policy=aws.iam.get_policy_document_output(
+                        statements=[
+                            aws.iam.GetPolicyDocumentStatementArgs(
+                                principals=[
+                                    aws.iam.GetPolicyDocumentStatementPrincipalArgs(
+                                        type="AWS",
+                                        identifiers=[Resource.Api.roleArn],
                                     )
-                                ]
+                                ],
+                                actions=["sts:AssumeRole"],
                             )
-                        ).json
-                    )
-                ],
-            ),
-            opts=pulumi.ResourceOptions(parent=self),
-        )
-
-        self._subscriber_role = aws.iam.Role(
-            resource_name="RealtimeSubscriberRole",
-            args=aws.iam.RoleArgs(
-                name=pulumi.Output.from_input(args.tenant_id).apply(
-                    lambda tenant_id: naming.template(
-                        name_template=Resource.AppsyncChannelNamespaceSubscriberRoleTemplate.name,
-                        tenant_id=tenant_id,
-                    )
-                ),
-                assume_role_policy=aws.iam.get_policy_document_output(
-                    statements=[
-                        aws.iam.GetPolicyDocumentStatementArgs(
-                            principals=[
-                                aws.iam.GetPolicyDocumentStatementPrincipalArgs(
-                                    type="AWS",
-                                    identifiers=[Resource.Api.roleArn],
+                        ]
+                    ).json,
+                    inline_policies=[
+                        aws.iam.RoleInlinePolicyArgs(
+                            policy=aws.iam.get_policy_document_output(
+                                statements=self._channel_namespace.channel_namespace_arn.apply(
+                                    lambda channel_namespace_arn: [
+                                        aws.iam.GetPolicyDocumentStatementArgs(
+                                            actions=["appsync:EventConnect"],
+                                            resources=[Resource.AppsyncApi.arn],
+                                        ),
+                                        aws.iam.GetPolicyDocumentStatementArgs(
+                                            actions=["appsync:EventSubscribe"],
+                                            resources=[channel_namespace_arn],
+                                        ),
+                                    ]
                                 )
-                            ],
-                            actions=["sts:AssumeRole"],
+                            ).json
                         )
-                    ]
-                ).json,
-                inline_policies=[
-                    aws.iam.RoleInlinePolicyArgs(
-                        policy=aws.iam.get_policy_document_output(
-                            statements=self._channel_namespace.channel_namespace_arn.apply(
-                                lambda channel_namespace_arn: [
-                                    aws.iam.GetPolicyDocumentStatementArgs(
-                                        actions=["appsync:EventConnect"],
-                                        resources=[Resource.AppsyncApi.arn],
-                                    ),
-                                    aws.iam.GetPolicyDocumentStatementArgs(
-                                        actions=["appsync:EventSubscribe"],
-                                        resources=[channel_namespace_arn],
-                                    ),
-                                ]
-                            )
-                        ).json
-                    )
-                ],
-            ),
-            opts=pulumi.ResourceOptions(parent=self),
-        )
+                    ],
+                ),
+                opts=pulumi.ResourceOptions(parent=self),
+            )
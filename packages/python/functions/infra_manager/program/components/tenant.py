@@ -0,0 +1,41 @@
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import pulumi
+import pulumi_aws as aws
+from sst import Resource
+
+from utils.cells import TENANT
+
+
+@dataclass
+class TenantArgs:
+    tenant_id: str
+    tags: Dict[str, str]
+    resource_prefix: str = ""
+
+
+class Tenant(pulumi.ComponentResource):
+    """
+    Parents a tenant's components in a cell stack, so the tenant's resources can be
+    targeted together. Its aws provider tags the tenant's resources, like the default tags
+    of a tenant's own stack do.
+    """
+
+    def __init__(self, args: TenantArgs, opts: Optional[pulumi.ResourceOptions] = None):
+        super().__init__(t=TENANT, name=args.tenant_id, props=vars(args), opts=opts)
+
+        self.aws_provider = aws.Provider(
+            resource_name=f"{args.resource_prefix}Aws",
+            args=aws.ProviderArgs(
+                region=Resource.Aws.region,
+                assume_roles=[
+                    aws.ProviderAssumeRoleArgs(
+                        role_arn=Resource.PulumiRole.arn,
+                        external_id=Resource.PulumiRole.externalId,
+                    )
+                ],
+                default_tags=aws.ProviderDefaultTagsArgs(tags=args.tags),
+            ),
+            opts=pulumi.ResourceOptions(parent=self),
+        )
@@ -2,9 +2,7 @@ from dataclasses import dataclass
 
 import pulumi
 
-from program.components.vpc_service_binding.provider import (
-    VpcServiceBindingProvider,
-)
+from provider import VPC_SERVICE_BINDING
 
 
 @dataclass
@@ -14,7 +12,7 @@ class VpcServiceBindingArgs:
     service_id: pulumi.Input[str]
 
 
-class VpcServiceBinding(pulumi.dynamic.Resource):
+class VpcServiceBinding(pulumi.CustomResource):
     script_name: pulumi.Output[str]
     name: pulumi.Output[str]
     service_id: pulumi.Output[str]
@@ -26,8 +24,8 @@ class VpcServiceBinding(pulumi.dynamic.Resource):
         opts: pulumi.ResourceOptions,
     ):
         super().__init__(
-            provider=VpcServiceBindingProvider(),
+            t=VPC_SERVICE_BINDING,
             name=resource_name,
             props=vars(args),
-            opts=opts.merge(pulumi.ResourceOptions(delete_before_replace=True)),
+            opts=opts,
         )
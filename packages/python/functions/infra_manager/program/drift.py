@@ -0,0 +1,79 @@
+from typing import Dict, List
+
+from pulumi.automation import events
+
+from models import DriftedResource
+
+
+IGNORED_OPS = (
+    # Steps that don't change anything when applied
+    "same",
+    "read",
+    "discard",
+    # Steps that accompany a replace step
+    "create-replacement",
+    "delete-replaced",
+    "discard-replaced",
+    "read-replacement",
+    "import-replacement",
+)
+# Keep reports well within the item size limit
+MAX_DIFFS_PER_RESOURCE = 20
+
+
+def diffs(metadata: events.StepEventMetadata) -> List[str]:
+    if metadata.detailed_diff:
+        paths = [
+            f"{path} ({diff.diff_kind.value})"
+            for path, diff in sorted(metadata.detailed_diff.items())
+        ]
+    else:
+        paths = sorted(metadata.diffs or [])
+
+    if len(paths) > MAX_DIFFS_PER_RESOURCE:
+        paths = [
+            *paths[:MAX_DIFFS_PER_RESOURCE],
+            f"... {len(paths) - MAX_DIFFS_PER_RESOURCE} more",
+        ]
+
+    return paths
+
+
+class DriftCollector:
+    """
+    Collects the resources a refresh-and-preview found drifted from its engine events:
+    - Refresh steps whose outputs changed, i.e. a resource edited or deleted out of band
+    - Preview steps that would change a resource to converge it back to the program
+    """
+
+    def __init__(self):
+        self._resources: Dict[str, DriftedResource] = {}
+
+    def __call__(self, event: events.EngineEvent):
+        if event.resource_pre_event is None:
+            return
+
+        metadata = event.resource_pre_event.metadata
+        if metadata.op.value in IGNORED_OPS:
+            return
+        if metadata.op.value == "refresh" and not (
+            metadata.diffs or metadata.detailed_diff
+        ):
+            return
+        # Stack and provider resources are the engine's own
+        if metadata.type == "pulumi:pulumi:Stack" or metadata.type.startswith(
+            "pulumi:providers:"
+        ):
+            return
+
+        resource = self._resources.setdefault(
+            metadata.urn, DriftedResource(urn=metadata.urn, op=metadata.op.value)
+        )
+        # The preview step is what applying would do, it takes precedence over the refresh
+        if metadata.op.value != "refresh":
+            resource.op = metadata.op.value
+        resource.diffs = sorted({*resource.diffs, *diffs(metadata)})
+
+    @property
+    def resources(self) -> List[DriftedResource]:
+        return list(self._resources.values())
@@ -0,0 +1,118 @@
+from functools import cache
+import hashlib
+from importlib.metadata import version
+from pathlib import Path
+
+from sst import Resource
+
+from utils import SEPARATOR, dynamo, shared_tenant_roles, sync_dispatch
+from utils.lease import Lease, LeaseLostError
+
+
+TAG = "pd:programFingerprint"
+ROOT = Path(__file__).resolve().parent.parent
+# The modules that determine the resources the program declares, i.e. not the handler's
+# own modules in the program package (drift, progress, preflight, ...)
+SOURCES = (
+    "program/__init__.py",
+    "program/components",
+    "provider/__init__.py",
+    "models/config.py",
+    "utils/__init__.py",
+    "utils/cells.py",
+    "utils/naming.py",
+    "utils/pool.py",
+)
+PACKAGES = ("pulumi-aws", "pulumi-cloudflare", "pulumiverse-time")
+
+
+def source_files():
+    for source in SOURCES:
+        path = ROOT / source
+        yield from sorted(path.rglob("*.py")) if path.is_dir() else [path]
+
+
+@cache
+def current() -> str:
+    """
+    Fingerprint of the program in this build, i.e. a hash of:
+    - The source of the modules that declare the program's resources
+    - The resolved provider package versions
+    - The workers compatibility date of the PapercutMf api gateway script
+    - The deployment's modes, which change the resources the program declares
+    """
+    from program.components.papercut_mf import API_GATEWAY_SCRIPT_COMPATIBILITY_DATE
+
+    digest = hashlib.sha256()
+    for path in source_files():
+        digest.update(path.relative_to(ROOT).as_posix().encode())
+        digest.update(path.read_bytes())
+    for package in PACKAGES:
+        digest.update(f"{package}=={version(package)}".encode())
+    digest.update(API_GATEWAY_SCRIPT_COMPATIBILITY_DATE.encode())
+    digest.update(
+        f"shared_tenant_roles={shared_tenant_roles},sync_dispatch={sync_dispatch}".encode()
+    )
+
+    return digest.hexdigest()
+
+
+def index_key(fingerprint: str, tenant_id: str):
+    """
+    Stamped stacks' items are indexed by fingerprint in a sparse partition of the table's
+    first index (INFRA#STACK), so stale stacks are listed without scanning the table.
+    """
+    gsi1 = Resource.Dynamo.globalSecondaryIndexes.gsi1
+    return {
+        gsi1.hashKey: dynamo.infra_key(Resource.Dynamo.keyLiterals.STACK),
+        gsi1.rangeKey: SEPARATOR.join([fingerprint, tenant_id]),
+    }
+
+
+def record_fingerprint(lease: Lease, fingerprint: str):
+    """
+    Mirrors the fingerprint of the program the stack was last fully updated with onto the
+    tenant's stack item, so stale stacks can be listed without opening their state.
+    """
+    gsi1 = Resource.Dynamo.globalSecondaryIndexes.gsi1
+    index = index_key(fingerprint, lease.tenant_id)
+    try:
+        dynamo.table.update_item(
+            Key=lease.key,
+            UpdateExpression="SET programFingerprint = :fingerprint, #indexPk = :indexPk, #indexSk = :indexSk",
+            ConditionExpression="fencingToken = :token",
+            ExpressionAttributeNames={
+                "#indexPk": gsi1.hashKey,
+                "#indexSk": gsi1.rangeKey,
+            },
+            ExpressionAttributeValues={
+                ":token": lease.token,
+                ":fingerprint": fingerprint,
+                ":indexPk": index[gsi1.hashKey],
+                ":indexSk": index[gsi1.rangeKey],
+            },
+        )
+    except dynamo.ConditionalCheckFailedException:
+        raise LeaseLostError(
+            f"Lease on the stack of tenant {lease.tenant_id} (token {lease.token}) was taken over."
+        )
+
+
+def clear_fingerprint(lease: Lease):
+    """Unstamps the tenant's stack item once its resources were destroyed."""
+    gsi1 = Resource.Dynamo.globalSecondaryIndexes.gsi1
+    try:
+        dynamo.table.update_item(
+            Key=lease.key,
+            UpdateExpression="REMOVE programFingerprint, #indexPk, #indexSk",
+            ConditionExpression="fencingToken = :token",
+            ExpressionAttributeNames={
+                "#indexPk": gsi1.hashKey,
+                "#indexSk": gsi1.rangeKey,
+            },
+            ExpressionAttributeValues={":token": lease.token},
+        )
+    except dynamo.ConditionalCheckFailedException:
+        raise LeaseLostError(
+            f"Lease on the stack of tenant {lease.tenant_id} (token {lease.token}) was taken over."
+        )
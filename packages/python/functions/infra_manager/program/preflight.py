@@ -0,0 +1,277 @@
+import re
+from typing import Dict, List, Tuple
+
+from sst import Resource
+
+from models import (
+    Input,
+    PapercutMfEnabledConfig,
+    PapercutMfInvoicesProcessingConfig,
+    PreflightIssue,
+)
+from utils import api_domain_label, ipv4_pattern, shared_tenant_roles, sync_dispatch
+from utils.cells import Placement
+
+
+# RFC 1035
+MAX_DNS_LABEL_LENGTH = 63
+# The random part naming.physical adds to a name, with its separator
+PHYSICAL_RANDOM_LENGTH = 9
+# The random part the engine's auto-naming adds to a name, with its separator
+AUTONAME_RANDOM_LENGTH = 8
+
+MONTHS = {
+    name: number
+    for number, name in enumerate(
+        ["JAN", "FEB", "MAR", "APR", "MAY", "JUN"]
+        + ["JUL", "AUG", "SEP", "OCT", "NOV", "DEC"],
+        start=1,
+    )
+}
+DAYS = {
+    name: number
+    for number, name in enumerate(
+        ["SUN", "MON", "TUE", "WED", "THU", "FRI", "SAT"], start=1
+    )
+}
+# The fields of EventBridge Scheduler's cron expressions, as (name, min, max, names)
+CRON_FIELDS: List[Tuple[str, int, int, Dict[str, int]]] = [
+    ("minutes", 0, 59, {}),
+    ("hours", 0, 23, {}),
+    ("day-of-month", 1, 31, {}),
+    ("month", 1, 12, MONTHS),
+    ("day-of-week", 1, 7, DAYS),
+    ("year", 1970, 2199, {}),
+]
+CRON_RANGE = re.compile(r"^(?:\*|(?P<start>\w+)(?:-(?P<end>\w+))?)(?:/(?P<step>\d+))?$")
+# Last day (of the month, or its last given weekday), nearest weekday, nth weekday
+CRON_DAY_OF_MONTH_SPECIAL = re.compile(r"^(?:L|LW|(?P<day>\d+)W)$")
+CRON_DAY_OF_WEEK_SPECIAL = re.compile(r"^(?:L|(?P<day>\w+)(?:L|#[1-5]))$")
+
+
+class PreflightError(Exception):
+    def __init__(self, issues: List[PreflightIssue]):
+        super().__init__(
+            "; ".join(f"{issue.path}: {issue.message}" for issue in issues)
+        )
+        self.issues = issues
+
+
+def auto_named(config: PapercutMfEnabledConfig) -> List[Tuple[str, str, int, str]]:
+    """
+    The program's resources naming.transform_resource would name (those not given a name),
+    as (type, name, maximum length, suffix after the tenant id).
+    """
+    resources = [
+        (
+            "aws:sqs/queue:Queue",
+            "PapercutMfInvoicesProcessorDeadLetterQueue",
+            80,
+            ".fifo",
+        ),
+        ("aws:sqs/queue:Queue", "PapercutMfInvoicesProcessorQueue", 80, ".fifo"),
+    ]
+    if not sync_dispatch:
+        resources.append(
+            ("aws:scheduler/schedule:Schedule", "PapercutMfSyncSchedule", 64, "")
+        )
+        if not shared_tenant_roles:
+            resources.append(
+                ("aws:iam/role:Role", "PapercutMfSyncScheduleRole", 64, "")
+            )
+    return resources
+
+
+def check_names(
+    placement: Placement, config: PapercutMfEnabledConfig
+) -> List[PreflightIssue]:
+    """
+    Auto-named resources need room for some of their name next to the random part (and the
+    tenant id), otherwise their name can't be truncated within their limit. Resources of a
+    type whose names are truncated to the same name are only told apart by the random part,
+    which fails the check as well. A tenant's own stack names them with naming.physical, a
+    cell stack's are auto-named by the engine from their tenant prefixed names.
+    """
+    # The naming module imports the provider sdks, which the program imports when it runs
+    from utils import naming
+
+    issues: List[PreflightIssue] = []
+    truncated: Dict[Tuple[str, str], str] = {}
+    for type_, name, max_, suffix in auto_named(config):
+        name = f"{placement.resource_prefix}{name}"
+        if placement.cell is None:
+            room = (
+                max_ - PHYSICAL_RANDOM_LENGTH - len(placement.tenant_id) - len(suffix)
+            )
+        else:
+            room = max_ - AUTONAME_RANDOM_LENGTH - len(suffix)
+        if room < 1:
+            issues.append(
+                PreflightIssue(
+                    path="tenantId",
+                    code="resource-name",
+                    message=f"No room for {name}'s name within {max_} characters",
+                )
+            )
+            continue
+
+        main = naming.prefix(room, name) if placement.cell is None else name[:room]
+        other = truncated.setdefault((type_, main), name)
+        if other != name:
+            issues.append(
+                PreflightIssue(
+                    path="tenantId",
+                    code="resource-name",
+                    message=f"{other} and {name} are both truncated to {main} within {max_} characters",
+                )
+            )
+    return issues
+
+
+def check_api_domain(tenant_id: str) -> List[PreflightIssue]:
+    label = api_domain_label(tenant_id)
+    if len(label) <= MAX_DNS_LABEL_LENGTH:
+        return []
+
+    return [
+        PreflightIssue(
+            path="tenantId",
+            code="api-domain",
+            message=f"The api domain's label is {len(label)} characters, over {MAX_DNS_LABEL_LENGTH}",
+        )
+    ]
+
+
+def cron_value(value: str, min_: int, max_: int, names: Dict[str, int]) -> bool:
+    number = names.get(value.upper()) if not value.isdigit() else int(value)
+    return number is not None and min_ <= number <= max_
+
+
+def cron_field_errors(
+    field: str, name: str, min_: int, max_: int, names: Dict[str, int]
+) -> List[str]:
+    if field == "?":
+        return [] if name in ("day-of-month", "day-of-week") else [f"{name} can't be ?"]
+
+    errors: List[str] = []
+    for part in field.split(","):
+        special = (
+            CRON_DAY_OF_MONTH_SPECIAL.match(part)
+            if name == "day-of-month"
+            else CRON_DAY_OF_WEEK_SPECIAL.match(part)
+            if name == "day-of-week"
+            else None
+        )
+        if special is not None:
+            if special["day"] is not None and not cron_value(
+                special["day"], min_, max_, names
+            ):
+                errors.append(f"{name} {part} is out of range")
+            continue
+
+        match = CRON_RANGE.match(part)
+        if match is None:
+            errors.append(f"{name} {part} isn't a value, range or increment")
+            continue
+        if any(
+            value is not None and not cron_value(value, min_, max_, names)
+            for value in (match["start"], match["end"])
+        ):
+            errors.append(f"{name} {part} is out of range {min_}-{max_}")
+        if match["step"] is not None and int(match["step"]) < 1:
+            errors.append(f"{name} {part} has an increment of 0")
+    return errors
+
+
+def check_cron_expression(cron_expression: str) -> List[PreflightIssue]:
+    """
+    Checks the sync's cron expression against EventBridge Scheduler's rules, which are
+    stricter than AWSCron's (i.e. it accepts out of range values).
+    """
+    fields = cron_expression.split()
+    if len(fields) != len(CRON_FIELDS):
+        errors = [f"Expected {len(CRON_FIELDS)} fields, got {len(fields)}"]
+    else:
+        errors = [
+            error
+            for field, (name, min_, max_, names) in zip(fields, CRON_FIELDS)
+            for error in cron_field_errors(field, name, min_, max_, names)
+        ]
+        # One of the day fields has to be ?, but not both
+        if (fields[2] == "?") == (fields[4] == "?"):
+            errors.append("Exactly one of day-of-month and day-of-week must be ?")
+
+    return [
+        PreflightIssue(
+            path="papercutMfConfig.sync.cronExpression",
+            code="cron-expression",
+            message=error,
+        )
+        for error in errors
+    ]
+
+
+def check_resolver_ips(config: PapercutMfEnabledConfig) -> List[PreflightIssue]:
+    """Resolver ips resolve the api's hostname, an ipv4 host is reached as is."""
+    host = config.api.host
+    if not host.resolver_ips:
+        return []
+
+    if host.tag == "PapercutMfApiHostIpv4Config":
+        message = "Resolver ips can't be combined with an ipv4 host"
+    elif re.match(ipv4_pattern, host.name):
+        message = f"Resolver ips can't be combined with a host name that's an ipv4 address ({host.name})"
+    else:
+        return []
+
+    return [
+        PreflightIssue(
+            path="papercutMfConfig.api.host.resolverIps",
+            code="resolver-ips",
+            message=message,
+        )
+    ]
+
+
+def check_visibility_timeout(config: PapercutMfEnabledConfig) -> List[PreflightIssue]:
+    """
+    The invoices queue's event source mapping can't be created while the queue's visibility
+    timeout is shorter than the processor's timeout.
+    """
+    invoices_processing = (
+        config.invoices_processing or PapercutMfInvoicesProcessingConfig()
+    )
+    timeout_seconds = int(Resource.InvoicesProcessor.timeout)
+    if invoices_processing.visibility_timeout_seconds >= timeout_seconds:
+        return []
+
+    return [
+        PreflightIssue(
+            path="papercutMfConfig.invoicesProcessing.visibilityTimeoutSeconds",
+            code="visibility-timeout",
+            message=f"The visibility timeout ({invoices_processing.visibility_timeout_seconds} seconds) is shorter than the invoices processor's timeout ({timeout_seconds} seconds)",
+        )
+    ]
+
+
+def check(placement: Placement, _input: Input) -> List[PreflightIssue]:
+    """
+    Checks an input for what would otherwise only fail once the engine applies it, which
+    takes milliseconds rather than the stack's initialization and a failed update:
+    - Auto-named resources' names fit their limits and stay distinct (see `check_names`)
+    - The api domain's label fits a dns label
+    - The sync's cron expression is one EventBridge Scheduler accepts
+    - Resolver ips aren't combined with an ipv4 host
+    - The invoices queue's visibility timeout covers the invoices processor's timeout
+    """
+    config = _input.papercut_mf_config
+    if not config.enabled:
+        return []
+
+    return [
+        *check_names(placement, config),
+        *check_api_domain(placement.tenant_id),
+        *check_cron_expression(config.sync.cron_expression),
+        *check_resolver_ips(config),
+        *check_visibility_timeout(config),
+    ]
@@ -0,0 +1,131 @@
+from datetime import datetime, timezone
+import queue
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from pulumi.automation import events
+
+from models import DeploymentProgress, Input
+
+
+# The realtime event handler's name (InfraContract.deployment)
+DEPLOYMENT_EVENT = "/infra/deployment"
+# Resource counts are published at most this often while the engine steps
+PUBLISH_INTERVAL_SECONDS = 2.0
+# How long closing the reporter waits for the publishes still queued
+CLOSE_TIMEOUT_SECONDS = 10.0
+
+
+class DeploymentProgressReporter:
+    """
+    Reports a deployment's progress to the tenant's realtime channel, keyed by its input's
+    callback id (a deployment without one isn't reported):
+    - Each phase as it's entered, with the resources stepped so far
+    - Resources the engine finished a step of, from its engine events, at most every
+      `PUBLISH_INTERVAL_SECONDS`
+
+    Reporting is best effort, a failure to publish is passed to `on_error` rather than
+    failing the deployment. Progress is published in order from a background thread, so
+    the engine's event callback never waits on the realtime api, and closing the reporter
+    (i.e. leaving its context) waits for what's still queued.
+    """
+
+    def __init__(
+        self,
+        tenant_id: str,
+        _input: Optional[Input],
+        publish: Callable[[str, str, Dict], None],
+        on_error: Callable[[Exception], None],
+    ):
+        self.tenant_id = tenant_id
+        self.callback_id = _input.callback_id if _input is not None else None
+        self.deployment_id = _input.deployment_id if _input is not None else None
+        self._publish = publish
+        self._on_error = on_error
+        self._lock = threading.Lock()
+        self._phase = "started"
+        self._resource_changes: Dict[str, int] = {}
+        self._published_at = 0.0
+        self._queue: queue.Queue[Optional[DeploymentProgress]] = queue.Queue()
+        self._publisher: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.callback_id is not None and self.deployment_id is not None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _publish_queued(self):
+        while (progress := self._queue.get()) is not None:
+            try:
+                self._publish(
+                    self.tenant_id,
+                    DEPLOYMENT_EVENT,
+                    progress.model_dump(mode="json", by_alias=True, exclude_none=True),
+                )
+            except Exception as e:
+                self._on_error(e)
+
+    def _report(self, error: Optional[str] = None):
+        with self._lock:
+            self._queue.put(
+                DeploymentProgress(
+                    callback_id=self.callback_id,
+                    deployment_id=self.deployment_id,
+                    phase=self._phase,
+                    resource_changes=dict(self._resource_changes),
+                    error=error,
+                    at=datetime.now(timezone.utc),
+                )
+            )
+            self._published_at = time.monotonic()
+
+            if self._publisher is None:
+                self._publisher = threading.Thread(
+                    target=self._publish_queued, daemon=True
+                )
+                self._publisher.start()
+
+    def close(self, timeout: float = CLOSE_TIMEOUT_SECONDS):
+        with self._lock:
+            publisher, self._publisher = self._publisher, None
+        if publisher is None:
+            return
+
+        self._queue.put(None)
+        publisher.join(timeout=timeout)
+        if publisher.is_alive():
+            self._on_error(
+                TimeoutError(f"Progress wasn't published within {timeout} seconds")
+            )
+
+    def phase(self, phase: str, error: Optional[str] = None):
+        if not self.enabled:
+            return
+
+        self._phase = phase
+        self._report(error=error)
+
+    def __call__(self, event: events.EngineEvent):
+        if not self.enabled or event.res_outputs_event is None:
+            return
+
+        metadata = event.res_outputs_event.metadata
+        # Stack and provider resources are the engine's own
+        if metadata.type == "pulumi:pulumi:Stack" or metadata.type.startswith(
+            "pulumi:providers:"
+        ):
+            return
+
+        with self._lock:
+            op = metadata.op.value
+            self._resource_changes[op] = self._resource_changes.get(op, 0) + 1
+            due = time.monotonic() - self._published_at >= PUBLISH_INTERVAL_SECONDS
+
+        if due:
+            self._report()
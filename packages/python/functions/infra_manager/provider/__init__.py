@@ -0,0 +1,8 @@
+# The package of the printdesk resource provider, served by the pulumi-resource-printdesk plugin
+NAME = "printdesk"
+VERSION = "0.1.0"
+
+ROUTES = f"{NAME}:index:Routes"
+VPC_SERVICE_BINDING = f"{NAME}:index:VpcServiceBinding"
+
+__all__ = ["NAME", "VERSION", "ROUTES", "VPC_SERVICE_BINDING"]
@@ -0,0 +1,10 @@
+import sys
+
+from pulumi.provider.experimental.server import main
+
+from provider import VERSION
+from provider.server import PrintdeskProvider
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:], VERSION, PrintdeskProvider())
@@ -0,0 +1,26 @@
+import boto3
+from types_boto3_sts import STSClient
+from types_boto3_sts.type_defs import CredentialsTypeDef
+
+
+def assume_role(role_arn: str, external_id: str) -> CredentialsTypeDef:
+    sts: STSClient = boto3.client("sts")
+
+    return sts.assume_role(
+        RoleArn=role_arn,
+        RoleSessionName="InfraManager",
+        ExternalId=external_id,
+    )["Credentials"]
+
+
+def credentials_session(credentials: CredentialsTypeDef, region: str) -> boto3.Session:
+    return boto3.Session(
+        aws_access_key_id=credentials["AccessKeyId"],
+        aws_secret_access_key=credentials["SecretAccessKey"],
+        aws_session_token=credentials["SessionToken"],
+        region_name=region,
+    )
+
+
+def assume_role_session(region: str, role_arn: str, external_id: str) -> boto3.Session:
+    return credentials_session(assume_role(role_arn, external_id), region)
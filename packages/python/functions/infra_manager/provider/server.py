@@ -0,0 +1,137 @@
+import asyncio
+from typing import Any, Dict, Optional, Union
+
+from pulumi.provider.experimental.property_value import Computed, PropertyValue
+from pulumi.provider.experimental.provider import (
+    ConfigureRequest,
+    ConfigureResponse,
+    CreateRequest,
+    CreateResponse,
+    DeleteRequest,
+    DiffRequest,
+    DiffResponse,
+    PropertyDiff,
+    PropertyDiffKind,
+    Provider,
+    ReadRequest,
+    ReadResponse,
+    UpdateRequest,
+    UpdateResponse,
+)
+
+from provider import NAME, ROUTES, VPC_SERVICE_BINDING
+from provider.aws import assume_role_session
+from provider.routes import KvsRoutes
+from provider.vpc_service_binding import VpcServiceBindings
+from utils.cloudflare import Cloudflare
+
+
+def _python(properties: Dict[str, PropertyValue]) -> Dict[str, Any]:
+    return {key: value.value for key, value in properties.items()}
+
+
+def _properties(values: Dict[str, Any]) -> Dict[str, PropertyValue]:
+    return {key: PropertyValue(value) for key, value in values.items()}
+
+
+class PrintdeskProvider(Provider):
+    """
+    Serves the program's custom resources from a single plugin process per engine run, so
+    the provider is configured once (one STS assume role and one Cloudflare session) and its
+    clients are shared by every resource, instead of being unpickled from each resource's
+    state and reconfigured by a dynamic provider process.
+
+    Configured from the stack's `printdesk:*` config: region, roleArn, externalId,
+    cloudflareAccountId and cloudflareApiToken.
+    """
+
+    def __init__(self):
+        self._routes: Optional[KvsRoutes] = None
+        self._vpc_service_bindings: Optional[VpcServiceBindings] = None
+
+    async def configure(self, request: ConfigureRequest) -> ConfigureResponse:
+        # Variables are keyed as printdesk:config:<key>
+        config = {
+            key.rpartition(":")[2]: value
+            for key, value in request.variables.items()
+            if key.startswith(f"{NAME}:")
+        }
+
+        session = await asyncio.to_thread(
+            assume_role_session,
+            region=config["region"],
+            role_arn=config["roleArn"],
+            external_id=config["externalId"],
+        )
+        self._routes = KvsRoutes(client=session.client("cloudfront-keyvaluestore"))
+        self._vpc_service_bindings = VpcServiceBindings(
+            cloudflare=Cloudflare(
+                account_id=config["cloudflareAccountId"],
+                api_token=config["cloudflareApiToken"],
+            )
+        )
+
+        # Resources are only created and updated when applying, never during previews
+        return ConfigureResponse(accept_secrets=False, supports_preview=False)
+
+    def _resources(self, type_: str) -> Union[KvsRoutes, VpcServiceBindings]:
+        if type_ == ROUTES:
+            return self._routes
+        if type_ == VPC_SERVICE_BINDING:
+            return self._vpc_service_bindings
+
+        raise ValueError(f"Unknown resource type {type_}.")
+
+    async def diff(self, request: DiffRequest) -> DiffResponse:
+        olds = _python(request.old_state)
+        diffs = [
+            key
+            for key, value in request.new_inputs.items()
+            if key not in request.ignore_changes
+            and (isinstance(value.value, Computed) or value.value != olds.get(key))
+        ]
+
+        return DiffResponse(
+            changes=bool(diffs),
+            diffs=diffs,
+            detailed_diff={
+                key: PropertyDiff(kind=PropertyDiffKind.UPDATE, input_diff=True)
+                for key in diffs
+            },
+        )
+
+    async def create(self, request: CreateRequest) -> CreateResponse:
+        resource_id, outputs = await asyncio.to_thread(
+            self._resources(request.type).create, _python(request.properties)
+        )
+
+        return CreateResponse(resource_id=resource_id, properties=_properties(outputs))
+
+    async def read(self, request: ReadRequest) -> ReadResponse:
+        outputs = await asyncio.to_thread(
+            self._resources(request.type).read,
+            _python(request.properties or request.inputs),
+        )
+        # An empty id tells the engine the resource no longer exists
+        if outputs is None:
+            return ReadResponse(resource_id="")
+
+        return ReadResponse(
+            resource_id=request.resource_id,
+            properties=_properties(outputs),
+            inputs=_properties(outputs),
+        )
+
+    async def update(self, request: UpdateRequest) -> UpdateResponse:
+        outputs = await asyncio.to_thread(
+            self._resources(request.type).update,
+            _python(request.olds),
+            _python(request.news),
+        )
+
+        return UpdateResponse(properties=_properties(outputs))
+
+    async def delete(self, request: DeleteRequest) -> None:
+        await asyncio.to_thread(
+            self._resources(request.type).delete, _python(request.properties)
+        )
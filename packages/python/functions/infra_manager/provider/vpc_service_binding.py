@@ -0,0 +1,129 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple, TypedDict
+
+from utils.cloudflare import Cloudflare
+
+
+class VpcServiceBindingInputs(TypedDict):
+    script_name: str
+    name: str
+    service_id: str
+
+
+class VpcServiceBindingOutputs(VpcServiceBindingInputs):
+    pass
+
+
+class VpcServiceBindings:
+    """Adds and removes a VPC service binding to the bindings of a Cloudflare worker script."""
+
+    def __init__(self, cloudflare: Cloudflare):
+        self._cloudflare = cloudflare
+
+    def _get_bindings(self, script_name: str) -> List[Dict[str, Any]]:
+        return (
+            self._cloudflare.request(
+                resource=f"/accounts/{self._cloudflare.account_id}/workers/scripts/{script_name}/settings",
+            ).result["bindings"]
+            or []
+        )
+
+    def _set_bindings(self, script_name: str, bindings: List[Dict[str, Any]]):
+        files = {"settings": (None, json.dumps({"bindings": bindings}))}
+
+        self._cloudflare.request(
+            resource=f"/accounts/{self._cloudflare.account_id}/workers/scripts/{script_name}/settings",
+            method="PATCH",
+            files=files,
+        )
+
+    def create(
+        self, props: VpcServiceBindingInputs
+    ) -> Tuple[str, VpcServiceBindingOutputs]:
+        bindings = self._get_bindings(script_name=props["script_name"])
+
+        existing = next(
+            (binding for binding in bindings if binding["name"] == props["name"]), None
+        )
+        # Adopts the same binding, e.g. one a forgotten dynamic resource created
+        if existing is not None and existing.get("service_id") == props["service_id"]:
+            return f"{props['script_name']}:{props['name']}", _outputs(props)
+        if existing is not None:
+            raise ValueError(
+                f'Worker script "{props["script_name"]}" already has existing binding named "{props["name"]}".'
+            )
+
+        self._set_bindings(
+            script_name=props["script_name"],
+            bindings=[
+                *bindings,
+                {
+                    "type": "vpc_service",
+                    "name": props["name"],
+                    "service_id": props["service_id"],
+                },
+            ],
+        )
+
+        return f"{props['script_name']}:{props['name']}", _outputs(props)
+
+    def read(
+        self, props: VpcServiceBindingOutputs
+    ) -> Optional[VpcServiceBindingOutputs]:
+        bindings = self._get_bindings(script_name=props["script_name"])
+
+        binding = next(
+            (binding for binding in bindings if binding["name"] == props["name"]), None
+        )
+        # None when the binding no longer exists
+        if not binding:
+            return None
+
+        return VpcServiceBindingOutputs(
+            script_name=props["script_name"],
+            name=binding["name"],
+            service_id=binding.get("service_id"),
+        )
+
+    def update(
+        self,
+        _olds: VpcServiceBindingOutputs,
+        _news: VpcServiceBindingInputs,
+    ) -> VpcServiceBindingOutputs:
+        bindings = [
+            binding
+            for binding in (self._get_bindings(script_name=_olds["script_name"]))
+            if binding["name"] != _olds["name"]
+        ]
+
+        self._set_bindings(
+            script_name=_news["script_name"],
+            bindings=[
+                *bindings,
+                {
+                    "type": "vpc_service",
+                    "name": _news["name"],
+                    "service_id": _news["service_id"],
+                },
+            ],
+        )
+
+        return _outputs(_news)
+
+    def delete(self, _props: VpcServiceBindingOutputs):
+        self._set_bindings(
+            script_name=_props["script_name"],
+            bindings=[
+                binding
+                for binding in (self._get_bindings(script_name=_props["script_name"]))
+                if binding["name"] != _props["name"]
+            ],
+        )
+
+
+def _outputs(props: VpcServiceBindingInputs) -> VpcServiceBindingOutputs:
+    return VpcServiceBindingOutputs(
+        script_name=props["script_name"],
+        name=props["name"],
+        service_id=props["service_id"],
+    )
@@ -11,6 +11,7 @@ class Resource:
         arn: str
         name: str
         roleArn: str
+        timeout: float
         type: str
         url: str
     class ApiClientCredentialsConfigurationProfileTemplate:
@@ -55,6 +56,7 @@ class Resource:
     class AppconfigRoleTemplate:
         arn: str
         name: str
+        shared: bool
         type: str
     class AppsyncApi:
         arn: str
@@ -66,10 +68,12 @@ class Resource:
     class AppsyncChannelNamespacePublisherRoleTemplate:
         arn: str
         name: str
+        shared: bool
         type: str
     class AppsyncChannelNamespaceSubscriberRoleTemplate:
         arn: str
         name: str
+        shared: bool
         type: str
     class AssetsBucket:
         name: str
@@ -118,15 +122,20 @@ class Resource:
         hashKey: str
         class keyLiterals:
             CALLBACK: str
+            CELL: str
             CLIENT: str
             DEPLOYMENT: str
+            DRIFT: str
             INFRA: str
             INPUT: str
             IP: str
             ORDER: str
             OUTPUT: str
             PAPERCUT_MF_API: str
+            POOL: str
             ROOM: str
+            STACK: str
+            SYNC: str
             TENANT: str
             USER: str
         name: str
@@ -160,6 +169,7 @@ class Resource:
         arn: str
         name: str
         roleArn: str
+        timeout: float
         type: str
     class InvoicesProcessorClientCredentialsConfigurationProfileTemplate:
         name: str
@@ -167,11 +177,13 @@ class Resource:
     class InvoicesProcessorQueueSenderRoleTemplate:
         arn: str
         name: str
+        shared: bool
         type: str
     class Issuer:
         arn: str
         name: str
         roleArn: str
+        timeout: float
         type: str
         url: str
     class Migrator:
@@ -197,10 +209,20 @@ class Resource:
         arn: str
         name: str
         roleArn: str
+        timeout: float
         type: str
     class PapercutMfSyncClientCredentialsConfigurationProfileTemplate:
         name: str
         type: str
+    class PapercutMfSyncDispatch:
+        enabled: bool
+        scheduleGroupName: str
+        scheduleRoleArn: str
+        type: str
+    class PapercutMfSyncScheduleRole:
+        arn: str
+        name: str
+        type: str
     class PulumiBucket:
         name: str
         type: str
@@ -214,6 +236,9 @@ class Resource:
     class SnsTopicEmail:
         type: str
         value: str
+    class TenantRoles:
+        shared: bool
+        type: str
     class Web:
         type: str
         url: str
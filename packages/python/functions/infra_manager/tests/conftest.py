@@ -0,0 +1,49 @@
+from bench import resources
+
+
+# Links the stubs before the tests import anything that reads sst's Resource
+resources.install()
+
+import os  # noqa: E402
+
+import pytest  # noqa: E402
+from sst import Resource  # noqa: E402
+
+try:
+    # Imported before the modules under test create their clients, so mocks intercept them
+    import moto
+except ImportError:
+    moto = None
+else:
+    # Clients resolve their credentials when they're created, fake ones keep the tests off
+    # any real account
+    for name in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_SESSION_TOKEN"):
+        os.environ[name] = "testing"
+
+
+@pytest.fixture
+def session():
+    """
+    A session against an in-process AWS (moto) serving the table and the state bucket, moto
+    isn't a dependency of the function so the tests using it are skipped without it.
+    """
+    if moto is None:
+        pytest.skip("moto isn't installed")
+    import boto3
+
+    from bench.handler import create_backend
+
+    with moto.mock_aws():
+        session = boto3.Session(region_name=Resource.Aws.region)
+        create_backend(session)
+        yield session
+
+
+@pytest.fixture
+def s3(session):
+    return session.client("s3")
+
+
+@pytest.fixture
+def table(session):
+    return session.resource("dynamodb").Table(Resource.Dynamo.name)
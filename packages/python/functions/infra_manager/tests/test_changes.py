@@ -0,0 +1,107 @@
+from typing import Any, Dict
+
+import pytest
+
+from bench import inputs
+from models import Input
+from program.changes import FIELD_TARGETS, PAPERCUT_MF, classify, urn
+from test_program import construct
+from utils.cells import TENANT, Placement
+
+
+TENANT_ID = inputs.tenant_id(0)
+PROJECT = "project"
+
+
+def _input(config: Dict[str, Any], version: int = 0) -> Input:
+    return Input.model_validate(
+        inputs.input_item(TENANT_ID, config, inputs.deployment_id(0, version))
+    )
+
+
+def _config(**changes: Any) -> Dict[str, Any]:
+    return {**inputs.enabled_config(inputs.HOSTNAME_HOST), **changes}
+
+
+def _classify(old: Dict[str, Any], new: Dict[str, Any], cell=None):
+    return classify(
+        old=_input(old),
+        new=_input(new, version=1),
+        project_name=PROJECT,
+        placement=Placement(tenant_id=TENANT_ID, cell=cell),
+    )
+
+
+def test_redeploying_an_unchanged_input_is_a_full_update():
+    change = _classify(_config(), _config())
+
+    assert change.fields == ["deployment_id"]
+    assert change.targets is None
+    assert not change.is_noop
+
+
+def test_a_changed_api_targets_its_resources():
+    change = _classify(
+        _config(), inputs.enabled_config(inputs.HOSTNAME_HOST, port=9193)
+    )
+
+    assert change.fields == ["papercut_mf_config.api.port"]
+    assert change.targets == [
+        urn(PROJECT, TENANT_ID, types, name)
+        for types, name in FIELD_TARGETS["papercut_mf_config.api"]
+    ]
+
+
+def test_changes_of_several_fields_target_each_field_s_resources_once():
+    change = _classify(
+        _config(),
+        _config(
+            api={**_config()["api"], "port": 9193, "protocol": "http"},
+            invoicesProcessing={"visibilityTimeoutSeconds": 60},
+        ),
+    )
+
+    assert change.targets == [
+        urn(PROJECT, TENANT_ID, types, name)
+        for field in (
+            "papercut_mf_config.api",
+            "papercut_mf_config.invoices_processing",
+        )
+        for types, name in FIELD_TARGETS[field]
+    ]
+
+
+def test_targets_in_a_cell_are_under_the_tenant_component():
+    placement = Placement(tenant_id=TENANT_ID, cell="cell-000")
+    change = _classify(
+        _config(),
+        inputs.enabled_config(inputs.HOSTNAME_HOST, port=9193),
+        cell=placement.cell,
+    )
+
+    assert change.targets == [
+        urn(
+            PROJECT,
+            placement.stack_name,
+            (TENANT, *types),
+            f"{placement.resource_prefix}{name}",
+        )
+        for types, name in FIELD_TARGETS["papercut_mf_config.api"]
+    ]
+
+
+@pytest.mark.parametrize(
+    "old, new",
+    [(_config(), {"enabled": False}), ({"enabled": False}, _config())],
+)
+def test_enabling_or_disabling_papercut_mf_is_a_full_update(old, new):
+    assert _classify(old, new).targets is None
+
+
+def test_field_targets_are_resources_the_program_registers():
+    registered = {(type_, name) for type_, name, _ in construct("hostname").registered}
+
+    for field, targets in FIELD_TARGETS.items():
+        for types, name in targets:
+            assert types[0] == PAPERCUT_MF
+            assert (types[-1], name) in registered, field
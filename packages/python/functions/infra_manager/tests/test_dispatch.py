@@ -0,0 +1,109 @@
+import pytest
+from sst import Resource
+
+from utils import dispatch
+from utils.dispatch import SlotSchedules
+from utils.lease import Lease, LeaseLostError
+from utils.stagger import Slot
+
+
+DAILY = Slot(cron_expression="0 2 * * ? *", timezone="UTC")
+DENVER = Slot(cron_expression="0 2 * * ? *", timezone="America/Denver")
+
+
+@pytest.fixture
+def schedules(session, table):
+    scheduler = session.client("scheduler")
+    scheduler.create_schedule_group(
+        Name=Resource.PapercutMfSyncDispatch.scheduleGroupName
+    )
+    return SlotSchedules(
+        scheduler=scheduler, function_arn=dispatch.function_arn("infra-manager")
+    )
+
+
+def _lease(tenant_id: str) -> Lease:
+    lease = Lease(tenant_id=tenant_id, owner="test", duration_seconds=60)
+    lease.acquire()
+    return lease
+
+
+def _members(slot: Slot):
+    return [tenant_id for batch in dispatch.member_batches(slot) for tenant_id in batch]
+
+
+def test_join_registers_the_tenant_in_the_slot(table):
+    dispatch.join(lease=_lease("a"), tenant_id="a", slot=DAILY)
+    dispatch.join(lease=_lease("b"), tenant_id="b", slot=DAILY)
+
+    assert dispatch.registration("a") == DAILY
+    assert _members(DAILY) == ["a", "b"]
+    assert dispatch.has_members(DAILY)
+    assert not dispatch.has_members(DENVER)
+
+
+def test_leave_deregisters_the_tenant(table):
+    lease = _lease("a")
+    dispatch.join(lease=lease, tenant_id="a", slot=DAILY)
+    dispatch.join(lease=_lease("b"), tenant_id="b", slot=DAILY)
+
+    dispatch.leave(lease=lease, tenant_id="a", slot=DAILY)
+
+    assert dispatch.registration("a") is None
+    assert _members(DAILY) == ["b"]
+
+
+def test_reslotting_moves_the_tenant_to_its_new_slot(table):
+    lease = _lease("a")
+    dispatch.join(lease=lease, tenant_id="a", slot=DAILY)
+
+    # As a changed schedule registers it: join the new slot, then leave the old one
+    dispatch.join(lease=lease, tenant_id="a", slot=DENVER)
+    dispatch.leave(lease=lease, tenant_id="a", slot=DAILY, keep_registration=True)
+
+    assert dispatch.registration("a") == DENVER
+    assert _members(DENVER) == ["a"]
+    assert not dispatch.has_members(DAILY)
+
+
+def test_a_lost_lease_does_not_overwrite_a_newer_registration(table):
+    stale = _lease("a")
+    stale.release()
+    dispatch.join(lease=_lease("a"), tenant_id="a", slot=DENVER)
+
+    with pytest.raises(LeaseLostError):
+        dispatch.join(lease=stale, tenant_id="a", slot=DAILY)
+    with pytest.raises(LeaseLostError):
+        dispatch.leave(lease=stale, tenant_id="a", slot=DENVER)
+
+    assert dispatch.registration("a") == DENVER
+    assert _members(DENVER) == ["a"]
+
+
+def test_member_batches_continue_after_a_tenant(table):
+    for tenant_id in ("a", "b", "c", "d", "e"):
+        dispatch.join(lease=_lease(tenant_id), tenant_id=tenant_id, slot=DAILY)
+
+    assert list(dispatch.member_batches(DAILY, batch_size=2)) == [
+        ["a", "b"],
+        ["c", "d"],
+        ["e"],
+    ]
+    assert list(dispatch.member_batches(DAILY, after_tenant_id="c")) == [["d", "e"]]
+
+
+def test_retire_deletes_the_schedule_of_a_slot_without_tenants(schedules):
+    lease = _lease("a")
+    dispatch.join(lease=lease, tenant_id="a", slot=DAILY)
+    schedules.ensure(DAILY)
+    dispatch.join(lease=lease, tenant_id="a", slot=DENVER)
+    schedules.ensure(DENVER)
+    dispatch.join(lease=_lease("b"), tenant_id="b", slot=DENVER)
+
+    schedules.retire(DENVER)
+    dispatch.leave(lease=lease, tenant_id="a", slot=DAILY, keep_registration=True)
+    schedules.retire(DAILY)
+
+    assert schedules.exists(DENVER)
+    assert not schedules.exists(DAILY)
+    assert schedules.names() == [dispatch.schedule_name(DENVER)]
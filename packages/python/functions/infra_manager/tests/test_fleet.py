@@ -0,0 +1,57 @@
+from sst import Resource
+
+import fleet
+from program import fingerprint
+from utils import dynamo
+from utils.lease import Lease
+
+
+def _stamp(tenant_id: str, stamped: str) -> Lease:
+    lease = Lease(tenant_id=tenant_id, owner="test", duration_seconds=60)
+    lease.acquire()
+    fingerprint.record_fingerprint(lease=lease, fingerprint=stamped)
+    return lease
+
+
+def test_stale_lists_stacks_stamped_with_another_fingerprint(table):
+    _stamp("a", "0001")
+    _stamp("b", "0002")
+    _stamp("c", "0003")
+    _stamp("d", "00021")
+
+    assert fleet.stale_tenant_ids("0002") == {"a": "0001", "c": "0003", "d": "00021"}
+
+
+def test_stale_skips_unstamped_stacks(table):
+    lease = _stamp("a", "0001")
+    _stamp("b", "0001")
+    fingerprint.clear_fingerprint(lease)
+
+    assert fleet.stale_tenant_ids("0002") == {"b": "0001"}
+
+
+def test_restamping_moves_the_stack_in_the_index(table):
+    _stamp("a", "0001")
+    _stamp("a", "0002")
+
+    assert fleet.stale_tenant_ids("0002") == {}
+    assert fleet.stale_tenant_ids("0003") == {"a": "0002"}
+
+
+def test_index_adds_stacks_stamped_before_the_index(table):
+    _stamp("a", "0001")
+    _stamp("b", "0001")
+    key = dynamo.primary_key("a", Resource.Dynamo.keyLiterals.STACK)
+    dynamo.table.update_item(
+        Key=key,
+        UpdateExpression="REMOVE #indexPk, #indexSk",
+        ExpressionAttributeNames={
+            "#indexPk": Resource.Dynamo.globalSecondaryIndexes.gsi1.hashKey,
+            "#indexSk": Resource.Dynamo.globalSecondaryIndexes.gsi1.rangeKey,
+        },
+    )
+    assert fleet.stale_tenant_ids("0002") == {"b": "0001"}
+
+    assert fleet.index_fingerprints() == 1
+    assert fleet.index_fingerprints() == 0
+    assert fleet.stale_tenant_ids("0002") == {"a": "0001", "b": "0001"}
@@ -0,0 +1,159 @@
+import threading
+
+import pytest
+from sst import Resource
+
+from utils import dynamo, lease as lease_module
+from utils.lease import Lease, LeaseHeldError, LeaseLostError
+
+
+TENANT_ID = "tenant"
+
+
+@pytest.fixture
+def now(monkeypatch):
+    """The leases' clock, in ms, which the tests move forward."""
+    clock = [1_000_000]
+    monkeypatch.setattr(lease_module, "_now_ms", lambda: clock[0])
+    return clock
+
+
+def _lease(owner: str) -> Lease:
+    return Lease(tenant_id=TENANT_ID, owner=owner, duration_seconds=60)
+
+
+def _stack_item():
+    return dynamo.table.get_item(
+        Key=dynamo.primary_key(TENANT_ID, Resource.Dynamo.keyLiterals.STACK)
+    ).get("Item")
+
+
+def _output_key():
+    return dynamo.primary_key(TENANT_ID, Resource.Dynamo.keyLiterals.OUTPUT)
+
+
+def test_acquire_increments_the_fencing_token(table, now):
+    lease = _lease("a")
+
+    assert lease.acquire() == 1
+    lease.release()
+    assert lease.acquire() == 2
+    assert _stack_item()["leaseOwner"] == "a"
+
+
+def test_acquire_fails_while_another_owner_holds_the_lease(table, now):
+    _lease("a").acquire()
+
+    with pytest.raises(LeaseHeldError) as e:
+        _lease("b").acquire()
+
+    assert e.value.owner == "a"
+
+
+def test_acquire_by_the_owner_again(table, now):
+    lease = _lease("a")
+    lease.acquire()
+
+    assert _lease("a").acquire() == 2
+
+
+def test_renew_extends_the_lease(table, now):
+    lease = _lease("a")
+    lease.acquire()
+
+    now[0] += 50_000
+    lease.renew()
+    now[0] += 50_000
+
+    with pytest.raises(LeaseHeldError):
+        _lease("b").acquire()
+    assert _stack_item()["leaseExpiresAt"] == 1_000_000 + 50_000 + 60_000
+
+
+def test_release_lets_another_owner_acquire(table, now):
+    lease = _lease("a")
+    lease.acquire()
+    lease.release()
+
+    assert "leaseOwner" not in _stack_item()
+    assert _lease("b").acquire() == 2
+
+
+def test_takeover_of_an_expired_lease(table, now):
+    stale = _lease("a")
+    stale.acquire()
+
+    now[0] += 60_001
+    newer = _lease("b")
+    assert newer.acquire() == 2
+
+    with pytest.raises(LeaseLostError):
+        stale.renew()
+    assert stale.lost
+
+    # Releasing the stale lease leaves the newer one as it is
+    stale.release()
+    assert _stack_item()["leaseOwner"] == "b"
+
+
+def test_put_item_is_fenced_by_the_token(table, now):
+    stale = _lease("a")
+    stale.acquire()
+    now[0] += 60_001
+    newer = _lease("b")
+    newer.acquire()
+
+    newer.put_item({**_output_key(), "result": "newer"})
+    with pytest.raises(LeaseLostError):
+        stale.put_item({**_output_key(), "result": "stale"})
+
+    item = dynamo.table.get_item(Key=_output_key())["Item"]
+    assert (item["result"], item["fencingToken"]) == ("newer", 2)
+
+
+def test_put_item_over_an_older_token(table, now):
+    stale = _lease("a")
+    stale.acquire()
+    stale.put_item({**_output_key(), "result": "stale"})
+    now[0] += 60_001
+    newer = _lease("b")
+    newer.acquire()
+
+    newer.put_item({**_output_key(), "result": "newer"})
+
+    assert dynamo.table.get_item(Key=_output_key())["Item"]["result"] == "newer"
+
+
+def test_delete_item_is_fenced_by_the_token(table, now):
+    stale = _lease("a")
+    stale.acquire()
+    now[0] += 60_001
+    newer = _lease("b")
+    newer.acquire()
+    newer.put_item({**_output_key(), "result": "newer"})
+
+    with pytest.raises(LeaseLostError):
+        stale.delete_item(_output_key())
+    assert "Item" in dynamo.table.get_item(Key=_output_key())
+
+    newer.delete_item(_output_key())
+    assert "Item" not in dynamo.table.get_item(Key=_output_key())
+
+
+def test_heartbeat_reports_a_lost_lease(table, now):
+    lost = threading.Event()
+    lease = Lease(
+        tenant_id=TENANT_ID,
+        owner="a",
+        duration_seconds=60,
+        heartbeat_seconds=1,
+        on_lost=lambda _: lost.set(),
+    )
+
+    with lease:
+        now[0] += 60_001
+        _lease("b").acquire()
+        assert lost.wait(timeout=5)
+
+    assert lease.lost
+    assert _stack_item()["leaseOwner"] == "b"
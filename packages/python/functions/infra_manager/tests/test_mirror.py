@@ -0,0 +1,93 @@
+import gzip
+import json
+
+import pytest
+from sst import Resource
+
+from utils.mirror import StateConflictError, StateMirror
+
+
+PROJECT = "project"
+STACK = "stack"
+CHECKPOINT = f"{PROJECT}/.pulumi/stacks/organization/{PROJECT}/{STACK}"
+
+
+def _mirror(s3, tmp_path) -> StateMirror:
+    return StateMirror(
+        s3, Resource.PulumiBucket.name, PROJECT, STACK, root=str(tmp_path)
+    )
+
+
+def _keys(s3):
+    return {
+        item["Key"]
+        for item in s3.list_objects_v2(Bucket=Resource.PulumiBucket.name).get(
+            "Contents", []
+        )
+    }
+
+
+def _put_checkpoint(s3, checkpoint):
+    s3.put_object(
+        Bucket=Resource.PulumiBucket.name,
+        Key=f"{CHECKPOINT}.json",
+        Body=json.dumps(checkpoint).encode(),
+    )
+
+
+def test_pushes_an_updated_checkpoint(s3, tmp_path):
+    _put_checkpoint(s3, {"version": 1})
+
+    with _mirror(s3, tmp_path) as mirror:
+        mirror._local_checkpoint().write_text(json.dumps({"version": 2}))
+
+    body = s3.get_object(Bucket=Resource.PulumiBucket.name, Key=f"{CHECKPOINT}.json")
+    assert json.loads(body["Body"].read()) == {"version": 2}
+    assert _keys(s3) == {f"{CHECKPOINT}.json"}
+
+
+def test_replaces_a_checkpoint_rewritten_gzipped(s3, tmp_path):
+    _put_checkpoint(s3, {"version": 1})
+
+    with _mirror(s3, tmp_path) as mirror:
+        local = mirror._local_checkpoint()
+        local.with_suffix(".json.gz").write_bytes(
+            gzip.compress(json.dumps({"version": 2}).encode())
+        )
+        local.unlink()
+
+    body = s3.get_object(Bucket=Resource.PulumiBucket.name, Key=f"{CHECKPOINT}.json.gz")
+    assert json.loads(gzip.decompress(body["Body"].read())) == {"version": 2}
+    assert _keys(s3) == {f"{CHECKPOINT}.json.gz"}
+
+
+def test_fails_a_push_over_a_concurrent_write(s3, tmp_path):
+    _put_checkpoint(s3, {"version": 1})
+
+    mirror = _mirror(s3, tmp_path).open()
+    mirror._local_checkpoint().write_text(json.dumps({"version": 2}))
+    _put_checkpoint(s3, {"version": 3})
+    with pytest.raises(StateConflictError):
+        mirror.close()
+
+    body = s3.get_object(Bucket=Resource.PulumiBucket.name, Key=f"{CHECKPOINT}.json")
+    assert json.loads(body["Body"].read()) == {"version": 3}
+    # The lock is released either way
+    assert _keys(s3) == {f"{CHECKPOINT}.json"}
+
+
+def test_fails_a_gzipped_push_over_a_concurrent_write(s3, tmp_path):
+    _put_checkpoint(s3, {"version": 1})
+
+    mirror = _mirror(s3, tmp_path).open()
+    local = mirror._local_checkpoint()
+    local.with_suffix(".json.gz").write_bytes(
+        gzip.compress(json.dumps({"version": 2}).encode())
+    )
+    local.unlink()
+    _put_checkpoint(s3, {"version": 3})
+    with pytest.raises(StateConflictError):
+        mirror.close()
+
+    # The concurrent write survives, next to the checkpoint that lost to it
+    assert f"{CHECKPOINT}.json" in _keys(s3)
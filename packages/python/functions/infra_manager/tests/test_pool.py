@@ -0,0 +1,163 @@
+from typing import Any, Dict, List, Optional
+
+import pytest
+from sst import Resource
+
+from utils import dynamo
+from utils.cloudflare import Response
+from utils.pool import TAG, WarmPool, pool_key
+
+
+TENANT_TAGS = {"pd:tenantId": "tenant"}
+
+
+class FakeCloudflare:
+    account_id = "account"
+
+    def __init__(self):
+        self.tunnels: List[str] = []
+
+    def request(
+        self, resource: str, method: str, json: Optional[Dict[str, Any]] = None
+    ):
+        if method == "POST":
+            self.tunnels.append(f"tunnel-{len(self.tunnels)}")
+            return Response(
+                success=True, errors=[], messages=[], result={"id": self.tunnels[-1]}
+            )
+
+        self.tunnels.remove(resource.rpartition("/")[2])
+        return Response(success=True, errors=[], messages=[], result={})
+
+
+@pytest.fixture
+def cloudflare():
+    return FakeCloudflare()
+
+
+@pytest.fixture
+def sqs(session):
+    return session.client("sqs")
+
+
+@pytest.fixture
+def pool(table, sqs, cloudflare):
+    return WarmPool(sqs=sqs, cloudflare=cloudflare)
+
+
+def _queue_urls(sqs):
+    return sorted(sqs.list_queues().get("QueueUrls", []))
+
+
+def _claimed(tenant_id: str):
+    return dynamo.table.get_item(
+        Key=dynamo.primary_key(tenant_id, Resource.Dynamo.keyLiterals.POOL)
+    ).get("Item")
+
+
+def test_replenish_provisions_sets_up_to_the_size(pool, sqs, cloudflare):
+    report = pool.replenish(size=2)
+
+    assert len(report.provisioned) == 2
+    assert report.available == 2
+    assert [resources.set_id for resources in pool.available()] == report.provisioned
+    assert len(_queue_urls(sqs)) == 4
+    assert len(cloudflare.tunnels) == 2
+
+
+def test_replenish_discards_the_oldest_sets_beyond_the_size(pool, sqs, cloudflare):
+    oldest, newest = pool.replenish(size=2).provisioned
+
+    report = pool.replenish(size=1)
+
+    assert report.discarded == [oldest]
+    assert report.provisioned == []
+    assert report.available == 1
+    assert [resources.set_id for resources in pool.available()] == [newest]
+    assert len(_queue_urls(sqs)) == 2
+    assert len(cloudflare.tunnels) == 1
+
+
+def test_replenish_stops_provisioning_when_out_of_time(pool):
+    report = pool.replenish(size=3, has_time=lambda: False)
+
+    assert report.provisioned == []
+    assert report.available == 0
+
+
+def test_discard_deletes_the_set_and_untracks_it(pool, sqs, cloudflare):
+    resources = pool.provision()
+
+    pool.discard(resources)
+
+    assert pool.available() == []
+    assert _queue_urls(sqs) == []
+    assert cloudflare.tunnels == []
+
+
+def test_discard_leaves_a_claimed_set_alone(pool, sqs, cloudflare):
+    resources = pool.provision()
+    pool.claim(tenant_id="tenant", tags=TENANT_TAGS)
+
+    with pytest.raises(dynamo.ConditionalCheckFailedException):
+        pool.discard(resources)
+
+    assert len(_queue_urls(sqs)) == 2
+    assert cloudflare.tunnels == [resources.api_tunnel_id]
+
+
+def test_claim_moves_a_set_to_the_tenant_and_tags_it(pool, sqs):
+    resources = pool.provision()
+
+    assert pool.claim(tenant_id="tenant", tags=TENANT_TAGS) == resources
+    assert pool.available() == []
+    assert _claimed("tenant")["setId"] == resources.set_id
+    for url in (
+        resources.invoices_processor_queue_url,
+        resources.invoices_processor_dead_letter_queue_url,
+    ):
+        assert sqs.list_queue_tags(QueueUrl=url)["Tags"] == TENANT_TAGS
+
+
+def test_claim_returns_the_set_the_tenant_already_claimed(pool):
+    resources = pool.provision()
+    pool.provision()
+
+    assert pool.claim(tenant_id="tenant", tags=TENANT_TAGS) == resources
+    assert pool.claim(tenant_id="tenant", tags=TENANT_TAGS) == resources
+    assert len(pool.available()) == 1
+
+
+def test_claim_skips_a_set_claimed_in_the_meantime(pool, monkeypatch):
+    first = pool.provision()
+    second = pool.provision()
+    # Both claims read the pool before either one claimed a set
+    stale = pool.available()
+    monkeypatch.setattr(pool, "available", lambda: stale)
+
+    assert pool.claim(tenant_id="tenant", tags=TENANT_TAGS) == first
+    assert pool.claim(tenant_id="other", tags=TENANT_TAGS) == second
+    assert _claimed("tenant")["setId"] == first.set_id
+    assert _claimed("other")["setId"] == second.set_id
+
+
+def test_claim_from_an_empty_pool(pool):
+    assert pool.claim(tenant_id="tenant", tags=TENANT_TAGS) is None
+    assert _claimed("tenant") is None
+
+
+def test_provisioned_sets_are_tagged_as_pooled(pool, sqs):
+    resources = pool.provision()
+
+    assert (
+        dynamo.table.get_item(
+            Key={
+                Resource.Dynamo.hashKey: pool_key(),
+                Resource.Dynamo.rangeKey: resources.set_id,
+            }
+        )["Item"]["setId"]
+        == resources.set_id
+    )
+    assert sqs.list_queue_tags(QueueUrl=resources.invoices_processor_queue_url)[
+        "Tags"
+    ] == {TAG: resources.set_id}
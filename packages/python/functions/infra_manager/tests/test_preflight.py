@@ -0,0 +1,78 @@
+from typing import Any, Dict, Optional
+
+import pytest
+
+from bench import inputs
+from models import Input
+from program import preflight
+from utils.cells import Placement
+
+
+TENANT_ID = inputs.tenant_id(0)
+
+
+def _input(invoices_processing: Optional[Dict[str, Any]] = None) -> Input:
+    config = inputs.enabled_config(inputs.HOSTNAME_HOST)
+    if invoices_processing is not None:
+        config["invoicesProcessing"] = invoices_processing
+    return Input.model_validate(inputs.input_item(TENANT_ID, config))
+
+
+@pytest.mark.parametrize(
+    "invoices_processing",
+    [None, {"visibilityTimeoutSeconds": 20}, {"visibilityTimeoutSeconds": 900}],
+)
+def test_visibility_timeout_covering_the_processor_timeout(invoices_processing):
+    assert (
+        preflight.check(Placement(tenant_id=TENANT_ID), _input(invoices_processing))
+        == []
+    )
+
+
+def test_visibility_timeout_shorter_than_the_processor_timeout():
+    issues = preflight.check(
+        Placement(tenant_id=TENANT_ID), _input({"visibilityTimeoutSeconds": 19})
+    )
+
+    assert [(issue.path, issue.code) for issue in issues] == [
+        (
+            "papercutMfConfig.invoicesProcessing.visibilityTimeoutSeconds",
+            "visibility-timeout",
+        )
+    ]
+
+
+def test_names_fitting_their_limits():
+    config = _input().papercut_mf_config
+
+    assert preflight.check_names(Placement(tenant_id=TENANT_ID), config) == []
+    assert (
+        preflight.check_names(Placement(tenant_id=TENANT_ID, cell="cell-000"), config)
+        == []
+    )
+
+
+def test_names_truncated_to_the_same_name():
+    # Leaves the queues room for less than their common part
+    tenant_id = "0" * 40
+    issues = preflight.check_names(
+        Placement(tenant_id=tenant_id), _input().papercut_mf_config
+    )
+
+    assert [issue.message for issue in issues] == [
+        "PapercutMfInvoicesProcessorDeadLetterQueue and PapercutMfInvoicesProcessorQueue are both truncated to PapercutMfInvoicesProcesso within 80 characters"
+    ]
+
+
+def test_names_without_room():
+    issues = preflight.check_names(
+        Placement(tenant_id="0" * 70), _input().papercut_mf_config
+    )
+
+    assert {(issue.path, issue.code) for issue in issues} == {
+        ("tenantId", "resource-name")
+    }
+    assert [issue.message for issue in issues] == [
+        f"No room for {name}'s name within {max_} characters"
+        for _, name, max_, _ in preflight.auto_named(_input().papercut_mf_config)
+    ]
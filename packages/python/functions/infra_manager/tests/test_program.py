@@ -0,0 +1,83 @@
+from typing import Any, Dict, List, Tuple
+
+import pulumi
+import pytest
+
+from bench.program import CELL_SIZE, CountingMocks, shapes
+
+
+class RecordingMocks(CountingMocks):
+    """Counting mocks which also record the resources registered, as (type, name, inputs)."""
+
+    def __init__(self):
+        super().__init__()
+        self.registered: List[Tuple[str, str, Dict[str, Any]]] = []
+
+    def new_resource(self, args: pulumi.runtime.MockResourceArgs):
+        self.registered.append((args.typ, args.name, args.inputs))
+        return super().new_resource(args)
+
+
+def construct(shape: str) -> RecordingMocks:
+    program = shapes()[shape]
+    mocks = RecordingMocks()
+    pulumi.runtime.set_mocks(mocks, project="test", stack="test", preview=False)
+
+    @pulumi.runtime.test
+    def run():
+        program()
+
+    run()
+    return mocks
+
+
+def types(mocks: RecordingMocks):
+    return {type_ for type_, _, _ in mocks.registered}
+
+
+def inputs(mocks: RecordingMocks, name: str) -> Dict[str, Any]:
+    return next(inputs_ for _, name_, inputs_ in mocks.registered if name_ == name)
+
+
+@pytest.mark.parametrize("shape", list(shapes()))
+def test_constructs(shape):
+    mocks = construct(shape)
+
+    assert mocks.resources == len(mocks.registered) > 0
+    assert "printdesk:index:Routes" in types(mocks)
+    assert "pulumi-python:dynamic:Resource" not in types(mocks)
+
+
+def test_disabled_papercut_mf_registers_none_of_its_resources():
+    assert "pd:awscf:PapercutMf" not in types(construct("disabled"))
+
+
+@pytest.mark.parametrize(
+    "shape", ["ipv4", "hostname", "hostname-resolvers", "ipv4-pooled"]
+)
+def test_enabled_papercut_mf_registers_its_resources(shape):
+    assert {
+        "pd:awscf:PapercutMf",
+        "aws:sqs/queue:Queue",
+        "aws:lambda/eventSourceMapping:EventSourceMapping",
+        "printdesk:index:VpcServiceBinding",
+    } <= types(construct(shape))
+
+
+def test_hostname_without_resolver_ips_is_reached_through_the_tunnel():
+    host = inputs(construct("hostname"), "PapercutMfApiVpcService")["host"]
+
+    assert "network" in host
+    assert "resolverNetwork" not in host
+
+
+def test_hostname_with_resolver_ips_is_resolved_by_them():
+    host = inputs(construct("hostname-resolvers"), "PapercutMfApiVpcService")["host"]
+
+    assert host["resolverNetwork"]["resolverIps"] == ["10.0.0.2", "10.0.0.3"]
+
+
+def test_cell_registers_each_tenant_s_resources():
+    names = [name for _, name, _ in construct(f"cell-{CELL_SIZE}").registered]
+
+    assert len([name for name in names if name.endswith("-AssetsRoutes")]) == CELL_SIZE
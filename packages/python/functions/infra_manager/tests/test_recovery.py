@@ -0,0 +1,55 @@
+from utils.recovery import RecoveryReport, forget_dynamic_resources
+
+
+STACK = "urn:pulumi:stack::project::pd:aws:Tenant"
+ROUTES = f"{STACK}$pd:aws:Assets$pulumi-python:dynamic:Resource::AssetsRoutes"
+CELL_ROUTES = (
+    f"{STACK}$pd:aws:Assets$pulumi-python:dynamic:Resource::tenant-AssetsRoutes"
+)
+BINDING = f"{STACK}$pd:cloudflare:PapercutMf$pulumi-python:dynamic:Resource::PapercutMfApiGatewayVpcServiceBinding"
+DOMAIN = f"{STACK}$pd:cloudflare:PapercutMf$cloudflare:index/workersCustomDomain:WorkersCustomDomain::PapercutMfApiDomain"
+
+
+def _resource(urn: str, **fields):
+    return {"urn": urn, "type": urn.rpartition("$")[2].partition("::")[0], **fields}
+
+
+def test_forgets_the_dynamic_resources_and_references_to_them():
+    report = RecoveryReport()
+    resources = forget_dynamic_resources(
+        [
+            _resource(ROUTES),
+            _resource(BINDING),
+            _resource(
+                DOMAIN,
+                dependencies=[BINDING],
+                propertyDependencies={"service": [BINDING]},
+            ),
+        ],
+        resource_prefix="",
+        report=report,
+    )
+
+    assert report.forgotten_resources == sorted([ROUTES, BINDING])
+    assert report.repaired
+    assert resources == [
+        _resource(DOMAIN, dependencies=[], propertyDependencies={"service": []})
+    ]
+
+
+def test_only_forgets_the_tenant_s_dynamic_resources():
+    report = RecoveryReport()
+    resources = [_resource(ROUTES), _resource(CELL_ROUTES)]
+
+    assert forget_dynamic_resources(resources, "tenant-", report) == [
+        {**_resource(ROUTES), "dependencies": [], "propertyDependencies": {}}
+    ]
+    assert report.forgotten_resources == [CELL_ROUTES]
+
+
+def test_leaves_a_stack_without_dynamic_resources_as_is():
+    report = RecoveryReport()
+    resources = [_resource(DOMAIN, dependencies=[])]
+
+    assert forget_dynamic_resources(resources, "", report) is resources
+    assert not report.repaired
@@ -0,0 +1,109 @@
+from typing import List
+
+from sst import Resource
+
+from utils.retention import (
+    backups_prefix,
+    history_prefix,
+    prune_project,
+    prune_stack,
+)
+
+
+PROJECT = "project"
+CHECKPOINT = f"{PROJECT}/.pulumi/stacks/organization/{PROJECT}/stack.json.gz"
+# Unix nanos of the stack's updates, oldest first
+TIMESTAMPS = [1_700_000_000_000_000_000 + i * 1_000_000_000 for i in range(5)]
+
+
+def _put(s3, key: str):
+    s3.put_object(Bucket=Resource.PulumiBucket.name, Key=key, Body=b"{}")
+
+
+def _keys(s3) -> List[str]:
+    return sorted(
+        obj["Key"]
+        for page in s3.get_paginator("list_objects_v2").paginate(
+            Bucket=Resource.PulumiBucket.name
+        )
+        for obj in page.get("Contents", [])
+    )
+
+
+def _write_updates(s3, stack_name: str):
+    _put(s3, f"{PROJECT}/.pulumi/stacks/organization/{PROJECT}/{stack_name}.json.gz")
+    for timestamp in TIMESTAMPS:
+        history = f"{history_prefix(PROJECT)}{stack_name}/{stack_name}-{timestamp}"
+        # A history entry and its checkpoint share the update's version
+        _put(s3, f"{history}.history.json.gz")
+        _put(s3, f"{history}.checkpoint.json.gz")
+        _put(
+            s3,
+            f"{backups_prefix(PROJECT)}{stack_name}/{stack_name}.{timestamp}.json.gz",
+        )
+
+
+def _versions(keys: List[str], stack_name: str) -> List[int]:
+    return sorted(
+        {
+            timestamp
+            for timestamp in TIMESTAMPS
+            for key in keys
+            if f"/{stack_name}/" in key and str(timestamp) in key
+        }
+    )
+
+
+def test_prune_stack_keeps_the_newest_versions(s3):
+    _write_updates(s3, "stack")
+
+    report = prune_stack(s3, Resource.PulumiBucket.name, PROJECT, "stack", keep=2)
+
+    keys = _keys(s3)
+    assert _versions(keys, "stack") == TIMESTAMPS[-2:]
+    # Two objects per history version, one per backup
+    assert (report.kept, report.deleted_objects) == (4, 9)
+    assert report.bytes_reclaimed == 9 * len(b"{}")
+    assert CHECKPOINT in keys
+
+
+def test_prune_stack_leaves_other_stacks_alone(s3):
+    _write_updates(s3, "stack")
+    _write_updates(s3, "other")
+
+    prune_stack(s3, Resource.PulumiBucket.name, PROJECT, "stack", keep=1)
+
+    keys = _keys(s3)
+    assert _versions(keys, "stack") == TIMESTAMPS[-1:]
+    assert _versions(keys, "other") == TIMESTAMPS
+
+
+def test_prune_stack_within_the_retention(s3):
+    _write_updates(s3, "stack")
+    before = _keys(s3)
+
+    report = prune_stack(s3, Resource.PulumiBucket.name, PROJECT, "stack", keep=10)
+
+    assert _keys(s3) == before
+    assert report.deleted_objects == 0
+
+
+def test_prune_project_keeps_the_newest_versions_of_every_stack(s3):
+    _write_updates(s3, "stack")
+    _write_updates(s3, "other")
+
+    reports = prune_project(s3, Resource.PulumiBucket.name, PROJECT, keep=3)
+
+    keys = _keys(s3)
+    assert set(reports) == {"stack", "other"}
+    assert _versions(keys, "stack") == _versions(keys, "other") == TIMESTAMPS[-3:]
+    assert CHECKPOINT in keys
+    assert f"{PROJECT}/.pulumi/stacks/organization/{PROJECT}/other.json.gz" in keys
+
+
+def test_prune_keeps_the_current_checkpoint_with_nothing_to_keep(s3):
+    _write_updates(s3, "stack")
+
+    prune_stack(s3, Resource.PulumiBucket.name, PROJECT, "stack", keep=0)
+
+    assert _keys(s3) == [CHECKPOINT]
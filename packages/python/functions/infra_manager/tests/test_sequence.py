@@ -0,0 +1,92 @@
+import pytest
+
+from utils import dynamo
+from utils.lease import Lease, LeaseLostError
+from utils.sequence import (
+    SEQUENCE_NUMBER_LENGTH,
+    AppliedRecord,
+    pad,
+    record_applied,
+    skip_reason,
+)
+
+
+TENANT_ID = "tenant"
+APPLIED = AppliedRecord(sequence_number=pad("200"), deployment_id="applied")
+
+
+def test_pad_orders_sequence_numbers_of_different_lengths_numerically():
+    numbers = ["9", "10", "99", "100", "49584955483847839948392993847384758398"]
+
+    # Unpadded, they'd compare as strings
+    assert sorted(numbers) != numbers
+    assert sorted(numbers, key=pad) == numbers
+    assert all(len(pad(number)) == SEQUENCE_NUMBER_LENGTH for number in numbers)
+
+
+def test_applies_a_newer_record():
+    assert skip_reason("1000", "new", is_destroy=False, applied=APPLIED) is None
+
+
+def test_applies_the_first_record():
+    applied = AppliedRecord(sequence_number=None, deployment_id=None)
+
+    assert skip_reason("1", "new", is_destroy=False, applied=applied) is None
+
+
+@pytest.mark.parametrize("sequence_number", ["200", "199", "30"])
+def test_skips_a_record_that_isn_t_newer(sequence_number):
+    reason = skip_reason(sequence_number, "new", is_destroy=False, applied=APPLIED)
+
+    assert reason == (
+        f"sequence number {sequence_number} isn't newer than the last applied 200"
+    )
+
+
+def test_skips_an_applied_deployment():
+    assert (
+        skip_reason("300", "applied", is_destroy=False, applied=APPLIED)
+        == "deployment applied was already applied"
+    )
+
+
+def test_applies_a_destroy_of_the_applied_deployment():
+    assert skip_reason("300", "applied", is_destroy=True, applied=APPLIED) is None
+
+
+@pytest.fixture
+def lease(table):
+    lease = Lease(tenant_id=TENANT_ID, owner="owner")
+    lease.acquire()
+    return lease
+
+
+def _applied(lease: Lease):
+    return AppliedRecord.from_item(dynamo.table.get_item(Key=lease.key)["Item"])
+
+
+def test_record_applied_advances_the_applied_record(lease):
+    record_applied(lease, "99", "first")
+    record_applied(lease, "100", "second")
+
+    assert _applied(lease) == AppliedRecord(
+        sequence_number=pad("100"), deployment_id="second"
+    )
+
+
+def test_record_applied_never_goes_back(lease):
+    record_applied(lease, "100", "second")
+
+    with pytest.raises(LeaseLostError):
+        record_applied(lease, "99", "first")
+    assert _applied(lease).deployment_id == "second"
+
+
+def test_record_applied_requires_the_lease(lease):
+    # Another owner took the lease over in the meantime
+    lease.release()
+    Lease(tenant_id=TENANT_ID, owner="other").acquire()
+
+    with pytest.raises(LeaseLostError):
+        record_applied(lease, "100", "stale")
+    assert _applied(lease).sequence_number is None
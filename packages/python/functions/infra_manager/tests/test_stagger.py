@@ -0,0 +1,143 @@
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from bench import inputs
+from models import Input
+from utils import stagger
+from utils.stagger import MAX_WINDOW_MINUTES, Slot
+
+
+# A monday
+START = datetime(2026, 1, 5, tzinfo=timezone.utc)
+DAILY = Slot(cron_expression="0 2 * * ? *", timezone="UTC")
+WEEKDAYS = Slot(cron_expression="0 2 ? * MON-FRI *", timezone="UTC")
+HOURLY = Slot(cron_expression="0 * * * ? *", timezone="UTC")
+LATE = Slot(cron_expression="30 3 * * ? *", timezone="UTC")
+
+
+def _input(index: int, sync=None) -> Input:
+    config = inputs.enabled_config(inputs.HOSTNAME_HOST)
+    if sync is not None:
+        config["sync"] = sync
+    return Input.model_validate(
+        inputs.input_item(inputs.tenant_id(index), config, inputs.deployment_id(index))
+    )
+
+
+def _windows(plans):
+    return {slot_plan.slot: slot_plan.window_minutes for slot_plan in plans}
+
+
+def test_tenants_with_the_same_schedule_share_a_slot():
+    denver = Slot.of(_input(0).papercut_mf_config)
+    utc = Slot.of(
+        _input(
+            2, sync={"cronExpression": "0 2 * * ? *", "timezone": "UTC"}
+        ).papercut_mf_config
+    )
+
+    assert Slot.of(_input(1).papercut_mf_config) == denver
+    assert denver == Slot(cron_expression="0 2 * * ? *", timezone="America/Denver")
+    assert utc == DAILY
+    assert utc.key != denver.key
+
+
+def test_fire_times_are_in_utc():
+    denver = Slot(cron_expression="0 2 * * ? *", timezone="America/Denver")
+
+    assert stagger.fire_times(denver, START, START + timedelta(days=1)) == [
+        datetime(2026, 1, 5, 9, tzinfo=timezone.utc)
+    ]
+
+
+def test_slots_within_the_rate_keep_a_minute():
+    plans = stagger.plan(Counter({DAILY: 10}), start=START, max_per_minute=10)
+
+    assert _windows(plans) == {DAILY: 1}
+    assert len(plans[0].fire_minutes) == 7
+
+
+def test_colliding_slots_are_spread_over_their_combined_peak():
+    plans = stagger.plan(
+        Counter({DAILY: 20, WEEKDAYS: 15}), start=START, max_per_minute=10
+    )
+
+    assert _windows(plans) == {DAILY: 4, WEEKDAYS: 4}
+
+
+def test_window_never_reaches_the_next_fire_time():
+    plans = stagger.plan(Counter({HOURLY: 1000}), start=START, max_per_minute=10)
+
+    assert _windows(plans) == {HOURLY: 60}
+
+
+def test_window_is_capped_at_the_scheduler_limit():
+    plans = stagger.plan(Counter({DAILY: 100_000}), start=START, max_per_minute=10)
+
+    assert _windows(plans) == {DAILY: MAX_WINDOW_MINUTES}
+
+
+def test_slots_not_firing_within_the_horizon_keep_a_minute():
+    past = Slot(cron_expression="0 2 1 1 ? 2020", timezone="UTC")
+    plans = stagger.plan(Counter({past: 100}), start=START, max_per_minute=10)
+
+    assert _windows(plans) == {past: 1}
+    assert stagger.peak(plans, start=START) == stagger.Peak()
+
+
+def test_peak_is_spread_over_the_windows():
+    plans = stagger.plan(
+        Counter({DAILY: 20, WEEKDAYS: 15}), start=START, max_per_minute=10
+    )
+
+    before = stagger.peak(plans, start=START, staggered=False)
+    after = stagger.peak(plans, start=START)
+
+    assert before.invocations == 35
+    assert before.at == datetime(2026, 1, 5, 2, tzinfo=timezone.utc)
+    assert after.invocations == 35 / 4
+    assert after.at == before.at
+
+
+def test_save_returns_the_slots_whose_window_changed(table):
+    plans = stagger.plan(Counter({DAILY: 20, LATE: 5}), start=START, max_per_minute=10)
+
+    assert stagger.save(plans) == {DAILY}
+    assert stagger.save(plans) == set()
+    assert stagger.planned()[DAILY.key].window_minutes == 2
+    assert stagger.planned_window(DAILY) == 2
+    assert stagger.planned_window(LATE) == 1
+
+
+def test_save_replaces_the_saved_plan(table):
+    stagger.save(
+        stagger.plan(Counter({DAILY: 20, HOURLY: 5}), start=START, max_per_minute=10)
+    )
+
+    changed = stagger.save(
+        stagger.plan(Counter({HOURLY: 50}), start=START, max_per_minute=10)
+    )
+
+    assert changed == {HOURLY}
+    assert stagger.planned().keys() == {HOURLY.key}
+    assert stagger.planned_window(DAILY) == 1
+
+
+def test_planned_windows_are_of_tenants_given_one(table):
+    utc = {"cronExpression": "0 2 * * ? *", "timezone": "UTC"}
+    stagger.save(
+        stagger.plan(
+            Counter({DAILY: 30, Slot.of(_input(1).papercut_mf_config): 1}),
+            start=START,
+            max_per_minute=10,
+        )
+    )
+    tenants = {
+        inputs.tenant_id(0): _input(0, sync=utc),
+        inputs.tenant_id(1): _input(1),
+        inputs.tenant_id(2): Input.model_validate(
+            inputs.input_item(inputs.tenant_id(2), inputs.CONFIGS["disabled"])
+        ),
+    }
+
+    assert stagger.planned_windows(tenants) == {inputs.tenant_id(0): 3}
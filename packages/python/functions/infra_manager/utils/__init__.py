@@ -1,11 +1,14 @@
-from sst import Resource
+import base64
 
-from utils.cloudflare import Cloudflare
-from utils import crypto
-from utils import naming
+from sst import Resource
 
 
 is_prod_stage = Resource.App.stage == "prod"
+# Tenants share a role per purpose, scoped to the tenant with session tags (pd:tenantId)
+shared_tenant_roles = Resource.TenantRoles.shared
+# Tenants' syncs are fanned out by a schedule per sync slot instead of their own schedule
+sync_dispatch = Resource.PapercutMfSyncDispatch.enabled
+infra_project_name = f"{Resource.App.name}-{Resource.App.stage}-infra"
 SEPARATOR = chr(0x1F)
 
 nano_id_pattern = Resource.NanoId.pattern.strip("^$")
@@ -16,18 +19,45 @@ tenant_id_key_pattern = (
 tenant_deployment_id_key_pattern = rf"^{Resource.Dynamo.keyLiterals.TENANT}{SEPARATOR}{nano_id_pattern}{SEPARATOR}{Resource.Dynamo.keyLiterals.DEPLOYMENT}{SEPARATOR}{nano_id_pattern}$"
 infra_input_key_pattern = rf"^{Resource.Dynamo.keyLiterals.INFRA}{SEPARATOR}{Resource.Dynamo.keyLiterals.INPUT}$"
 infra_output_key_pattern = rf"^{Resource.Dynamo.keyLiterals.INFRA}{SEPARATOR}{Resource.Dynamo.keyLiterals.OUTPUT}$"
+infra_drift_key_pattern = rf"^{Resource.Dynamo.keyLiterals.INFRA}{SEPARATOR}{Resource.Dynamo.keyLiterals.DRIFT}$"
 ipv4_pattern = (
     r"^(?:(?:[1-9]|1\d|2[0-4])?\d|25[0-5])(?:\.(?:(?:[1-9]|1\d|2[0-4])?\d|25[0-5])){3}$"
 )
 
+
+def default_tags(tenant_id: str):
+    return {
+        "sst:app": Resource.App.name,
+        "sst:stage": Resource.App.stage,
+        "pd:tenantId": tenant_id,
+    }
+
+
+def api_domain_label(tenant_id: str):
+    """The dns label of the tenant's papercut mf api domain."""
+    return (
+        base64.b32encode(tenant_id.encode("utf-8")).decode("utf-8").lower().rstrip("=")
+    )
+
+
+# Imported after the constants, which the models imported by these depend on. The naming
+# module imports the provider sdks, it's imported by the program when it runs.
+from utils.cloudflare import Cloudflare  # noqa: E402
+from utils import crypto  # noqa: E402
+
 __all__ = [
+    "api_domain_label",
     "Cloudflare",
     "crypto",
+    "default_tags",
+    "infra_project_name",
     "is_prod_stage",
-    "naming",
     "SEPARATOR",
+    "shared_tenant_roles",
+    "sync_dispatch",
     "tenant_id_key_pattern",
     "infra_input_key_pattern",
     "infra_output_key_pattern",
+    "infra_drift_key_pattern",
     "ipv4_pattern",
 ]
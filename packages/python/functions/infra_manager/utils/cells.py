@@ -0,0 +1,367 @@
+from dataclasses import dataclass
+import hashlib
+import os
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from sst import Resource
+
+from utils import SEPARATOR, dynamo
+from utils.lease import Lease
+
+
+DEFAULT_COUNT = 0
+TENANT = "pd:cell:Tenant"
+ROOT_STACK = "pulumi:pulumi:Stack"
+PROVIDERS = "pulumi:providers:"
+AWS_PROVIDER = f"{PROVIDERS}aws"
+# Preview operations a migration must not cause, it only moves state
+RECREATING_OPS = (
+    "create",
+    "create-replacement",
+    "replace",
+    "delete",
+    "delete-replaced",
+)
+
+
+class CellMigratingError(Exception):
+    pass
+
+
+class CellMigrationError(Exception):
+    pass
+
+
+def count_from_env() -> int:
+    return int(os.environ.get("TENANT_CELLS", DEFAULT_COUNT))
+
+
+def cell_of(tenant_id: str, count: int) -> str:
+    index = int(hashlib.sha256(tenant_id.encode("utf-8")).hexdigest()[:16], 16) % count
+    return f"cell-{index:03d}"
+
+
+def cell_key(cell: str):
+    return SEPARATOR.join(
+        [Resource.Dynamo.keyLiterals.INFRA, Resource.Dynamo.keyLiterals.CELL, cell]
+    )
+
+
+def urn(stack_name: str, project_name: str, type_: str, name: str):
+    return f"urn:pulumi:{stack_name}::{project_name}::{type_}::{name}"
+
+
+def split_urn(urn_: str) -> Tuple[str, str, str, str]:
+    """Splits a urn into its stack name, project name, qualified type and name."""
+    stack, project_name, type_, name = urn_.split("::", 3)
+    return stack.removeprefix("urn:pulumi:"), project_name, type_, name
+
+
+@dataclass
+class Placement:
+    """The stack a tenant's resources are in, its own or the cell stack it's a member of."""
+
+    tenant_id: str
+    cell: Optional[str] = None
+
+    @property
+    def stack_name(self):
+        return self.cell if self.cell is not None else self.tenant_id
+
+    @property
+    def resource_prefix(self):
+        return f"{self.tenant_id}-" if self.cell is not None else ""
+
+    def tenant_urn(self, project_name: str):
+        return urn(self.stack_name, project_name, TENANT, self.tenant_id)
+
+
+def membership(tenant_id: str) -> Optional[Dict[str, Any]]:
+    return dynamo.table.get_item(
+        Key=dynamo.primary_key(tenant_id, Resource.Dynamo.keyLiterals.CELL),
+        ConsistentRead=True,
+    ).get("Item")
+
+
+def place(tenant_id: str, lease: Optional[Lease] = None) -> Placement:
+    """
+    Places a tenant's stack operation:
+    - Members of a cell (INFRA#CELL) are operated on in their cell's stack
+    - Tenants which were operated on before cells were enabled (TENANT_CELLS) keep their own
+      stack until they're migrated, as do all tenants while cells are disabled
+    - New tenants are placed in a cell by the hash of their id, once their lease is held
+    """
+    item = membership(tenant_id)
+    if item is not None:
+        if item.get("migrating"):
+            raise CellMigratingError(
+                f"Stack of tenant {tenant_id} is being migrated to cell {item['cell']}."
+            )
+        return Placement(tenant_id=tenant_id, cell=item["cell"])
+
+    count = count_from_env()
+    if lease is None or count == 0:
+        return Placement(tenant_id=tenant_id)
+
+    # Acquiring the lease created the stack item, an earlier token means an earlier operation
+    deployed = "Item" in dynamo.table.get_item(
+        Key=dynamo.primary_key(tenant_id, Resource.Dynamo.keyLiterals.OUTPUT),
+        ProjectionExpression="#pk",
+        ExpressionAttributeNames={"#pk": Resource.Dynamo.hashKey},
+    )
+    if lease.token > 1 or deployed:
+        return Placement(tenant_id=tenant_id)
+
+    return Placement(tenant_id=tenant_id, cell=cell_of(tenant_id, count))
+
+
+class CellLease(Lease):
+    """
+    A lease on a cell's stack item, held in addition to the lease of the tenant operated on,
+    so only one tenant of a cell is operated on at once.
+    """
+
+    def __init__(
+        self,
+        cell: str,
+        owner: str,
+        on_lost: Optional[Callable[[str], None]] = None,
+    ):
+        super().__init__(tenant_id=cell, owner=owner, on_lost=on_lost)
+        self.cell = cell
+
+    @property
+    def key(self):
+        return {
+            Resource.Dynamo.hashKey: cell_key(self.cell),
+            Resource.Dynamo.rangeKey: dynamo.infra_key(
+                Resource.Dynamo.keyLiterals.STACK
+            ),
+        }
+
+    @property
+    def subject(self):
+        return f"cell {self.cell}"
+
+
+def join(lease: Lease, cell_lease: CellLease, tenant_id: str, migrating=False):
+    """
+    Makes the tenant a member of the cell: a member item in the cell's partition, which the
+    cell's program is built from, and the tenant's membership item (INFRA#CELL).
+    """
+    cell_lease.put_item(
+        {
+            Resource.Dynamo.hashKey: cell_key(cell_lease.cell),
+            Resource.Dynamo.rangeKey: dynamo.tenant_key(tenant_id),
+            "tenantId": tenant_id,
+        }
+    )
+    lease.put_item(
+        {
+            **dynamo.primary_key(tenant_id, Resource.Dynamo.keyLiterals.CELL),
+            "cell": cell_lease.cell,
+            **({"migrating": True} if migrating else {}),
+        }
+    )
+
+
+def leave(lease: Lease, cell_lease: CellLease, tenant_id: str):
+    cell_lease.delete_item(
+        {
+            Resource.Dynamo.hashKey: cell_key(cell_lease.cell),
+            Resource.Dynamo.rangeKey: dynamo.tenant_key(tenant_id),
+        }
+    )
+    lease.delete_item(dynamo.primary_key(tenant_id, Resource.Dynamo.keyLiterals.CELL))
+
+
+def member_ids(cell: str) -> List[str]:
+    tenant_ids: List[str] = []
+    kwargs: Dict[str, Any] = {}
+    while True:
+        response = dynamo.table.query(
+            KeyConditionExpression="#pk = :pk AND begins_with(#sk, :tenant)",
+            ExpressionAttributeNames={
+                "#pk": Resource.Dynamo.hashKey,
+                "#sk": Resource.Dynamo.rangeKey,
+            },
+            ExpressionAttributeValues={
+                ":pk": cell_key(cell),
+                ":tenant": f"{Resource.Dynamo.keyLiterals.TENANT}{SEPARATOR}",
+            },
+            ProjectionExpression="tenantId",
+            ConsistentRead=True,
+            **kwargs,
+        )
+        tenant_ids.extend(item["tenantId"] for item in response["Items"])
+        if "LastEvaluatedKey" not in response:
+            return tenant_ids
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def member_inputs(cell: str) -> Dict[str, Dict[str, Any]]:
+    """
+    The input items of the cell's members, by tenant. Members whose input was removed are
+    left out, their stream record destroys their resources.
+    """
+    return member_items(cell, Resource.Dynamo.keyLiterals.INPUT)
+
+
+def member_items(cell: str, literal: str) -> Dict[str, Dict[str, Any]]:
+    """The cell's members' items of the kind, by tenant."""
+    keys = [dynamo.primary_key(tenant_id, literal) for tenant_id in member_ids(cell)]
+
+    items: List[Dict[str, Any]] = []
+    for start in range(0, len(keys), 100):
+        request = {
+            Resource.Dynamo.name: {
+                "Keys": keys[start : start + 100],
+                "ConsistentRead": True,
+            }
+        }
+        while request:
+            # The table's client serializes items like the table does
+            response = dynamo.table.meta.client.batch_get_item(RequestItems=request)
+            items.extend(response["Responses"].get(Resource.Dynamo.name, []))
+            request = response.get("UnprocessedKeys")
+
+    return {
+        item[Resource.Dynamo.hashKey].split(SEPARATOR)[1]: item
+        for item in sorted(items, key=lambda item: item[Resource.Dynamo.hashKey])
+    }
+
+
+def merge_deployment(
+    source: Dict[str, Any],
+    target: Dict[str, Any],
+    project_name: str,
+    placement: Placement,
+) -> Dict[str, Any]:
+    """
+    Moves the resources of a tenant's own stack deployment into its cell stack's deployment
+    (both as exported, i.e. with their secrets in plaintext), without changing their ids:
+    - Resources are renamed under the tenant's component (pd:cell:Tenant), prefixed like
+      the cell program names them
+    - The tenant's default aws provider becomes its component's provider, which carries
+      the tenant's default tags
+    - Other default providers are shared with the cell's, if it already has them
+    """
+    if source.get("pending_operations"):
+        raise CellMigrationError(
+            f"Stack of tenant {placement.tenant_id} has pending operations."
+        )
+
+    resources: List[Dict[str, Any]] = list(target.get("resources") or [])
+    existing = {resource["urn"]: resource for resource in resources}
+    tenant_urn = placement.tenant_urn(project_name)
+    if tenant_urn in existing:
+        raise CellMigrationError(
+            f"Cell {placement.cell} already has resources of tenant {placement.tenant_id}."
+        )
+
+    root_urn = urn(
+        placement.stack_name,
+        project_name,
+        ROOT_STACK,
+        f"{project_name}-{placement.stack_name}",
+    )
+    if root_urn not in existing:
+        resources.insert(0, {"urn": root_urn, "custom": False, "type": ROOT_STACK})
+
+    renamed: Dict[str, str] = {}
+    parents: Dict[str, str] = {}
+    provider_refs: Dict[str, str] = {}
+    moved: List[Dict[str, Any]] = []
+    for resource in source.get("resources") or []:
+        _, _, type_, name = split_urn(resource["urn"])
+
+        if resource["type"] == ROOT_STACK:
+            renamed[resource["urn"]] = tenant_urn
+            continue
+
+        if type_.startswith(PROVIDERS) and name.startswith("default"):
+            if type_ == AWS_PROVIDER:
+                new_urn = urn(
+                    placement.stack_name,
+                    project_name,
+                    f"{TENANT}${AWS_PROVIDER}",
+                    f"{placement.resource_prefix}Aws",
+                )
+                parents[new_urn] = tenant_urn
+            else:
+                new_urn = urn(placement.stack_name, project_name, type_, name)
+                if new_urn in existing:
+                    provider_refs[f"{resource['urn']}::{resource['id']}"] = (
+                        f"{new_urn}::{existing[new_urn]['id']}"
+                    )
+                    continue
+                parents[new_urn] = root_urn
+        else:
+            new_urn = urn(
+                placement.stack_name,
+                project_name,
+                f"{TENANT}${type_}",
+                f"{placement.resource_prefix}{name}",
+            )
+
+        renamed[resource["urn"]] = new_urn
+        moved.append(resource)
+
+    def rename(urn_: str):
+        return renamed.get(urn_, urn_)
+
+    def provider(ref: str):
+        if ref in provider_refs:
+            return provider_refs[ref]
+        urn_, _, id_ = ref.rpartition("::")
+        return f"{rename(urn_)}::{id_}"
+
+    resources.append(
+        {"urn": tenant_urn, "custom": False, "type": TENANT, "parent": root_urn}
+    )
+    for resource in moved:
+        new_urn = rename(resource["urn"])
+        resource = {key: value for key, value in resource.items() if key != "aliases"}
+        resource["urn"] = new_urn
+
+        if new_urn in parents:
+            resource["parent"] = parents[new_urn]
+        elif "parent" in resource:
+            resource["parent"] = rename(resource["parent"])
+        if "provider" in resource:
+            resource["provider"] = provider(resource["provider"])
+        if "deletedWith" in resource:
+            resource["deletedWith"] = rename(resource["deletedWith"])
+        if "dependencies" in resource:
+            resource["dependencies"] = [
+                rename(dependency) for dependency in resource["dependencies"]
+            ]
+        if "propertyDependencies" in resource:
+            resource["propertyDependencies"] = {
+                key: [rename(dependency) for dependency in dependencies]
+                for key, dependencies in resource["propertyDependencies"].items()
+            }
+
+        resources.append(resource)
+
+    return {**target, "resources": resources}
+
+
+def remove_tenant(
+    deployment: Dict[str, Any], project_name: str, placement: Placement
+) -> Dict[str, Any]:
+    """Removes the tenant's component and its descendants from a cell stack deployment."""
+    removed: Set[str] = {placement.tenant_urn(project_name)}
+    for resource in deployment.get("resources") or []:
+        # Parents precede their children
+        if resource.get("parent") in removed:
+            removed.add(resource["urn"])
+
+    return {
+        **deployment,
+        "resources": [
+            resource
+            for resource in deployment.get("resources") or []
+            if resource["urn"] not in removed
+        ],
+    }
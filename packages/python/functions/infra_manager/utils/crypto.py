@@ -2,7 +2,7 @@ import os
 import base64
 import hashlib
 
-from models import Hash
+from models.crypto import Hash
 
 
 def generate_token(size: int = 32) -> str:
@@ -0,0 +1,126 @@
+import os
+import signal
+import threading
+from typing import Callable, List, Optional
+
+from aws_lambda_powertools.utilities.typing import LambdaContext
+
+
+DEFAULT_MARGIN_SECONDS = 120
+POLL_INTERVAL_SECONDS = 1
+FORCE_MARGIN_SECONDS = 15
+
+
+class DeadlineExceededError(Exception):
+    def __init__(self, message: str, forced: bool = False):
+        super().__init__(message)
+        self.forced = forced
+
+
+class Deadline:
+    """
+    Watches the remaining invocation time while a pulumi operation is running.
+    - Once the remaining time drops below the margin, the pulumi CLI is sent a
+      SIGINT, which makes the engine stop scheduling new steps, wait for the
+      in-flight ones and persist the checkpoint before exiting
+    - If the engine still hasn't exited close to the hard timeout, a second
+      SIGINT terminates it immediately
+    """
+
+    def __init__(
+        self,
+        context: LambdaContext,
+        margin_seconds: Optional[int] = None,
+        on_expire: Optional[Callable[[str], None]] = None,
+    ):
+        self._context = context
+        self._margin_ms = (
+            margin_seconds
+            if margin_seconds is not None
+            else int(
+                os.environ.get(
+                    "STACK_OPERATION_DEADLINE_MARGIN_SECONDS", DEFAULT_MARGIN_SECONDS
+                )
+            )
+        ) * 1000
+        self._force_margin_ms = min(FORCE_MARGIN_SECONDS * 1000, self._margin_ms // 2)
+        self._on_expire = on_expire
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.expired = False
+        self.forced = False
+
+    @property
+    def remaining_ms(self) -> int:
+        return self._context.get_remaining_time_in_millis()
+
+    def __enter__(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def expire(self, reason: str):
+        """Gracefully interrupts the running pulumi operation, if any."""
+        if self.expired:
+            return
+
+        self.expired = True
+        if self._on_expire is not None:
+            self._on_expire(reason)
+
+        interrupt_pulumi()
+
+    def _watch(self):
+        while not self._stop.wait(POLL_INTERVAL_SECONDS):
+            remaining_ms = self.remaining_ms
+
+            if not self.expired and remaining_ms <= self._margin_ms:
+                self.expire(
+                    f"{remaining_ms} ms remaining, which is within the {self._margin_ms} ms safety margin"
+                )
+            elif (
+                self.expired
+                and not self.forced
+                and remaining_ms <= self._force_margin_ms
+            ):
+                self.forced = True
+                interrupt_pulumi()
+
+
+def pulumi_pids(parent_pid: Optional[int] = None) -> List[int]:
+    """Finds the pulumi CLI processes spawned by the automation api."""
+    parent_pid = parent_pid if parent_pid is not None else os.getpid()
+    pids: List[int] = []
+
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+
+        try:
+            with open(f"/proc/{entry}/stat") as stat:
+                # i.e. "1234 (pulumi) S 1 ...", comm may contain spaces
+                fields = stat.read()
+        except OSError:
+            continue
+
+        comm = fields[fields.find("(") + 1 : fields.rfind(")")]
+        ppid = int(fields[fields.rfind(")") + 2 :].split()[1])
+        if comm == "pulumi" and ppid == parent_pid:
+            pids.append(int(entry))
+
+    return pids
+
+
+def interrupt_pulumi():
+    for pid in pulumi_pids():
+        try:
+            os.kill(pid, signal.SIGINT)
+        except ProcessLookupError:
+            pass
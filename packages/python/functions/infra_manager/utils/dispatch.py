@@ -0,0 +1,296 @@
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+import hashlib
+import os
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from sst import Resource
+
+from models import DispatchEvent
+from utils import SEPARATOR, dynamo
+from utils.lease import Lease
+from utils.stagger import Slot, planned_window, sync_key
+
+
+DEFAULT_CONCURRENCY = 10
+DEFAULT_BATCH_SIZE = 50
+SCHEDULE_NAME_PREFIX = "PapercutMfSync-"
+
+
+def concurrency_from_env() -> int:
+    return int(os.environ.get("SYNC_DISPATCH_CONCURRENCY", DEFAULT_CONCURRENCY))
+
+
+def batch_size_from_env() -> int:
+    return int(os.environ.get("SYNC_DISPATCH_BATCH_SIZE", DEFAULT_BATCH_SIZE))
+
+
+def slot_key(slot: Slot):
+    """The partition of the slot's tenants, next to the slots' plans (INFRA#SYNC)."""
+    return SEPARATOR.join([sync_key(), slot.key])
+
+
+def schedule_name(slot: Slot):
+    # Schedule names are at most 64 characters of [0-9a-zA-Z-_.]
+    return f"{SCHEDULE_NAME_PREFIX}{hashlib.sha256(slot.key.encode('utf-8')).hexdigest()[:32]}"
+
+
+def function_arn(function_name: str):
+    return f"arn:aws:lambda:{Resource.Aws.region}:{Resource.Aws.account.id}:function:{function_name}"
+
+
+def registration(tenant_id: str) -> Optional[Slot]:
+    """The slot the tenant is registered in (INFRA#SYNC), if any."""
+    item = dynamo.table.get_item(
+        Key=dynamo.primary_key(tenant_id, Resource.Dynamo.keyLiterals.SYNC),
+        ConsistentRead=True,
+    ).get("Item")
+    if item is None:
+        return None
+
+    return Slot(cron_expression=item["cronExpression"], timezone=item["timezone"])
+
+
+def join(lease: Lease, tenant_id: str, slot: Slot):
+    """
+    Registers the tenant in the slot: a member item in the slot's partition, which the
+    slot's dispatch reads, and the tenant's registration item (INFRA#SYNC).
+    """
+    lease.put_item(
+        {
+            Resource.Dynamo.hashKey: slot_key(slot),
+            Resource.Dynamo.rangeKey: dynamo.tenant_key(tenant_id),
+            "tenantId": tenant_id,
+        }
+    )
+    lease.put_item(
+        {
+            **dynamo.primary_key(tenant_id, Resource.Dynamo.keyLiterals.SYNC),
+            "cronExpression": slot.cron_expression,
+            "timezone": slot.timezone,
+        }
+    )
+
+
+def leave(lease: Lease, tenant_id: str, slot: Slot, keep_registration=False):
+    lease.delete_item(
+        {
+            Resource.Dynamo.hashKey: slot_key(slot),
+            Resource.Dynamo.rangeKey: dynamo.tenant_key(tenant_id),
+        }
+    )
+    if not keep_registration:
+        lease.delete_item(
+            dynamo.primary_key(tenant_id, Resource.Dynamo.keyLiterals.SYNC)
+        )
+
+
+def member_batches(
+    slot: Slot, after_tenant_id: Optional[str] = None, batch_size=DEFAULT_BATCH_SIZE
+) -> Iterator[List[str]]:
+    """The slot's tenants in batches, in order of their key (after the given tenant's)."""
+    kwargs: Dict[str, Any] = {}
+    if after_tenant_id is not None:
+        kwargs["ExclusiveStartKey"] = {
+            Resource.Dynamo.hashKey: slot_key(slot),
+            Resource.Dynamo.rangeKey: dynamo.tenant_key(after_tenant_id),
+        }
+    while True:
+        response = dynamo.table.query(
+            KeyConditionExpression="#pk = :pk",
+            ExpressionAttributeNames={"#pk": Resource.Dynamo.hashKey},
+            ExpressionAttributeValues={":pk": slot_key(slot)},
+            ProjectionExpression="tenantId",
+            ConsistentRead=True,
+            Limit=batch_size,
+            **kwargs,
+        )
+        if response["Items"]:
+            yield [item["tenantId"] for item in response["Items"]]
+
+        if "LastEvaluatedKey" not in response:
+            return
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def has_members(slot: Slot) -> bool:
+    return next(member_batches(slot, batch_size=1), None) is not None
+
+
+class SlotSchedules:
+    """
+    The slots' schedules (one per slot, in the dispatch schedule group), each invoking the
+    dispatch of its slot's tenants with the slot's planned window (see utils.stagger).
+    """
+
+    def __init__(self, scheduler, function_arn: str):
+        self._scheduler = scheduler
+        self.function_arn = function_arn
+
+    def _args(self, slot: Slot) -> Dict[str, Any]:
+        window_minutes = planned_window(slot)
+        return {
+            "Name": schedule_name(slot),
+            "GroupName": Resource.PapercutMfSyncDispatch.scheduleGroupName,
+            "ScheduleExpression": f"cron({slot.cron_expression})",
+            "ScheduleExpressionTimezone": slot.timezone,
+            "FlexibleTimeWindow": {
+                "Mode": "FLEXIBLE",
+                "MaximumWindowInMinutes": window_minutes,
+            }
+            if window_minutes > 1
+            else {"Mode": "OFF"},
+            "Target": {
+                "Arn": self.function_arn,
+                "RoleArn": Resource.PapercutMfSyncDispatch.scheduleRoleArn,
+                "Input": DispatchEvent(
+                    type="dispatch",
+                    cron_expression=slot.cron_expression,
+                    timezone=slot.timezone,
+                ).model_dump_json(by_alias=True, exclude_none=True),
+            },
+        }
+
+    def exists(self, slot: Slot) -> bool:
+        try:
+            self._scheduler.get_schedule(
+                Name=schedule_name(slot),
+                GroupName=Resource.PapercutMfSyncDispatch.scheduleGroupName,
+            )
+            return True
+        except self._scheduler.exceptions.ResourceNotFoundException:
+            return False
+
+    def ensure(self, slot: Slot):
+        """Creates the slot's schedule, unless it exists already."""
+        if self.exists(slot):
+            return
+
+        try:
+            self._scheduler.create_schedule(**self._args(slot))
+        except self._scheduler.exceptions.ConflictException:
+            # Created by another tenant's operation in the meantime
+            pass
+
+    def put(self, slot: Slot):
+        """Creates or updates the slot's schedule, i.e. once its window was planned again."""
+        try:
+            self._scheduler.create_schedule(**self._args(slot))
+        except self._scheduler.exceptions.ConflictException:
+            self._scheduler.update_schedule(**self._args(slot))
+
+    def delete(self, slot: Slot):
+        self.delete_named(schedule_name(slot))
+
+    def delete_named(self, name: str):
+        try:
+            self._scheduler.delete_schedule(
+                Name=name, GroupName=Resource.PapercutMfSyncDispatch.scheduleGroupName
+            )
+        except self._scheduler.exceptions.ResourceNotFoundException:
+            pass
+
+    def retire(self, slot: Slot):
+        """
+        Deletes the slot's schedule once its last tenant left. A tenant which joined in the
+        meantime found the schedule still there, so it's checked again after the delete.
+        """
+        if has_members(slot):
+            return
+
+        self.delete(slot)
+        if has_members(slot):
+            self.ensure(slot)
+
+    def names(self) -> List[str]:
+        names: List[str] = []
+        paginator = self._scheduler.get_paginator("list_schedules")
+        for page in paginator.paginate(
+            GroupName=Resource.PapercutMfSyncDispatch.scheduleGroupName,
+            NamePrefix=SCHEDULE_NAME_PREFIX,
+        ):
+            names.extend(schedule["Name"] for schedule in page["Schedules"])
+        return names
+
+
+@dataclass
+class DispatchReport:
+    synced: List[str] = field(default_factory=list)
+    failed: Dict[str, str] = field(default_factory=dict)
+    # Set when the slot's remaining tenants are left to another invocation, which continues
+    # after this tenant (or from the start, if none was dispatched)
+    continued: bool = False
+    after_tenant_id: Optional[str] = None
+
+
+class Dispatcher:
+    """
+    Syncs a slot's tenants, read in batches, with at most `concurrency` syncs running at
+    once. Each sync is awaited, so the slot's throughput is bounded by the concurrency rather
+    than by how fast invocations can be started:
+    - A sync is only started while `has_time` with the longest sync so far (in ms)
+    - Once it doesn't, the running syncs are awaited and the report is marked continued
+    """
+
+    def __init__(
+        self,
+        sync: Callable[[str], None],
+        concurrency: int = DEFAULT_CONCURRENCY,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ):
+        self._sync = sync
+        self.concurrency = max(concurrency, 1)
+        self.batch_size = max(batch_size, 1)
+        self._longest_ms = 0.0
+
+    def _timed_sync(self, tenant_id: str):
+        start = time.perf_counter()
+        try:
+            self._sync(tenant_id)
+        finally:
+            self._longest_ms = max(
+                self._longest_ms, (time.perf_counter() - start) * 1000
+            )
+
+    def run(
+        self,
+        slot: Slot,
+        has_time: Callable[[float], bool],
+        after_tenant_id: Optional[str] = None,
+    ) -> DispatchReport:
+        report = DispatchReport(after_tenant_id=after_tenant_id)
+        futures: Dict[Future, str] = {}
+
+        def collect():
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                tenant_id = futures.pop(future)
+                try:
+                    future.result()
+                    report.synced.append(tenant_id)
+                except Exception as e:
+                    report.failed[tenant_id] = str(e)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for batch in member_batches(
+                slot, after_tenant_id=after_tenant_id, batch_size=self.batch_size
+            ):
+                for tenant_id in batch:
+                    while len(futures) >= self.concurrency:
+                        collect()
+
+                    if not has_time(self._longest_ms):
+                        report.continued = True
+                        break
+
+                    futures[executor.submit(self._timed_sync, tenant_id)] = tenant_id
+                    report.after_tenant_id = tenant_id
+
+                if report.continued:
+                    break
+
+            while futures:
+                collect()
+
+        return report
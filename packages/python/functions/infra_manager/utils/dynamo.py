@@ -0,0 +1,41 @@
+import boto3
+from sst import Resource
+
+from utils import SEPARATOR
+
+
+# Honors AWS_ENDPOINT_URL_DYNAMODB, i.e. to run against DynamoDB Local
+table = boto3.resource("dynamodb").Table(Resource.Dynamo.name)
+ConditionalCheckFailedException = (
+    table.meta.client.exceptions.ConditionalCheckFailedException
+)
+
+
+# The name the table's first global secondary index is linked under
+GSI1 = "gsi1"
+
+
+def tenant_key(tenant_id: str):
+    return SEPARATOR.join([Resource.Dynamo.keyLiterals.TENANT, tenant_id])
+
+
+def tenant_deployment_key(tenant_id: str, deployment_id: str):
+    return SEPARATOR.join(
+        [
+            Resource.Dynamo.keyLiterals.TENANT,
+            tenant_id,
+            Resource.Dynamo.keyLiterals.DEPLOYMENT,
+            deployment_id,
+        ]
+    )
+
+
+def infra_key(literal: str):
+    return SEPARATOR.join([Resource.Dynamo.keyLiterals.INFRA, literal])
+
+
+def primary_key(tenant_id: str, literal: str):
+    return {
+        Resource.Dynamo.hashKey: tenant_key(tenant_id),
+        Resource.Dynamo.rangeKey: infra_key(literal),
+    }
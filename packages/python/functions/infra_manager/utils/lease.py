@@ -0,0 +1,183 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from sst import Resource
+
+from utils import dynamo
+
+
+DEFAULT_DURATION_SECONDS = 60
+DEFAULT_HEARTBEAT_SECONDS = 15
+
+
+class LeaseHeldError(Exception):
+    def __init__(self, message: str, owner: Optional[str] = None):
+        super().__init__(message)
+        self.owner = owner
+
+
+class LeaseLostError(Exception):
+    pass
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+class Lease:
+    """
+    A tenant scoped lease on the tenant's stack item (INFRA#STACK), so only one invocation
+    operates on a tenant's stack at once.
+    - Acquiring is a single conditional write that fails fast while another owner's lease
+      hasn't expired, and increments the stack's fencing token
+    - A heartbeat extends the lease while the operation is running; if it can't (because the
+      lease expired and was taken over), the lease is lost and `on_lost` is called
+    - Writes made on behalf of the lease are conditioned on its fencing token, so a stale
+      owner can't overwrite the result of a newer one
+    """
+
+    def __init__(
+        self,
+        tenant_id: str,
+        owner: str,
+        duration_seconds: Optional[int] = None,
+        heartbeat_seconds: Optional[int] = None,
+        on_lost: Optional[Callable[[str], None]] = None,
+    ):
+        self.tenant_id = tenant_id
+        self.owner = owner
+        self._duration_ms = (
+            duration_seconds
+            or int(os.environ.get("LEASE_DURATION_SECONDS", DEFAULT_DURATION_SECONDS))
+        ) * 1000
+        self._heartbeat_seconds = heartbeat_seconds or int(
+            os.environ.get("LEASE_HEARTBEAT_SECONDS", DEFAULT_HEARTBEAT_SECONDS)
+        )
+        self._on_lost = on_lost
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.token: Optional[int] = None
+        self.item: Dict[str, Any] = {}
+        self.lost = False
+
+    @property
+    def key(self):
+        return dynamo.primary_key(self.tenant_id, Resource.Dynamo.keyLiterals.STACK)
+
+    @property
+    def subject(self):
+        return f"tenant {self.tenant_id}"
+
+    def acquire(self) -> int:
+        now = _now_ms()
+
+        try:
+            item = dynamo.table.update_item(
+                Key=self.key,
+                UpdateExpression="SET leaseOwner = :owner, leaseExpiresAt = :expiresAt ADD fencingToken :one",
+                ConditionExpression="attribute_not_exists(leaseOwner) OR leaseExpiresAt < :now OR leaseOwner = :owner",
+                ExpressionAttributeValues={
+                    ":owner": self.owner,
+                    ":expiresAt": now + self._duration_ms,
+                    ":now": now,
+                    ":one": 1,
+                },
+                ReturnValues="ALL_NEW",
+                ReturnValuesOnConditionCheckFailure="ALL_OLD",
+            )["Attributes"]
+        except dynamo.ConditionalCheckFailedException as e:
+            owner = e.response.get("Item", {}).get("leaseOwner", {}).get("S")
+            raise LeaseHeldError(
+                f"Stack of {self.subject} is leased by another operation ({owner}).",
+                owner=owner,
+            )
+
+        self.token = int(item["fencingToken"])
+        self.item = item
+        self.lost = False
+
+        return self.token
+
+    def renew(self):
+        try:
+            dynamo.table.update_item(
+                Key=self.key,
+                UpdateExpression="SET leaseExpiresAt = :expiresAt",
+                ConditionExpression="leaseOwner = :owner AND fencingToken = :token",
+                ExpressionAttributeValues={
+                    ":owner": self.owner,
+                    ":token": self.token,
+                    ":expiresAt": _now_ms() + self._duration_ms,
+                },
+            )
+        except dynamo.ConditionalCheckFailedException:
+            self.lost = True
+            raise LeaseLostError(
+                f"Lease on the stack of {self.subject} (token {self.token}) was taken over."
+            )
+
+    def release(self):
+        try:
+            dynamo.table.update_item(
+                Key=self.key,
+                UpdateExpression="REMOVE leaseOwner, leaseExpiresAt",
+                ConditionExpression="leaseOwner = :owner AND fencingToken = :token",
+                ExpressionAttributeValues={":owner": self.owner, ":token": self.token},
+            )
+        except dynamo.ConditionalCheckFailedException:
+            # Already taken over, nothing to release
+            pass
+
+    def put_item(self, item: Dict[str, Any]):
+        """Puts an item carrying this lease's fencing token, unless a newer owner's is already there."""
+        try:
+            dynamo.table.put_item(
+                Item={**item, "fencingToken": self.token},
+                ConditionExpression="attribute_not_exists(fencingToken) OR fencingToken <= :token",
+                ExpressionAttributeValues={":token": self.token},
+            )
+        except dynamo.ConditionalCheckFailedException:
+            raise LeaseLostError(
+                f"A newer operation on the stack of {self.subject} already wrote its result."
+            )
+
+    def delete_item(self, key: Dict[str, Any]):
+        try:
+            dynamo.table.delete_item(
+                Key=key,
+                ConditionExpression="attribute_not_exists(fencingToken) OR fencingToken <= :token",
+                ExpressionAttributeValues={":token": self.token},
+            )
+        except dynamo.ConditionalCheckFailedException:
+            raise LeaseLostError(
+                f"A newer operation on the stack of {self.subject} already wrote its result."
+            )
+
+    def __enter__(self):
+        self.acquire()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._heartbeat, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        self.release()
+
+    def _heartbeat(self):
+        while not self._stop.wait(self._heartbeat_seconds):
+            try:
+                self.renew()
+            except LeaseLostError as e:
+                if self._on_lost is not None:
+                    self._on_lost(str(e))
+                return
+            except Exception:
+                # Transient errors are retried on the next beat, the lease outlives a few of them
+                continue
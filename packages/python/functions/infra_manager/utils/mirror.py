@@ -0,0 +1,298 @@
+from datetime import datetime, timezone
+import getpass
+import hashlib
+import json
+import os
+from pathlib import Path
+import shutil
+import socket
+from typing import List, Optional, Set
+import uuid
+
+from botocore.exceptions import ClientError
+
+from utils.recovery import (
+    LOCK_OWNER,
+    StackLock,
+    list_locks,
+    lock_prefix,
+    stale_locks,
+)
+
+
+DEFAULT_ROOT = "/tmp/pulumi_state"
+CHECKPOINT_SUFFIXES = (".json.gz", ".json")
+
+
+class StateConflictError(Exception):
+    pass
+
+
+def is_enabled():
+    return os.environ.get("PULUMI_STATE_MIRROR", "").lower() in ("1", "true")
+
+
+def _md5(path: Path):
+    return hashlib.md5(path.read_bytes()).hexdigest() if path.exists() else None
+
+
+class StateMirror:
+    """
+    Mirrors a stack's state from the S3 backend into a local file:// backend, so the engine
+    persists its checkpoint to local storage on every step instead of to S3:
+    - On open, the stack is locked in S3 like the engine would, and the local checkpoint is
+      validated against the remote one's ETag and only downloaded if it's out of date
+    - On close, the checkpoint (and any new history) is uploaded once, conditioned on the
+      ETag it was validated against, so a concurrent writer fails the upload instead of
+      being overwritten, and the S3 lock is released
+    A read only mirror neither locks nor uploads, i.e. for previews.
+    """
+
+    def __init__(
+        self,
+        s3,
+        bucket: str,
+        project_name: str,
+        stack_name: str,
+        read_only: bool = False,
+        root: Optional[str] = None,
+    ):
+        self._s3 = s3
+        self._bucket = bucket
+        self.project_name = project_name
+        self.stack_name = stack_name
+        self.read_only = read_only
+        self.local_root = (
+            Path(root or os.environ.get("PULUMI_STATE_MIRROR_DIR", DEFAULT_ROOT))
+            / project_name
+        )
+        self.released_locks: List[StackLock] = []
+        self._lock_key: Optional[str] = None
+        self._remote_key: Optional[str] = None
+        self._etag: Optional[str] = None
+        self._pulled_md5: Optional[str] = None
+        self._history: Set[Path] = set()
+
+    @property
+    def backend_url(self):
+        return f"file://{self.local_root}"
+
+    # Paths relative to the backend root, which is s3://{bucket}/{project_name} remotely
+    @property
+    def _checkpoint(self):
+        return f".pulumi/stacks/organization/{self.project_name}/{self.stack_name}"
+
+    @property
+    def _history_dir(self):
+        return f".pulumi/history/organization/{self.project_name}/{self.stack_name}"
+
+    @property
+    def _etag_file(self):
+        # Outside of .pulumi, so the backend doesn't mistake it for state
+        return self.local_root / "etags" / self.stack_name
+
+    def _remote(self, relative: str):
+        return f"{self.project_name}/{relative}"
+
+    def _local_checkpoint(self) -> Optional[Path]:
+        return next(
+            (
+                self.local_root / f"{self._checkpoint}{suffix}"
+                for suffix in CHECKPOINT_SUFFIXES
+                if (self.local_root / f"{self._checkpoint}{suffix}").exists()
+            ),
+            None,
+        )
+
+    def open(self):
+        if not self.read_only:
+            self._lock()
+        try:
+            self._pull()
+        except Exception:
+            self._unlock()
+            raise
+
+        self._history = set((self.local_root / self._history_dir).glob("*"))
+        return self
+
+    def close(self):
+        try:
+            if not self.read_only:
+                self._push()
+        finally:
+            self._unlock()
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *_):
+        # The checkpoint is pushed even if the operation failed, it's the only record of
+        # what the operation changed before failing.
+        self.close()
+
+    def _lock(self):
+        locks = list_locks(
+            self._s3,
+            bucket=self._bucket,
+            project_name=self.project_name,
+            stack_name=self.stack_name,
+        )
+        # Raises if any lock has a live owner
+        self.released_locks = stale_locks(self.stack_name, locks)
+        if self.released_locks:
+            self._s3.delete_objects(
+                Bucket=self._bucket,
+                Delete={"Objects": [{"Key": lock.key} for lock in self.released_locks]},
+            )
+
+        # The local backend only locks the mirror, so lock the stack in S3 the same way
+        # the engine does, for anyone operating on the S3 backend directly.
+        self._lock_key = (
+            f"{lock_prefix(self.project_name, self.stack_name)}{uuid.uuid4()}.json"
+        )
+        self._s3.put_object(
+            Bucket=self._bucket,
+            Key=self._lock_key,
+            Body=json.dumps(
+                {
+                    "pid": os.getpid(),
+                    "username": getpass.getuser(),
+                    "hostname": socket.gethostname(),
+                    "owner": LOCK_OWNER,
+                    "timestamp": datetime.now(timezone.utc).isoformat(),
+                }
+            ).encode(),
+        )
+
+        # We hold the S3 lock (and the tenant's lease), so a local lock can only be left
+        # over from an operation that crashed in this sandbox.
+        shutil.rmtree(
+            self.local_root
+            / f".pulumi/locks/organization/{self.project_name}/{self.stack_name}",
+            ignore_errors=True,
+        )
+
+    def _unlock(self):
+        if self._lock_key is not None:
+            self._s3.delete_object(Bucket=self._bucket, Key=self._lock_key)
+            self._lock_key = None
+
+    def _head(self, relative: str):
+        try:
+            return self._s3.head_object(Bucket=self._bucket, Key=self._remote(relative))
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    def _pull(self):
+        meta = self.local_root / ".pulumi/meta.yaml"
+        if not meta.exists() and self._head(".pulumi/meta.yaml") is not None:
+            # Keeps the local backend on the remote's (project scoped) layout
+            meta.parent.mkdir(parents=True, exist_ok=True)
+            self._s3.download_file(
+                self._bucket, self._remote(".pulumi/meta.yaml"), str(meta)
+            )
+
+        self._remote_key, self._etag = None, None
+        for suffix in CHECKPOINT_SUFFIXES:
+            head = self._head(f"{self._checkpoint}{suffix}")
+            if head is not None:
+                self._remote_key, self._etag = (
+                    f"{self._checkpoint}{suffix}",
+                    head["ETag"],
+                )
+                break
+
+        cached = self._etag_file.read_text() if self._etag_file.exists() else None
+        local = self._local_checkpoint()
+        if (
+            self._remote_key is not None
+            and local is not None
+            and local.relative_to(self.local_root).as_posix() == self._remote_key
+            and cached == f"{self._remote_key} {self._etag}"
+        ):
+            self._pulled_md5 = _md5(local)
+            return
+
+        for suffix in CHECKPOINT_SUFFIXES:
+            (self.local_root / f"{self._checkpoint}{suffix}").unlink(missing_ok=True)
+        self._etag_file.unlink(missing_ok=True)
+        self._pulled_md5 = None
+
+        if self._remote_key is not None:
+            path = self.local_root / self._remote_key
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._s3.download_file(
+                self._bucket, self._remote(self._remote_key), str(path)
+            )
+            self._etag_file.parent.mkdir(parents=True, exist_ok=True)
+            self._etag_file.write_text(f"{self._remote_key} {self._etag}")
+            self._pulled_md5 = _md5(path)
+
+    def _push(self):
+        local = self._local_checkpoint()
+
+        try:
+            if local is None:
+                # i.e. the stack was removed
+                if self._remote_key is not None:
+                    self._s3.delete_object(
+                        Bucket=self._bucket,
+                        Key=self._remote(self._remote_key),
+                        IfMatch=self._etag,
+                    )
+                self._etag_file.unlink(missing_ok=True)
+                return
+
+            key = local.relative_to(self.local_root).as_posix()
+            if key == self._remote_key and _md5(local) == self._pulled_md5:
+                return
+
+            # A checkpoint under another key (i.e. rewritten gzipped) is a new object, the
+            # one it replaces is deleted once it's written
+            etag = self._s3.put_object(
+                Bucket=self._bucket,
+                Key=self._remote(key),
+                Body=local.read_bytes(),
+                **(
+                    {"IfMatch": self._etag}
+                    if key == self._remote_key
+                    else {"IfNoneMatch": "*"}
+                ),
+            )["ETag"]
+            if self._remote_key is not None and self._remote_key != key:
+                self._s3.delete_object(
+                    Bucket=self._bucket,
+                    Key=self._remote(self._remote_key),
+                    IfMatch=self._etag,
+                )
+        except ClientError as e:
+            # A conditional write or delete fails with 404 when its object is gone
+            if e.response["Error"]["Code"] in (
+                "PreconditionFailed",
+                "412",
+                "NoSuchKey",
+                "404",
+            ):
+                # Leave the local copy to be replaced by the remote one on the next pull
+                self._etag_file.unlink(missing_ok=True)
+                raise StateConflictError(
+                    f"State of stack {self.stack_name} was changed in S3 while it was being operated on."
+                ) from e
+            raise
+
+        self._remote_key, self._etag = key, etag
+        self._etag_file.parent.mkdir(parents=True, exist_ok=True)
+        self._etag_file.write_text(f"{key} {etag}")
+        self._pulled_md5 = _md5(local)
+
+        for path in sorted(
+            set((self.local_root / self._history_dir).glob("*")) - self._history
+        ):
+            self._s3.upload_file(
+                str(path),
+                self._bucket,
+                self._remote(path.relative_to(self.local_root).as_posix()),
+            )
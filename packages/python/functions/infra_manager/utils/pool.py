@@ -0,0 +1,295 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+import json
+import os
+from typing import Any, Callable, Dict, List, Optional
+import uuid
+
+from sst import Resource
+
+from utils import SEPARATOR, dynamo
+from utils.cloudflare import Cloudflare
+
+
+DEFAULT_SIZE = 0
+# Candidates read per claim attempt, so concurrent claims don't all race for the first set
+CLAIM_CANDIDATES = 10
+TAG = "pd:warmPool"
+
+# Resource names of the program's pooled resources, which pooled queues are named after
+# like the engine would auto-name them
+DEAD_LETTER_QUEUE_NAME = "PapercutMfInvoicesProcessorDeadLetterQueue"
+QUEUE_NAME = "PapercutMfInvoicesProcessorQueue"
+QUEUE_MAX_RECEIVE_COUNT = 3
+# The program's default, tenants processing invoices with another one (or with high
+# throughput fifo) can't adopt a set
+QUEUE_VISIBILITY_TIMEOUT_SECONDS = 30
+
+
+def size_from_env() -> int:
+    return int(os.environ.get("WARM_POOL_SIZE", DEFAULT_SIZE))
+
+
+def pool_key():
+    return SEPARATOR.join(
+        [Resource.Dynamo.keyLiterals.INFRA, Resource.Dynamo.keyLiterals.POOL]
+    )
+
+
+def queue_name(url: str):
+    return url.rpartition("/")[2]
+
+
+@dataclass
+class PooledResources:
+    """
+    A set of unassigned resources, created with the same inputs the program declares them
+    with, so a tenant's first update can import them instead of creating them.
+    """
+
+    set_id: str
+    api_tunnel_id: str
+    invoices_processor_dead_letter_queue_url: str
+    invoices_processor_queue_url: str
+    created_at: str
+
+    @classmethod
+    def from_item(cls, item: Dict[str, Any]):
+        return cls(
+            set_id=item["setId"],
+            api_tunnel_id=item["apiTunnelId"],
+            invoices_processor_dead_letter_queue_url=item[
+                "invoicesProcessorDeadLetterQueueUrl"
+            ],
+            invoices_processor_queue_url=item["invoicesProcessorQueueUrl"],
+            created_at=item["createdAt"],
+        )
+
+    def to_item(self, pk: str, sk: str) -> Dict[str, Any]:
+        return {
+            Resource.Dynamo.hashKey: pk,
+            Resource.Dynamo.rangeKey: sk,
+            "setId": self.set_id,
+            "apiTunnelId": self.api_tunnel_id,
+            "invoicesProcessorDeadLetterQueueUrl": self.invoices_processor_dead_letter_queue_url,
+            "invoicesProcessorQueueUrl": self.invoices_processor_queue_url,
+            "createdAt": self.created_at,
+        }
+
+
+@dataclass
+class ReplenishReport:
+    available: int = 0
+    provisioned: List[str] = field(default_factory=list)
+    discarded: List[str] = field(default_factory=list)
+
+
+class WarmPool:
+    """
+    Keeps a number of unassigned resource sets for the resources of a tenant's first
+    deployment that are slowest to provision, tracked in Dynamo:
+    - Available sets are items of the pool's partition (INFRA#POOL), one per set
+    - A claim moves a set to the tenant's INFRA#POOL item in a single transaction, so a set
+      is claimed by exactly one tenant, and the tenant's retries claim the same set
+    - The tenant's update imports the claimed set, after which its item is deleted
+    Only resources with tenant independent names are pooled, i.e. the invoices processor
+    queues and the API tunnel. IAM roles and the worker domain are named after the tenant.
+    """
+
+    def __init__(self, sqs, cloudflare: Cloudflare):
+        self._sqs = sqs
+        self._cloudflare = cloudflare
+
+    def available(self) -> List[PooledResources]:
+        items: List[Dict[str, Any]] = []
+        kwargs: Dict[str, Any] = {}
+        while True:
+            response = dynamo.table.query(
+                KeyConditionExpression="#pk = :pk",
+                ExpressionAttributeNames={"#pk": Resource.Dynamo.hashKey},
+                ExpressionAttributeValues={":pk": pool_key()},
+                ConsistentRead=True,
+                **kwargs,
+            )
+            items.extend(response["Items"])
+            if "LastEvaluatedKey" not in response:
+                break
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+        return sorted(
+            (PooledResources.from_item(item) for item in items),
+            key=lambda resources: resources.created_at,
+        )
+
+    def provision(self) -> PooledResources:
+        set_id = uuid.uuid4().hex
+        suffix = set_id[:7]
+        tags = {TAG: set_id}
+
+        tunnel_id = self._cloudflare.request(
+            resource=f"/accounts/{self._cloudflare.account_id}/cfd_tunnel",
+            method="POST",
+            json={"name": "", "config_src": "cloudflare"},
+        ).result["id"]
+        resources = PooledResources(
+            set_id=set_id,
+            api_tunnel_id=tunnel_id,
+            invoices_processor_dead_letter_queue_url="",
+            invoices_processor_queue_url="",
+            created_at=datetime.now(timezone.utc).isoformat(),
+        )
+
+        try:
+            resources.invoices_processor_dead_letter_queue_url = self._sqs.create_queue(
+                QueueName=f"{DEAD_LETTER_QUEUE_NAME}-{suffix}.fifo",
+                Attributes={"FifoQueue": "true", "ContentBasedDeduplication": "true"},
+                tags=tags,
+            )["QueueUrl"]
+            dead_letter_queue_arn = self._sqs.get_queue_attributes(
+                QueueUrl=resources.invoices_processor_dead_letter_queue_url,
+                AttributeNames=["QueueArn"],
+            )["Attributes"]["QueueArn"]
+
+            resources.invoices_processor_queue_url = self._sqs.create_queue(
+                QueueName=f"{QUEUE_NAME}-{suffix}.fifo",
+                Attributes={
+                    "FifoQueue": "true",
+                    "ContentBasedDeduplication": "true",
+                    "VisibilityTimeout": str(QUEUE_VISIBILITY_TIMEOUT_SECONDS),
+                    "RedrivePolicy": json.dumps(
+                        {
+                            "deadLetterTargetArn": dead_letter_queue_arn,
+                            "maxReceiveCount": QUEUE_MAX_RECEIVE_COUNT,
+                        }
+                    ),
+                },
+                tags=tags,
+            )["QueueUrl"]
+
+            dynamo.table.put_item(
+                Item=resources.to_item(pk=pool_key(), sk=set_id),
+                ConditionExpression="attribute_not_exists(#pk)",
+                ExpressionAttributeNames={"#pk": Resource.Dynamo.hashKey},
+            )
+        except Exception:
+            # Don't leave untracked resources behind
+            self.discard(resources, untrack=False)
+            raise
+
+        return resources
+
+    def discard(self, resources: PooledResources, untrack: bool = True):
+        if untrack:
+            # Untracked first, so the set can't be claimed while it's being deleted
+            dynamo.table.delete_item(
+                Key={
+                    Resource.Dynamo.hashKey: pool_key(),
+                    Resource.Dynamo.rangeKey: resources.set_id,
+                },
+                ConditionExpression="attribute_exists(#pk)",
+                ExpressionAttributeNames={"#pk": Resource.Dynamo.hashKey},
+            )
+
+        for url in (
+            resources.invoices_processor_queue_url,
+            resources.invoices_processor_dead_letter_queue_url,
+        ):
+            if url:
+                self._sqs.delete_queue(QueueUrl=url)
+        self._cloudflare.request(
+            resource=f"/accounts/{self._cloudflare.account_id}/cfd_tunnel/{resources.api_tunnel_id}",
+            method="DELETE",
+        )
+
+    def replenish(
+        self, size: int, has_time: Optional[Callable[[], bool]] = None
+    ) -> ReplenishReport:
+        """
+        Provisions sets until `size` are available (while `has_time()`), or discards the
+        oldest ones beyond it.
+        """
+        available = self.available()
+        report = ReplenishReport()
+
+        for resources in available[: max(len(available) - size, 0)]:
+            try:
+                self.discard(resources)
+            except dynamo.ConditionalCheckFailedException:
+                # Claimed in the meantime
+                continue
+            report.discarded.append(resources.set_id)
+
+        for _ in range(size - len(available)):
+            if has_time is not None and not has_time():
+                break
+            report.provisioned.append(self.provision().set_id)
+
+        report.available = (
+            len(available) - len(report.discarded) + len(report.provisioned)
+        )
+        return report
+
+    def claim(self, tenant_id: str, tags: Dict[str, str]) -> Optional[PooledResources]:
+        """
+        Claims a set for the tenant, or returns the one it already claimed but hasn't
+        adopted yet, tagged like the program tags the tenant's resources. None if the
+        pool is empty.
+        """
+        key = dynamo.primary_key(tenant_id, Resource.Dynamo.keyLiterals.POOL)
+
+        item = dynamo.table.get_item(Key=key, ConsistentRead=True).get("Item")
+        resources = PooledResources.from_item(item) if item is not None else None
+
+        if resources is None:
+            for candidate in self.available()[:CLAIM_CANDIDATES]:
+                try:
+                    # The table's client serializes items like the table does
+                    dynamo.table.meta.client.transact_write_items(
+                        TransactItems=[
+                            {
+                                "Delete": {
+                                    "TableName": Resource.Dynamo.name,
+                                    "Key": {
+                                        Resource.Dynamo.hashKey: pool_key(),
+                                        Resource.Dynamo.rangeKey: candidate.set_id,
+                                    },
+                                    "ConditionExpression": "attribute_exists(#pk)",
+                                    "ExpressionAttributeNames": {
+                                        "#pk": Resource.Dynamo.hashKey
+                                    },
+                                }
+                            },
+                            {
+                                "Put": {
+                                    "TableName": Resource.Dynamo.name,
+                                    "Item": candidate.to_item(
+                                        pk=key[Resource.Dynamo.hashKey],
+                                        sk=key[Resource.Dynamo.rangeKey],
+                                    ),
+                                    "ConditionExpression": "attribute_not_exists(#pk)",
+                                    "ExpressionAttributeNames": {
+                                        "#pk": Resource.Dynamo.hashKey
+                                    },
+                                }
+                            },
+                        ]
+                    )
+                except dynamo.table.meta.client.exceptions.TransactionCanceledException:
+                    # Claimed by another tenant in the meantime
+                    continue
+
+                resources = candidate
+                break
+
+        if resources is None:
+            return None
+
+        # The imported resources have to match the program's inputs, default tags included
+        for url in (
+            resources.invoices_processor_dead_letter_queue_url,
+            resources.invoices_processor_queue_url,
+        ):
+            self._sqs.tag_queue(QueueUrl=url, Tags=tags)
+            self._sqs.untag_queue(QueueUrl=url, TagKeys=[TAG])
+
+        return resources
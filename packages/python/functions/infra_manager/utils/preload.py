@@ -0,0 +1,201 @@
+from datetime import datetime, timedelta, timezone
+from functools import cache
+from importlib.metadata import version
+import os
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import boto3
+import pulumi
+from sst import Resource
+
+from provider.aws import assume_role, credentials_session
+from utils.cloudflare import Cloudflare
+from utils.realtime import Realtime
+
+
+# Resource provider plugins of the program, by the distribution of their sdk
+PLUGINS = {
+    "aws": "pulumi-aws",
+    "cloudflare": "pulumi-cloudflare",
+    "time": "pulumiverse-time",
+}
+# Assumes the role again this long before its credentials expire
+ROLE_SESSION_REFRESH_MARGIN = timedelta(minutes=5)
+
+
+def pulumi_home() -> str:
+    return os.environ.get("PULUMI_HOME") or os.path.expanduser("~/.pulumi")
+
+
+@cache
+def pulumi_command() -> pulumi.automation.PulumiCommand:
+    """
+    The pulumi cli, whose version is resolved once (by running it) rather than by every
+    stack's workspace.
+    """
+    return pulumi.automation.PulumiCommand()
+
+
+@cache
+def plugin_versions() -> Dict[str, str]:
+    return {name: f"v{version(distribution)}" for name, distribution in PLUGINS.items()}
+
+
+def missing_plugins() -> List[str]:
+    """
+    Plugins whose directory isn't in the plugin cache, or is only partially downloaded
+    (the cli marks it with a `.partial` file until the download completes).
+    """
+    missing: List[str] = []
+    for name, version_ in plugin_versions().items():
+        directory = os.path.join(
+            pulumi_home(), "plugins", f"resource-{name}-{version_}"
+        )
+        if not os.path.isdir(directory) or os.path.exists(f"{directory}.partial"):
+            missing.append(name)
+    return missing
+
+
+@cache
+def install_plugins() -> List[str]:
+    """
+    Installs the plugins missing from the plugin cache, once per container (stacks share
+    it), and returns their names.
+    """
+    missing = missing_plugins()
+    for name in missing:
+        pulumi_command().run(
+            ["plugin", "install", "resource", name, plugin_versions()[name]],
+            cwd=tempfile.gettempdir(),
+            additional_env={"PULUMI_HOME": pulumi_home()},
+        )
+    return missing
+
+
+@cache
+def stack_config() -> Dict[str, pulumi.automation.ConfigValue]:
+    """
+    The stack configuration every stack shares, set with paths (see
+    `pulumi.automation.Stack.set_all_config`).
+    """
+    return {
+        "aws:region": pulumi.automation.ConfigValue(value=Resource.Aws.region),
+        "aws:assumeRoles[0].roleArn": pulumi.automation.ConfigValue(
+            value=Resource.PulumiRole.arn
+        ),
+        "aws:assumeRoles[0].externalId": pulumi.automation.ConfigValue(
+            value=Resource.PulumiRole.externalId
+        ),
+        "cloudflare:apiToken": pulumi.automation.ConfigValue(
+            value=Resource.Cloudflare.apiToken, secret=True
+        ),
+        "cloudflareAccountId": pulumi.automation.ConfigValue(
+            value=Resource.Cloudflare.account.id
+        ),
+        "printdesk:region": pulumi.automation.ConfigValue(value=Resource.Aws.region),
+        "printdesk:roleArn": pulumi.automation.ConfigValue(
+            value=Resource.PulumiRole.arn
+        ),
+        "printdesk:externalId": pulumi.automation.ConfigValue(
+            value=Resource.PulumiRole.externalId
+        ),
+        "printdesk:cloudflareAccountId": pulumi.automation.ConfigValue(
+            value=Resource.Cloudflare.account.id
+        ),
+        "printdesk:cloudflareApiToken": pulumi.automation.ConfigValue(
+            value=Resource.Cloudflare.apiToken, secret=True
+        ),
+    }
+
+
+class RoleSession:
+    """
+    A session of the pulumi role, and clients of it, kept for the container's lifetime.
+    The role is assumed again once its credentials are about to expire.
+    """
+
+    def __init__(self, region: str, role_arn: str, external_id: str):
+        self.region = region
+        self.role_arn = role_arn
+        self.external_id = external_id
+        self._session: Optional[boto3.Session] = None
+        self._expiration: Optional[datetime] = None
+        self._clients: Dict[str, Any] = {}
+
+    def session(self) -> boto3.Session:
+        if (
+            self._session is None
+            or self._expiration is None
+            or datetime.now(timezone.utc)
+            >= self._expiration - ROLE_SESSION_REFRESH_MARGIN
+        ):
+            credentials = assume_role(self.role_arn, self.external_id)
+            self._session = credentials_session(credentials, self.region)
+            self._expiration = credentials["Expiration"]
+            self._clients = {}
+        return self._session
+
+    def client(self, service_name: str) -> Any:
+        session = self.session()
+        if service_name not in self._clients:
+            self._clients[service_name] = session.client(service_name)
+        return self._clients[service_name]
+
+
+@cache
+def role_session() -> RoleSession:
+    return RoleSession(
+        region=Resource.Aws.region,
+        role_arn=Resource.PulumiRole.arn,
+        external_id=Resource.PulumiRole.externalId,
+    )
+
+
+@cache
+def cloudflare() -> Cloudflare:
+    """A client of cloudflare's api, whose connections are reused across invocations."""
+    return Cloudflare(
+        account_id=Resource.Cloudflare.account.id,
+        api_token=Resource.Cloudflare.apiToken,
+    )
+
+
+@cache
+def realtime() -> Realtime:
+    """A publisher to the realtime api, signed as the pulumi role like the stacks' clients."""
+    return Realtime(
+        http_domain=Resource.AppsyncApi.dns.http,
+        region=Resource.Aws.region,
+        session=lambda: role_session().session(),
+    )
+
+
+def preload() -> Dict[str, float]:
+    """
+    Prepares everything tenant independent that an operation on a stack needs, so a
+    tenant's first operation in the container starts its engine right away:
+    - Resolves the pulumi cli (and its version)
+    - Installs the program's plugins missing from the plugin cache
+    - Builds the shared stack configuration
+    - Assumes the pulumi role, with the clients of it the handler uses
+    - Creates the cloudflare api client
+
+    Each stage runs once per container, stages that failed run again when called again.
+    Returns the milliseconds each stage took.
+    """
+    stages = {
+        "pulumiCommand": pulumi_command,
+        "plugins": install_plugins,
+        "stackConfig": stack_config,
+        "roleSession": lambda: role_session().client("sqs"),
+        "cloudflare": cloudflare,
+    }
+
+    timings: Dict[str, float] = {}
+    for stage, load in stages.items():
+        start = time.perf_counter()
+        load()
+        timings[stage] = round((time.perf_counter() - start) * 1000, 1)
+    return timings
@@ -0,0 +1,66 @@
+import json
+from typing import Any, Callable, Dict
+
+import boto3
+from botocore.auth import SigV4Auth
+from botocore.awsrequest import AWSRequest
+import requests
+
+
+# Publishing is best effort, it shouldn't hold up the operation it reports on
+TIMEOUT_SECONDS = 5
+
+
+class RealtimePublishError(Exception):
+    def __init__(self, message: str, failed=None):
+        super().__init__(message)
+        self.failed = failed or []
+
+
+class Realtime:
+    """
+    Publishes events to tenants' channels of the realtime api (AppSync Events), whose
+    namespaces are the tenants' ids. An event is a handler's name and input, like the
+    realtime event handlers (RealtimeEventHandlers) subscribers decode them with.
+    """
+
+    def __init__(
+        self, http_domain: str, region: str, session: Callable[[], boto3.Session]
+    ):
+        self.url = f"https://{http_domain}/event"
+        self.region = region
+        self._session = session
+        self._http = requests.Session()
+
+    def publish(self, tenant_id: str, name: str, input_: Dict[str, Any]):
+        body = json.dumps(
+            {
+                "channel": f"/{tenant_id}{name}",
+                "events": [json.dumps({"name": name, "input": input_})],
+            }
+        )
+        request = AWSRequest(
+            method="POST",
+            url=self.url,
+            data=body,
+            headers={"content-type": "application/json"},
+        )
+        SigV4Auth(
+            self._session().get_credentials().get_frozen_credentials(),
+            "appsync",
+            self.region,
+        ).add_auth(request)
+
+        response = self._http.post(
+            self.url,
+            data=body,
+            headers=dict(request.headers.items()),
+            timeout=TIMEOUT_SECONDS,
+        )
+        response.raise_for_status()
+
+        failed = response.json().get("failed") or []
+        if failed:
+            raise RealtimePublishError(
+                f"Failed to publish to channel /{tenant_id}{name}", failed=failed
+            )
@@ -0,0 +1,295 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+import json
+import os
+from typing import Any, Dict, List, Literal, Optional
+import uuid
+
+import pulumi
+
+
+FUNCTION_TIMEOUT_SECONDS = 900
+# Identifies the locks this container writes, hostnames repeat across sandboxes
+LOCK_OWNER = f"{uuid.uuid4()}:{os.getpid()}"
+
+PendingOperationsPolicy = Literal["safe", "clear", "none"]
+
+# Resource types whose create is idempotent, so a pending create without an id can be
+# dropped and safely retried by the next update.
+IDEMPOTENT_CREATE_TYPES = {
+    "aws:dynamodb/tableItem:TableItem",
+    "printdesk:index:Routes",
+    "printdesk:index:VpcServiceBinding",
+    "pulumi-python:dynamic:Resource",
+    "time:index/static:Static",
+}
+
+DYNAMIC_RESOURCE_TYPE = "pulumi-python:dynamic:Resource"
+# Resources of the printdesk provider which used to be dynamic resources, by name
+DYNAMIC_RESOURCE_NAMES = ("AssetsRoutes", "PapercutMfApiGatewayVpcServiceBinding")
+
+
+class StackRecoveryError(Exception):
+    def __init__(
+        self, message: str, operations: Optional[List["PendingOperation"]] = None
+    ):
+        super().__init__(message)
+        self.operations = operations or []
+
+
+@dataclass
+class StackLock:
+    key: str
+    pid: Optional[int]
+    hostname: Optional[str]
+    timestamp: datetime
+    owner: Optional[str] = None
+
+    def is_stale(self, now: datetime, timeout: timedelta) -> bool:
+        # A container runs one invocation at a time, so its own locks are left over from
+        # an interrupted one
+        if self.owner == LOCK_OWNER:
+            return True
+
+        # No invocation outlives the function timeout, so neither does a live lock owner
+        return now - self.timestamp > timeout
+
+
+@dataclass
+class PendingOperation:
+    urn: str
+    type_: str
+    resource_type: str
+    id_: Optional[str]
+
+    def __str__(self):
+        return f"{self.type_} {self.urn}" + (f" ({self.id_})" if self.id_ else "")
+
+
+@dataclass
+class RecoveryReport:
+    released_locks: List[StackLock] = field(default_factory=list)
+    cleared_operations: List[PendingOperation] = field(default_factory=list)
+    imported_operations: List[PendingOperation] = field(default_factory=list)
+    forgotten_resources: List[str] = field(default_factory=list)
+
+    @property
+    def repaired(self):
+        return bool(
+            self.released_locks
+            or self.cleared_operations
+            or self.imported_operations
+            or self.forgotten_resources
+        )
+
+    @property
+    def refresh_targets(self) -> List[str]:
+        return [
+            *(
+                operation.urn
+                for operation in self.cleared_operations
+                if operation.type_ not in ("creating", "importing")
+            ),
+            *(operation.urn for operation in self.imported_operations),
+        ]
+
+
+def lock_prefix(project_name: str, stack_name: str):
+    # The backend is rooted at s3://{bucket}/{project_name}, with project scoped stacks
+    return f"{project_name}/.pulumi/locks/organization/{project_name}/{stack_name}/"
+
+
+def list_locks(s3, bucket: str, project_name: str, stack_name: str) -> List[StackLock]:
+    locks: List[StackLock] = []
+
+    for page in s3.get_paginator("list_objects_v2").paginate(
+        Bucket=bucket, Prefix=lock_prefix(project_name, stack_name)
+    ):
+        for obj in page.get("Contents", []):
+            try:
+                content: Dict[str, Any] = json.loads(
+                    s3.get_object(Bucket=bucket, Key=obj["Key"])["Body"].read()
+                )
+            except s3.exceptions.NoSuchKey:
+                # Released in the meantime
+                continue
+            except json.JSONDecodeError:
+                content = {}
+
+            locks.append(
+                StackLock(
+                    key=obj["Key"],
+                    pid=content.get("pid"),
+                    hostname=content.get("hostname"),
+                    timestamp=obj["LastModified"],
+                    owner=content.get("owner"),
+                )
+            )
+
+    return locks
+
+
+def stale_locks(
+    stack_name: str, locks: List[StackLock], timeout_seconds: Optional[int] = None
+) -> List[StackLock]:
+    """Returns the stack's locks, as long as none of them has a live owner."""
+    timeout = timedelta(
+        seconds=timeout_seconds
+        or int(os.environ.get("FUNCTION_TIMEOUT_SECONDS", FUNCTION_TIMEOUT_SECONDS))
+    )
+    now = datetime.now(timezone.utc)
+
+    live = [lock for lock in locks if not lock.is_stale(now=now, timeout=timeout)]
+    if live:
+        raise StackRecoveryError(
+            f"Stack {stack_name} is locked by a live operation ({', '.join(lock.key for lock in live)})."
+        )
+
+    return locks
+
+
+def recover_stack(
+    stack: pulumi.automation.Stack,
+    s3,
+    bucket: str,
+    project_name: str,
+    policy: Optional[PendingOperationsPolicy] = None,
+    timeout_seconds: Optional[int] = None,
+    release_locks: bool = True,
+    resource_prefix: Optional[str] = None,
+) -> RecoveryReport:
+    """
+    Repairs what a crashed or timed out operation left behind before the next one starts:
+    - Stale locks (older than the function timeout, or left by this container) are released
+    - Pending operations are resolved according to the policy:
+      - "safe": pending updates, deletes and reads are cleared, pending creates with a
+        known id are imported into the state and pending creates without one are only
+        cleared for resource types whose create is idempotent
+      - "clear": all pending operations are cleared
+      - "none": pending operations are left as is
+    Any pending operation the policy can't resolve raises a StackRecoveryError.
+    Locks are left alone with `release_locks` off, i.e. when a state mirror manages them.
+    Given the resource prefix of the tenant about to be updated, the tenant's dynamic
+    resources are forgotten for the update to adopt (see `forget_dynamic_resources`).
+    """
+    policy = policy or os.environ.get("PENDING_OPERATIONS_POLICY", "safe")
+    report = RecoveryReport()
+
+    locks = (
+        list_locks(s3, bucket=bucket, project_name=project_name, stack_name=stack.name)
+        if release_locks
+        else []
+    )
+    if locks:
+        stale_locks(stack.name, locks, timeout_seconds=timeout_seconds)
+
+        # Deletes all of the stack's lock files
+        stack.cancel()
+        report.released_locks.extend(locks)
+
+    deployment = stack.export_stack()
+    state = dict(deployment.deployment or {})
+    resources: List[Dict[str, Any]] = list(state.get("resources") or [])
+    pending: List[Dict[str, Any]] = state.get("pending_operations") or []
+    if pending:
+        resources.extend(
+            resolve_pending_operations(stack.name, pending, policy, report)
+        )
+    if resource_prefix is not None:
+        resources = forget_dynamic_resources(resources, resource_prefix, report)
+
+    if not pending and not report.forgotten_resources:
+        return report
+
+    stack.import_stack(
+        pulumi.automation.Deployment(
+            version=deployment.version,
+            deployment={**state, "resources": resources, "pending_operations": []},
+        )
+    )
+
+    return report
+
+
+def resolve_pending_operations(
+    stack_name: str,
+    pending: List[Dict[str, Any]],
+    policy: PendingOperationsPolicy,
+    report: RecoveryReport,
+) -> List[Dict[str, Any]]:
+    """Resolves pending operations, returning the resources to import into the state."""
+    operations = [
+        PendingOperation(
+            urn=operation["resource"]["urn"],
+            type_=operation["type"],
+            resource_type=operation["resource"]["type"],
+            id_=operation["resource"].get("id") or None,
+        )
+        for operation in pending
+    ]
+
+    if policy == "none":
+        raise StackRecoveryError(
+            f"Stack {stack_name} has {len(operations)} pending operation(s).",
+            operations=operations,
+        )
+
+    resources: List[Dict[str, Any]] = []
+    unresolved: List[PendingOperation] = []
+    for operation, raw in zip(operations, pending):
+        if operation.type_ not in ("creating", "importing") or policy == "clear":
+            report.cleared_operations.append(operation)
+        elif operation.id_ is not None:
+            # The resource exists, so adopt it instead of creating it again
+            resources.append(raw["resource"])
+            report.imported_operations.append(operation)
+        elif operation.resource_type in IDEMPOTENT_CREATE_TYPES:
+            report.cleared_operations.append(operation)
+        else:
+            unresolved.append(operation)
+
+    if unresolved:
+        raise StackRecoveryError(
+            f"Stack {stack_name} has pending creates that can't be resolved safely: {', '.join(map(str, unresolved))}.",
+            operations=unresolved,
+        )
+
+    return resources
+
+
+def forget_dynamic_resources(
+    resources: List[Dict[str, Any]], resource_prefix: str, report: RecoveryReport
+) -> List[Dict[str, Any]]:
+    """
+    Removes the dynamic resources the printdesk provider's resources used to be (of the
+    tenant with the resource prefix) from the state, without deleting them. Their creates
+    are idempotent, so the next update adopts them under their new type, rather than
+    replacing them (which deletes the route or binding until the new one is created).
+    """
+    names = {f"{resource_prefix}{name}" for name in DYNAMIC_RESOURCE_NAMES}
+    forgotten = {
+        resource["urn"]
+        for resource in resources
+        if resource["type"] == DYNAMIC_RESOURCE_TYPE
+        and resource["urn"].rpartition("::")[2] in names
+    }
+    if not forgotten:
+        return resources
+
+    report.forgotten_resources.extend(sorted(forgotten))
+    return [
+        {
+            **resource,
+            "dependencies": [
+                urn
+                for urn in resource.get("dependencies") or []
+                if urn not in forgotten
+            ],
+            "propertyDependencies": {
+                key: [urn for urn in urns if urn not in forgotten]
+                for key, urns in (resource.get("propertyDependencies") or {}).items()
+            },
+        }
+        for resource in resources
+        if resource["urn"] not in forgotten
+    ]
@@ -0,0 +1,120 @@
+from collections import defaultdict
+from dataclasses import dataclass
+import os
+import re
+from typing import Dict, List, Optional
+
+
+DEFAULT_KEEP = 10
+DELETE_BATCH_SIZE = 1_000
+
+# i.e. {stack}-{unix nanos}.history.json or {stack}.{unix nanos}.json, optionally gzipped
+TIMESTAMP_PATTERN = re.compile(r"[-.](\d{10,})\.")
+
+
+@dataclass
+class RetentionReport:
+    kept: int = 0
+    deleted_objects: int = 0
+    bytes_reclaimed: int = 0
+
+    def __add__(self, other: "RetentionReport"):
+        return RetentionReport(
+            kept=self.kept + other.kept,
+            deleted_objects=self.deleted_objects + other.deleted_objects,
+            bytes_reclaimed=self.bytes_reclaimed + other.bytes_reclaimed,
+        )
+
+
+def history_prefix(project_name: str):
+    # The backend is rooted at s3://{bucket}/{project_name}, with project scoped stacks
+    return f"{project_name}/.pulumi/history/organization/{project_name}/"
+
+
+def backups_prefix(project_name: str):
+    return f"{project_name}/.pulumi/backups/organization/{project_name}/"
+
+
+def keep_from_env() -> int:
+    return int(os.environ.get("STATE_HISTORY_RETENTION", DEFAULT_KEEP))
+
+
+def list_versions(
+    s3, bucket: str, prefix: str, stack_name: Optional[str] = None
+) -> Dict[str, Dict[str, List[dict]]]:
+    """
+    Lists the objects under a history or backups prefix in a single pass, grouped by stack
+    and then by version (the timestamp an update wrote them at, e.g. a history entry and
+    its checkpoint share one).
+    """
+    stacks: Dict[str, Dict[str, List[dict]]] = defaultdict(lambda: defaultdict(list))
+
+    for page in s3.get_paginator("list_objects_v2").paginate(
+        Bucket=bucket,
+        Prefix=prefix + (f"{stack_name}/" if stack_name is not None else ""),
+    ):
+        for obj in page.get("Contents", []):
+            name, _, filename = obj["Key"][len(prefix) :].rpartition("/")
+            match = TIMESTAMP_PATTERN.search(filename)
+            if not name or match is None:
+                continue
+
+            stacks[name][match.group(1)].append(obj)
+
+    return stacks
+
+
+def prune_versions(
+    s3, bucket: str, versions: Dict[str, List[dict]], keep: int
+) -> RetentionReport:
+    """Deletes all but the newest `keep` versions."""
+    expired = sorted(versions, key=int, reverse=True)[keep:]
+    objects = [obj for version in expired for obj in versions[version]]
+
+    for start in range(0, len(objects), DELETE_BATCH_SIZE):
+        batch = objects[start : start + DELETE_BATCH_SIZE]
+        response = s3.delete_objects(
+            Bucket=bucket,
+            Delete={"Objects": [{"Key": obj["Key"]} for obj in batch], "Quiet": True},
+        )
+        if response.get("Errors"):
+            raise RuntimeError(
+                f"Failed to delete {len(response['Errors'])} object(s), i.e. {response['Errors'][0]['Key']}: {response['Errors'][0]['Message']}"
+            )
+
+    return RetentionReport(
+        kept=len(versions) - len(expired),
+        deleted_objects=len(objects),
+        bytes_reclaimed=sum(obj["Size"] for obj in objects),
+    )
+
+
+def prune_stack(
+    s3, bucket: str, project_name: str, stack_name: str, keep: Optional[int] = None
+) -> RetentionReport:
+    """Keeps the last `keep` history entries and backups of a stack."""
+    keep = keep if keep is not None else keep_from_env()
+    report = RetentionReport()
+
+    for prefix in (history_prefix(project_name), backups_prefix(project_name)):
+        versions = list_versions(s3, bucket, prefix, stack_name).get(stack_name, {})
+        report += prune_versions(s3, bucket, versions, keep)
+
+    return report
+
+
+def prune_project(
+    s3, bucket: str, project_name: str, keep: Optional[int] = None
+) -> Dict[str, RetentionReport]:
+    """
+    Keeps the last `keep` history entries and backups of every stack in the project,
+    listing each prefix once rather than once per stack.
+    """
+    keep = keep if keep is not None else keep_from_env()
+    reports: Dict[str, RetentionReport] = defaultdict(RetentionReport)
+
+    for prefix in (history_prefix(project_name), backups_prefix(project_name)):
+        for stack_name, versions in list_versions(s3, bucket, prefix).items():
+            reports[stack_name] += prune_versions(s3, bucket, versions, keep)
+
+    return dict(reports)
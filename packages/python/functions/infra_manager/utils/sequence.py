@@ -0,0 +1,69 @@
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from utils import dynamo
+from utils.lease import Lease, LeaseLostError
+
+
+# Stream sequence numbers are up to 40 digits, more than a dynamo number can hold, so they
+# are stored zero padded as strings which then compare in numeric order.
+SEQUENCE_NUMBER_LENGTH = 40
+
+
+def pad(sequence_number: str):
+    return sequence_number.zfill(SEQUENCE_NUMBER_LENGTH)
+
+
+@dataclass
+class AppliedRecord:
+    sequence_number: Optional[str]
+    deployment_id: Optional[str]
+
+    @classmethod
+    def from_item(cls, item: Dict[str, Any]):
+        return cls(
+            sequence_number=item.get("appliedSequenceNumber"),
+            deployment_id=item.get("appliedDeploymentId"),
+        )
+
+
+def skip_reason(
+    sequence_number: str,
+    deployment_id: str,
+    is_destroy: bool,
+    applied: AppliedRecord,
+) -> Optional[str]:
+    """
+    Returns why a stream record must not be applied, if it must not:
+    - Its sequence number isn't newer than the last applied one, i.e. a retry or split
+      delivered it after a newer record was already applied
+    - Its deployment was already applied (destroys always apply, they carry the old image)
+    """
+    if applied.sequence_number is not None and pad(sequence_number) <= pad(
+        applied.sequence_number
+    ):
+        return f"sequence number {sequence_number} isn't newer than the last applied {applied.sequence_number.lstrip('0')}"
+
+    if not is_destroy and deployment_id == applied.deployment_id:
+        return f"deployment {deployment_id} was already applied"
+
+    return None
+
+
+def record_applied(lease: Lease, sequence_number: str, deployment_id: str):
+    """Advances the tenant's applied record, as long as the lease is still held."""
+    try:
+        dynamo.table.update_item(
+            Key=lease.key,
+            UpdateExpression="SET appliedSequenceNumber = :sequenceNumber, appliedDeploymentId = :deploymentId",
+            ConditionExpression="fencingToken = :token AND (attribute_not_exists(appliedSequenceNumber) OR appliedSequenceNumber < :sequenceNumber)",
+            ExpressionAttributeValues={
+                ":token": lease.token,
+                ":sequenceNumber": pad(sequence_number),
+                ":deploymentId": deployment_id,
+            },
+        )
+    except dynamo.ConditionalCheckFailedException:
+        raise LeaseLostError(
+            f"A newer operation on the stack of tenant {lease.tenant_id} already applied a newer record."
+        )
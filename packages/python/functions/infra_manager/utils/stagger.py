@@ -0,0 +1,246 @@
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+import math
+from typing import Any, Dict, List, Optional, Set
+
+from pyawscron import AWSCron
+from sst import Resource
+
+from models import Input, PapercutMfEnabledConfig
+from models.config import load_timezone
+from utils import SEPARATOR, dynamo
+
+
+DEFAULT_MAX_PER_MINUTE = 10
+DEFAULT_HORIZON = timedelta(days=7)
+# EventBridge Scheduler's limit of a flexible time window
+MAX_WINDOW_MINUTES = 1440
+
+
+def sync_key():
+    return SEPARATOR.join(
+        [Resource.Dynamo.keyLiterals.INFRA, Resource.Dynamo.keyLiterals.SYNC]
+    )
+
+
+@dataclass(frozen=True)
+class Slot:
+    """The tenants whose sync schedule fires at the same times."""
+
+    cron_expression: str
+    timezone: str
+
+    @classmethod
+    def of(cls, config: PapercutMfEnabledConfig):
+        return cls(
+            cron_expression=config.sync.cron_expression, timezone=config.sync.timezone
+        )
+
+    @property
+    def key(self):
+        return SEPARATOR.join([self.cron_expression, self.timezone])
+
+
+def fire_times(slot: Slot, start: datetime, end: datetime) -> List[datetime]:
+    """The slot's fire times between start and end (UTC)."""
+    zone = load_timezone(slot.timezone)
+    # pyawscron only evaluates expressions in UTC, so it's given the slot's wall clock as if
+    # it was UTC (DST transitions are approximated)
+    wall_times = AWSCron.get_all_schedule_bw_dates(
+        start.astimezone(zone).replace(tzinfo=timezone.utc),
+        end.astimezone(zone).replace(tzinfo=timezone.utc),
+        slot.cron_expression,
+    )
+    return [
+        wall_time.replace(tzinfo=zone).astimezone(timezone.utc)
+        for wall_time in wall_times
+    ]
+
+
+@dataclass
+class SlotPlan:
+    """
+    The flexible time window a slot's schedules are given, EventBridge Scheduler invokes
+    each within its window after the fire time so the slot's tenants are spread over it.
+    """
+
+    slot: Slot
+    tenants: int
+    window_minutes: int = 1
+    planned_at: Optional[str] = None
+    # Minutes since the planning horizon's start the slot fires at, not persisted
+    fire_minutes: List[int] = field(default_factory=list, repr=False, compare=False)
+
+    @classmethod
+    def from_item(cls, item: Dict[str, Any]):
+        return cls(
+            slot=Slot(
+                cron_expression=item["cronExpression"], timezone=item["timezone"]
+            ),
+            tenants=int(item["tenants"]),
+            window_minutes=int(item["windowMinutes"]),
+            planned_at=item.get("plannedAt"),
+        )
+
+    def to_item(self) -> Dict[str, Any]:
+        return {
+            Resource.Dynamo.hashKey: sync_key(),
+            Resource.Dynamo.rangeKey: self.slot.key,
+            "cronExpression": self.slot.cron_expression,
+            "timezone": self.slot.timezone,
+            "tenants": self.tenants,
+            "windowMinutes": self.window_minutes,
+            "plannedAt": self.planned_at,
+        }
+
+
+def plan(
+    slots: Counter,
+    start: datetime,
+    max_per_minute: int = DEFAULT_MAX_PER_MINUTE,
+    horizon: timedelta = DEFAULT_HORIZON,
+) -> List[SlotPlan]:
+    """
+    Plans a window for each slot (mapped to its number of tenants) from the fleet's fire
+    times over the horizon:
+    - The busiest minute a slot fires at, across all slots firing then, is spread over as
+      many minutes as it takes to stay within `max_per_minute` invocations
+    - A window never reaches the slot's next fire time, or EventBridge Scheduler's limit
+    - Slots which don't collide keep a window of a minute, i.e. no flexible window
+    """
+    planned_at = start.isoformat()
+    plans = [
+        SlotPlan(
+            slot=slot,
+            tenants=tenants,
+            planned_at=planned_at,
+            fire_minutes=[
+                int((fire_time - start).total_seconds() // 60)
+                for fire_time in fire_times(slot, start, start + horizon)
+            ],
+        )
+        for slot, tenants in sorted(slots.items(), key=lambda item: item[0].key)
+    ]
+
+    load: Dict[int, int] = defaultdict(int)
+    for slot_plan in plans:
+        for minute in slot_plan.fire_minutes:
+            load[minute] += slot_plan.tenants
+
+    for slot_plan in plans:
+        if not slot_plan.fire_minutes:
+            continue
+
+        peak = max(load[minute] for minute in slot_plan.fire_minutes)
+        gap = min(
+            (
+                later - earlier
+                for earlier, later in zip(
+                    slot_plan.fire_minutes, slot_plan.fire_minutes[1:]
+                )
+            ),
+            default=MAX_WINDOW_MINUTES,
+        )
+        slot_plan.window_minutes = max(
+            1, min(math.ceil(peak / max_per_minute), gap, MAX_WINDOW_MINUTES)
+        )
+
+    return plans
+
+
+@dataclass
+class Peak:
+    # Expected invocations started in the busiest minute
+    invocations: float = 0.0
+    at: Optional[datetime] = None
+
+
+def peak(plans: List[SlotPlan], start: datetime, staggered: bool = True) -> Peak:
+    """
+    The busiest minute of the planned slots, with each tenant's invocation expected
+    uniformly within its slot's window (or at the fire time, unless staggered).
+    """
+    load: Dict[int, float] = defaultdict(float)
+    for slot_plan in plans:
+        window = slot_plan.window_minutes if staggered else 1
+        for minute in slot_plan.fire_minutes:
+            for offset in range(window):
+                load[minute + offset] += slot_plan.tenants / window
+
+    if not load:
+        return Peak()
+
+    minute, invocations = max(load.items(), key=lambda item: (item[1], -item[0]))
+    return Peak(invocations=invocations, at=start + timedelta(minutes=minute))
+
+
+def planned() -> Dict[str, SlotPlan]:
+    """The saved plan, by slot key."""
+    plans: Dict[str, SlotPlan] = {}
+    kwargs: Dict[str, Any] = {}
+    while True:
+        response = dynamo.table.query(
+            KeyConditionExpression="#pk = :pk",
+            ExpressionAttributeNames={"#pk": Resource.Dynamo.hashKey},
+            ExpressionAttributeValues={":pk": sync_key()},
+            **kwargs,
+        )
+        for item in response["Items"]:
+            slot_plan = SlotPlan.from_item(item)
+            plans[slot_plan.slot.key] = slot_plan
+
+        if "LastEvaluatedKey" not in response:
+            return plans
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def save(plans: List[SlotPlan]) -> Set[Slot]:
+    """Saves the plan, replacing the saved one, and returns the slots whose window changed."""
+    saved = planned()
+    changed = {
+        slot_plan.slot
+        for slot_plan in plans
+        if slot_plan.window_minutes
+        != (
+            saved[slot_plan.slot.key].window_minutes
+            if slot_plan.slot.key in saved
+            else 1
+        )
+    }
+
+    keys = {slot_plan.slot.key for slot_plan in plans}
+    with dynamo.table.batch_writer() as batch:
+        for slot_plan in plans:
+            batch.put_item(Item=slot_plan.to_item())
+        for key in saved.keys() - keys:
+            batch.delete_item(
+                Key={Resource.Dynamo.hashKey: sync_key(), Resource.Dynamo.rangeKey: key}
+            )
+
+    return changed
+
+
+def planned_window(slot: Slot) -> int:
+    """The planned window of the slot's schedules, a minute unless it was given one."""
+    item = dynamo.table.get_item(
+        Key={Resource.Dynamo.hashKey: sync_key(), Resource.Dynamo.rangeKey: slot.key}
+    ).get("Item")
+    return int(item["windowMinutes"]) if item is not None else 1
+
+
+def planned_windows(inputs: Dict[str, Input]) -> Dict[str, int]:
+    """The planned windows of the tenants' sync schedules, of those given one, by tenant."""
+    slots = {
+        tenant_id: Slot.of(_input.papercut_mf_config)
+        for tenant_id, _input in inputs.items()
+        if _input.papercut_mf_config.enabled
+    }
+
+    windows = {slot: planned_window(slot) for slot in set(slots.values())}
+
+    return {
+        tenant_id: windows[slot]
+        for tenant_id, slot in slots.items()
+        if windows[slot] > 1
+    }
@@ -13,13 +13,18 @@ import { tenantTemplate } from "../../utils";
 import type { FromTemporaryCredentialsOptions } from "@aws-sdk/credential-providers";
 
 export const appconfigCredentialIdentityProviderLayer = Effect.gen(function* () {
-  const roleArnTemplate = yield* SstResource.useSync(
-    (resource) => resource.AppconfigRoleTemplate.pipe(Redacted.value).arn,
+  const roleTemplate = yield* SstResource.useSync(
+    (resource) => resource.AppconfigRoleTemplate.pipe(Redacted.value),
   );
 
   return yield* Actor.use(Struct.get("tenantId")).pipe(
-    Effect.map(tenantTemplate(roleArnTemplate)),
-    Effect.map((RoleArn) => ({ RoleArn, RoleSessionName: "Appconfig" })),
+    Effect.map((tenantId) => ({
+      RoleArn: tenantTemplate(tenantId, roleTemplate.arn),
+      RoleSessionName: "Appconfig",
+      // Scopes the session to the tenant, which roles shared by every tenant rely on. Per-tenant
+      // roles only trust sts:AssumeRole, so their sessions aren't tagged.
+      ...(roleTemplate.shared ? { Tags: [{ Key: "pd:tenantId", Value: tenantId }] } : {}),
+    })),
     Effect.satisfiesSuccessType<FromTemporaryCredentialsOptions["params"]>(),
     Effect.map((params) =>
       AwsCredentialIdentityProvider.providerLayer(() => fromTemporaryCredentials({ params })),
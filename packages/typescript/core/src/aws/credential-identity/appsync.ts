@@ -13,13 +13,18 @@ import { tenantTemplate } from "../../utils";
 import type { FromTemporaryCredentialsOptions } from "@aws-sdk/credential-providers";
 
 export const appsyncPublisherCredentialIdentityProviderLayer = Effect.gen(function* () {
-  const roleArnTemplate = yield* SstResource.useSync(
-    (resource) => resource.AppsyncChannelNamespacePublisherRoleTemplate.pipe(Redacted.value).arn,
+  const roleTemplate = yield* SstResource.useSync(
+    (resource) => resource.AppsyncChannelNamespacePublisherRoleTemplate.pipe(Redacted.value),
   );
 
   return yield* Actor.use(Struct.get("tenantId")).pipe(
-    Effect.map(tenantTemplate(roleArnTemplate)),
-    Effect.map((RoleArn) => ({ RoleArn, RoleSessionName: "AppsyncPublisher" })),
+    Effect.map((tenantId) => ({
+      RoleArn: tenantTemplate(tenantId, roleTemplate.arn),
+      RoleSessionName: "AppsyncPublisher",
+      // Scopes the session to the tenant, which roles shared by every tenant rely on. Per-tenant
+      // roles only trust sts:AssumeRole, so their sessions aren't tagged.
+      ...(roleTemplate.shared ? { Tags: [{ Key: "pd:tenantId", Value: tenantId }] } : {}),
+    })),
     Effect.satisfiesSuccessType<FromTemporaryCredentialsOptions["params"]>(),
     Effect.map((params) =>
       AwsCredentialIdentityProvider.providerLayer(() => fromTemporaryCredentials({ params })),
@@ -37,13 +42,18 @@ export class AppsyncPublisherCredentialIdentityProviderLayerMap extends LayerMap
 ) {}
 
 export const appsyncSubscriberCredentialIdentityProviderLayer = Effect.gen(function* () {
-  const roleArnTemplate = yield* SstResource.useSync(
-    (resource) => resource.AppsyncChannelNamespaceSubscriberRoleTemplate.pipe(Redacted.value).arn,
+  const roleTemplate = yield* SstResource.useSync(
+    (resource) => resource.AppsyncChannelNamespaceSubscriberRoleTemplate.pipe(Redacted.value),
   );
 
   return yield* Actor.use(Struct.get("tenantId")).pipe(
-    Effect.map(tenantTemplate(roleArnTemplate)),
-    Effect.map((RoleArn) => ({ RoleArn, RoleSessionName: "AppsyncSubscriber" })),
+    Effect.map((tenantId) => ({
+      RoleArn: tenantTemplate(tenantId, roleTemplate.arn),
+      RoleSessionName: "AppsyncSubscriber",
+      // Scopes the session to the tenant, which roles shared by every tenant rely on. Per-tenant
+      // roles only trust sts:AssumeRole, so their sessions aren't tagged.
+      ...(roleTemplate.shared ? { Tags: [{ Key: "pd:tenantId", Value: tenantId }] } : {}),
+    })),
     Effect.satisfiesSuccessType<FromTemporaryCredentialsOptions["params"]>(),
     Effect.map((params) =>
       AwsCredentialIdentityProvider.providerLayer(() => fromTemporaryCredentials({ params })),
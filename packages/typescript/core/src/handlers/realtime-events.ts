@@ -1,9 +1,11 @@
 import { Handler } from ".";
+import { InfraContract } from "../infra/contract";
 import { PapercutMfContract } from "../papercut-mf/contract";
 import { ReplicacheContract } from "../replicache/contracts";
 
 export namespace RealtimeEventHandlers {
   export const registry = new Handler.Registry()
+    .handle(InfraContract.deployment)
     .handle(PapercutMfContract.apiTunnel)
     .handle(ReplicacheContract.notification)
     .handle(ReplicacheContract.poke)
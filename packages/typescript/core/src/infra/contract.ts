@@ -6,6 +6,7 @@ import * as HttpServerResponse from "effect/unstable/http/HttpServerResponse";
 
 import { AttributesContract } from "../attributes/contract";
 import { CloudflareContract } from "../cloudflare/contract";
+import { Handler } from "../handlers";
 import { PapercutMfContract } from "../papercut-mf/contract";
 import { CallbackId, EntityId } from "../utils";
 import { Constants } from "../utils/constants";
@@ -25,6 +26,17 @@ export namespace InfraContract {
     Struct.pick([Constants.DYNAMO_KEYS.PK, Constants.DYNAMO_KEYS.SK]),
   );
 
+  export class PreflightFailure extends Schema.Class<PreflightFailure>("PreflightFailure")({
+    issues: Schema.Array(
+      Schema.Struct({
+        path: Schema.String,
+        code: Schema.String,
+        message: Schema.String,
+      }),
+    ),
+    failedAt: Schema.DateTimeUtcFromString,
+  }) {}
+
   export class OutputItem extends Schema.Class<OutputItem>("OutputItem")({
     [Constants.DYNAMO_KEYS.PK]: AttributesContract.TenantIdFromString,
     [Constants.DYNAMO_KEYS.SK]: AttributesContract.InfraOutput,
@@ -32,6 +44,8 @@ export namespace InfraContract {
     [Constants.DYNAMO_KEYS.GSI1_SK]: AttributesContract.InfraOutput,
     papercutMfApiTunnelId: CloudflareContract.TunnelId.pipe(Schema.OptionFromNullOr),
     deployedAt: Schema.DateTimeUtcFromString,
+    // Set when the deployment's input failed preflight, the stack wasn't operated on
+    preflightFailure: PreflightFailure.pipe(Schema.OptionFromOptional),
   }) {}
 
   export const OutputPrimaryKey = OutputItem.mapFields(
@@ -51,4 +65,25 @@ export namespace InfraContract {
     public [HttpServerRespondable.symbol] = () =>
       HttpServerResponse.schemaJson(NotDeployedError)(this, { status: 409 });
   }
+
+  export const DeploymentPhase = Schema.Literals([
+    "started",
+    "updating",
+    "destroying",
+    "succeeded",
+    "failed",
+  ]);
+
+  export const deployment = new Handler.Handler({
+    name: "/infra/deployment",
+    Input: Schema.Struct({
+      callbackId: CallbackId,
+      deploymentId: EntityId,
+      phase: DeploymentPhase,
+      resourceChanges: Schema.Record(Schema.String, Schema.Int),
+      error: Schema.String.pipe(Schema.optional),
+      at: Schema.DateTimeUtcFromString,
+    }),
+    Output: Schema.Void,
+  });
 }
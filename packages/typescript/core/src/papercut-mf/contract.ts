@@ -43,10 +43,33 @@ export namespace PapercutMfContract {
     timezone: Schema.TimeZoneNamedFromString,
   }) {}
 
+  // Within the limits of an event source mapping of a FIFO queue, omitted fields keep the
+  // infra manager's defaults
+  export class InvoicesProcessingConfig extends Schema.Class<InvoicesProcessingConfig>(
+    "InvoicesProcessingConfig",
+  )({
+    batchSize: Schema.Int.pipe(
+      Schema.check(Schema.isGreaterThanOrEqualTo(1), Schema.isLessThanOrEqualTo(10)),
+      Schema.optional,
+    ),
+    maximumConcurrency: Schema.Int.pipe(
+      Schema.check(Schema.isGreaterThanOrEqualTo(2), Schema.isLessThanOrEqualTo(1000)),
+      Schema.optional,
+    ),
+    visibilityTimeoutSeconds: Schema.Int.pipe(
+      Schema.check(Schema.isGreaterThanOrEqualTo(0), Schema.isLessThanOrEqualTo(43200)),
+      Schema.optional,
+    ),
+    // High throughput FIFO, senders must group messages by the papercut account the invoice
+    // is charged to (the order's shared account, otherwise its customer's personal account)
+    highThroughput: Schema.Boolean.pipe(Schema.optional),
+  }) {}
+
   export class EnabledConfig extends Schema.Class<EnabledConfig>("EnabledConfig")({
     enabled: Schema.Literal(true).pipe(Schema.withConstructorDefault(Effect.succeed(true))),
     api: ApiConfig,
     sync: SyncConfig,
+    invoicesProcessing: InvoicesProcessingConfig.pipe(Schema.optional),
   }) {}
 
   export class DisabledConfig extends Schema.Class<DisabledConfig>("DisabledConfig")({
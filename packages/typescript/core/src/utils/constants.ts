@@ -76,15 +76,20 @@ export namespace Constants {
   } as const;
   export const KEY_LITERALS = {
     CALLBACK: "CALLBACK",
+    CELL: "CELL",
     CLIENT: "CLIENT",
     DEPLOYMENT: "DEPLOYMENT",
+    DRIFT: "DRIFT",
     INFRA: "INFRA",
     INPUT: "INPUT",
     IP: "IP",
     ORDER: "ORDER",
     OUTPUT: "OUTPUT",
     PAPERCUT_MF_API: "PAPERCUT_MF_API",
+    POOL: "POOL",
     ROOM: "ROOM",
+    STACK: "STACK",
+    SYNC: "SYNC",
     TENANT: "TENANT",
     USER: "USER",
   } as const;
@@ -14,6 +14,7 @@ declare module "sst" {
       "arn": string
       "name": string
       "roleArn": string
+      "timeout": number
       "type": "sst.aws.Function"
       "url": string
     }
@@ -66,6 +67,7 @@ declare module "sst" {
     "AppconfigRoleTemplate": {
       "arn": string
       "name": string
+      "shared": boolean
       "type": "pd.templates.AwsIamRole"
     }
     "AppsyncApi": {
@@ -80,11 +82,13 @@ declare module "sst" {
     "AppsyncChannelNamespacePublisherRoleTemplate": {
       "arn": string
       "name": string
+      "shared": boolean
       "type": "pd.templates.AwsIamRole"
     }
     "AppsyncChannelNamespaceSubscriberRoleTemplate": {
       "arn": string
       "name": string
+      "shared": boolean
       "type": "pd.templates.AwsIamRole"
     }
     "AssetsBucket": {
@@ -147,15 +151,20 @@ declare module "sst" {
       "hashKey": string
       "keyLiterals": {
         "CALLBACK": string
+        "CELL": string
         "CLIENT": string
         "DEPLOYMENT": string
+        "DRIFT": string
         "INFRA": string
         "INPUT": string
         "IP": string
         "ORDER": string
         "OUTPUT": string
         "PAPERCUT_MF_API": string
+        "POOL": string
         "ROOM": string
+        "STACK": string
+        "SYNC": string
         "TENANT": string
         "USER": string
       }
@@ -197,6 +206,7 @@ declare module "sst" {
       "arn": string
       "name": string
       "roleArn": string
+      "timeout": number
       "type": "sst.aws.Function"
     }
     "InvoicesProcessorClientCredentialsConfigurationProfileTemplate": {
@@ -206,12 +216,14 @@ declare module "sst" {
     "InvoicesProcessorQueueSenderRoleTemplate": {
       "arn": string
       "name": string
+      "shared": boolean
       "type": "pd.templates.AwsIamRole"
     }
     "Issuer": {
       "arn": string
       "name": string
       "roleArn": string
+      "timeout": number
       "type": "sst.aws.Function"
       "url": string
     }
@@ -243,12 +255,24 @@ declare module "sst" {
       "arn": string
       "name": string
       "roleArn": string
+      "timeout": number
       "type": "sst.aws.Function"
     }
     "PapercutMfSyncClientCredentialsConfigurationProfileTemplate": {
       "name": string
       "type": "pd.templates.AwsAppConfigConfigurationProfile"
     }
+    "PapercutMfSyncDispatch": {
+      "enabled": boolean
+      "scheduleGroupName": string
+      "scheduleRoleArn": string
+      "type": "sst.sst.Linkable"
+    }
+    "PapercutMfSyncScheduleRole": {
+      "arn": string
+      "name": string
+      "type": "aws.iam/role.Role"
+    }
     "PulumiBucket": {
       "name": string
       "type": "sst.aws.Bucket"
@@ -264,6 +288,10 @@ declare module "sst" {
       "type": "sst.sst.Secret"
       "value": string
     }
+    "TenantRoles": {
+      "shared": boolean
+      "type": "sst.sst.Linkable"
+    }
     "Web": {
       "type": "pd.cloudflare.StaticSite"
       "url": string
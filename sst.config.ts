@@ -66,6 +66,10 @@ export default $config({
       },
     }));
 
+    sst.Linkable.wrap(aws.iam.Role, (role) => ({
+      properties: { name: role.name, arn: role.arn },
+    }));
+
     sst.Linkable.wrap(aws.cloudfront.KeyGroup, (keyGroup) => ({
       properties: { id: keyGroup.id },
     }));